@@ -22,6 +22,23 @@ class DataConfig:
 class ModelConfig:
     name: str = "qwen3:0.6b"
     endpoint: str = "http://localhost:11434"
+    # Several `ollama serve` instances for this model; requests go to the
+    # least-loaded healthy one. Empty means use `endpoint` alone.
+    endpoints: List[str] = field(default_factory=list)
+    eject_seconds: float = 30.0
+
+@dataclass
+class ServerPoolConfig:
+    """`ollama serve` instances the runner launches and shuts down itself."""
+    instances: int = 2
+    base_port: int = 11435
+    host: str = "127.0.0.1"
+    num_parallel: int = 1
+    max_loaded_models: int = 1
+    keep_alive: Optional[str] = None
+    # extra server environment, e.g. {"OLLAMA_KV_CACHE_TYPE": "q8_0"}
+    env: dict = field(default_factory=dict)
+    startup_timeout: float = 60.0
 
 @dataclass
 class ExperimentConfig:
@@ -35,12 +52,77 @@ class ExperimentConfig:
         default_factory=lambda: [0.0, 0.7]
     )
     random_seed: int = 42
+    # Seeded samples per sampled (temperature > 0) condition; sample k uses
+    # random_seed + k and runs right after sample k - 1 on the same prompt,
+    # so Ollama evaluates the prompt once. Greedy conditions run once.
+    samples_per_condition: int = 1
     prompt_version: str = "v4"
     token_multiplier: float = 1.5
     include_semantic: bool = False
+    # Registered metric names (nudging.metrics.METRICS) scored per run; only
+    # these are computed. include_semantic adds semantic_similarity.
+    metrics: list[str] = field(
+        default_factory=lambda: ["exact_match", "fuzzy_match", "token_overlap"]
+    )
+    # Semantic similarity embeds texts through one batched service; vectors
+    # are shared across configs under results/cache/. None keeps them in memory only.
+    embedding_cache_filename: Optional[str] = None
+    embedding_batch_size: int = 64
+    # "onnx" runs the int8-quantised export with onnxruntime instead of torch.
+    embedding_backend: str = "sentence-transformers"
+    # Load the embedding model on a background thread while the first
+    # generations are in flight, instead of on the first scored run.
+    embedding_warm_up: bool = True
+    # Stream generations and stop once the target word count is complete.
+    # Streamed runs bypass the generation cache; tokens_saved is an upper
+    # bound (num_predict minus tokens streamed).
+    early_stop: bool = False
+    # "prefix" runs prompts sharing a prefix back-to-back per model so Ollama
+    # reuses its KV cache; "grid" keeps model → temperature → text → context.
+    run_order: str = "prefix"
+    # Ollama keep_alive sent with each request so the model (and its cache)
+    # stays loaded between runs; None uses the server default.
+    keep_alive: Optional[str] = "30m"
+    # Load each model before its block of runs so load time is not charged
+    # to the first timed run, and unload it once the block finishes
+    # (never with coordinate_workers, whose runners share the server).
+    preload_models: bool = True
+    unload_between_models: bool = True
+    # Managed local servers; models without explicit endpoints route across
+    # them. None uses each ModelConfig.endpoint as-is.
+    server_pool: Optional[ServerPoolConfig] = None
     selected_text_ids: list[str] = field(default_factory=list)
+    # A .sqlite/.db suffix selects the indexed SQLite results store.
     output_filename: str = "pilot_600_v4.csv"
+    # Keep raw and trimmed outputs in <output>.generations.sqlite so runs can
+    # be re-scored (--stage score) without repeating inference.
+    store_generations: bool = True
+    # Rows buffered per write; None uses the backend default (CSV 1, SQLite 20).
+    results_batch_size: Optional[int] = None
+    # Claim each run through <output>.leases.sqlite so several runner
+    # processes can drain the same grid without repeating a condition.
+    coordinate_workers: bool = False
+    # A claim lapses this long after its runner's last heartbeat.
+    lease_seconds: float = 600.0
+    # Deprecated: converted to requests_per_second = 1 / delay when no rate is set.
     context_delay_seconds: float = 0.0
+    # Worker threads draining the run queue (the upper bound when adaptive).
+    max_concurrency: int = 1
+    # Grow/shrink in-flight runs with observed latency per token (AIMD).
+    adaptive_concurrency: bool = False
+    # Token-bucket pacing of run starts; None means no pacing.
+    requests_per_second: Optional[float] = None
+    burst: int = 1
+    # Shared across configs under results/cache/; None disables caching.
+    generation_cache_filename: Optional[str] = None
+    # Prometheus text-format telemetry, rewritten every interval; a relative
+    # name is placed next to the results file. None disables the file.
+    # Coordinated runners each write <stem>.<pid><suffix>.
+    telemetry_filename: Optional[str] = None
+    telemetry_interval_seconds: float = 15.0
+    # Serve the same metrics at http://127.0.0.1:<port>/metrics; None disables it.
+    # Not allowed with coordinate_workers, whose runners would share the port.
+    metrics_port: Optional[int] = None
 
 # Configuration track 1: lightweight, one-model notebook experiments.
 def experimental(
@@ -53,6 +135,7 @@ def experimental(
         prompt_version: str = "v4",
         token_multiplier: float = 1.5,
         include_semantic: bool = False,
+        early_stop: bool = False,
 ) -> ExperimentConfig:
     """Create a one-model configuration for exploratory notebook work."""
     return ExperimentConfig(
@@ -65,6 +148,7 @@ def experimental(
         prompt_version=prompt_version,
         token_multiplier=token_multiplier,
         include_semantic=include_semantic,
+        early_stop=early_stop,
         context_delay_seconds=context_delay_seconds,
     )
 
@@ -81,7 +165,8 @@ PILOT_SMOKE = ExperimentConfig(
     include_semantic=False,
     selected_text_ids=["songs::taylor_swift::the_fate_of_ophelia"],
     output_filename="pilot_smoke_v4.csv",
-    context_delay_seconds=5.0,
+    generation_cache_filename="generations.sqlite",
+    embedding_cache_filename="embeddings.sqlite",
 )
 
 
@@ -103,7 +188,8 @@ PILOT_600 = ExperimentConfig(
         "songs::taylor_swift::the_fate_of_ophelia"
     ],
     output_filename="pilot_600_v4.csv",
-    context_delay_seconds=5.0,
+    generation_cache_filename="generations.sqlite",
+    embedding_cache_filename="embeddings.sqlite",
 )
 
 
@@ -127,7 +213,8 @@ PILOT_SONGS_40 = ExperimentConfig(
         "songs::taylor_swift::shake_it_off",
     ],
     output_filename="pilot_songs_40_v4.csv",
-    context_delay_seconds=5.0,
+    generation_cache_filename="generations.sqlite",
+    embedding_cache_filename="embeddings.sqlite",
 )
 
 
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Merge per-host shard outputs of one named configuration into a single results file."""
+
+import argparse
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from experiments.run_memorisation_experiment import (  # noqa: E402
+    LOG_FORMAT,
+    _expected_run_ids,
+    _metric_names,
+    _result_fields,
+    logger,
+)
+
+
+def merge_shards(shard_paths: list[Path], output_path: Path, experiment_config) -> dict:
+    """
+    Combine shard results, keeping one row per run_id, and write them in grid order.
+
+    A completed row beats an error row for the same run; among rows with the
+    same status the later shard wins. Rows whose run_id is not part of the
+    configured grid are reported and dropped. Returns a summary with the
+    run IDs still missing or only failed.
+    """
+    from nudging.results_store import open_results_store
+
+    expected = _expected_run_ids(experiment_config)
+    fields = _result_fields(_metric_names(experiment_config))
+    merged: dict[str, dict] = {}
+    unknown = 0
+    for shard_path in shard_paths:
+        store = open_results_store(shard_path, fields)
+        rows = store.rows()
+        store.close()
+        logger.info("Read %s row(s) from %s", len(rows), shard_path)
+        for row in rows:
+            run_id = row.get("run_id")
+            if run_id not in expected:
+                unknown += 1
+                continue
+            previous = merged.get(run_id)
+            if previous is None or row.get("status") == "completed" or previous.get("status") != "completed":
+                merged[run_id] = row
+
+    ordered = [merged[run_id] for run_id in expected if run_id in merged]
+    if output_path.exists():
+        output_path.unlink()
+    store = open_results_store(output_path, fields, batch_size=len(ordered) or 1)
+    for row in ordered:
+        store.append(row)
+    store.close()
+
+    missing = [run_id for run_id in expected if run_id not in merged]
+    failed = [run_id for run_id in expected if merged.get(run_id, {}).get("status") == "error"]
+    return {
+        "expected": len(expected),
+        "merged": len(ordered),
+        "completed": len(ordered) - len(failed),
+        "missing": missing,
+        "failed": failed,
+        "unknown": unknown,
+    }
+
+
+def _default_shard_paths(results_path: Path) -> list[Path]:
+    return sorted(results_path.parent.glob(f"{results_path.stem}.shard*of*{results_path.suffix}"))
+
+
+def _parse_args(config_names: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--config", choices=config_names, required=True, help="Named configuration the shards ran.")
+    parser.add_argument(
+        "shards",
+        nargs="*",
+        type=Path,
+        help="Shard result files (default: results/metrics/<output>.shard*of*.<ext>).",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="Merged file (default: the configuration's output_filename).",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    import logging
+
+    from configs.experiment_config import EXPERIMENT_CONFIGS
+
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    args = _parse_args(sorted(EXPERIMENT_CONFIGS))
+    experiment_config = EXPERIMENT_CONFIGS[args.config]
+    results_path = project_root / "results" / "metrics" / experiment_config.output_filename
+    shard_paths = args.shards or _default_shard_paths(results_path)
+    if not shard_paths:
+        raise SystemExit(f"No shard files found next to {results_path}.")
+
+    summary = merge_shards(shard_paths, args.output or results_path, experiment_config)
+    logger.info(
+        "Merged %s/%s run(s) into %s: completed=%s failed=%s missing=%s unknown_rows=%s",
+        summary["merged"],
+        summary["expected"],
+        args.output or results_path,
+        summary["completed"],
+        len(summary["failed"]),
+        len(summary["missing"]),
+        summary["unknown"],
+    )
+    for run_id in summary["missing"]:
+        logger.warning("Missing run %s", run_id)
+    for run_id in summary["failed"]:
+        logger.warning("Failed run %s", run_id)
+    raise SystemExit(1 if summary["missing"] or summary["failed"] else 0)
@@ -1,13 +1,13 @@
 #!/usr/bin/env python3
 """Run a configured memorisation grid and save each attempted run immediately."""
 
-import csv
 import hashlib
 import json
 import logging
 import argparse
+import os
 import sys
-import time
+from dataclasses import replace
 from pathlib import Path
 from typing import Iterable
 
@@ -25,6 +25,8 @@ RESULT_FIELDS = [
     "model",
     "temperature",
     "seed",
+    "condition_id",
+    "sample",
     "context_percentage",
     "context_words",
     "target_words",
@@ -33,13 +35,51 @@ RESULT_FIELDS = [
     "generated_words",
     "raw_length_ratio",
     "scored_length_ratio",
+    "early_stopped",
+    "tokens_saved",
     "exact_match",
     "fuzzy_match",
     "token_overlap",
     "semantic_similarity",
+    "wall_seconds",
+    "total_seconds",
+    "load_seconds",
+    "prompt_eval_count",
+    "prompt_eval_seconds",
+    "eval_count",
+    "eval_seconds",
+    "eval_tokens_per_second",
+    "prompt_eval_tokens_per_second",
+    "cache_hit",
 ]
 
 
+def _metric_names(experiment_config, include_semantic: bool | None = None) -> list[str]:
+    from nudging.experiment import selected_metrics
+
+    if include_semantic is None:
+        include_semantic = experiment_config.include_semantic
+    return selected_metrics(experiment_config.metrics, include_semantic)
+
+
+def _result_fields(metric_names: Iterable[str]) -> list[str]:
+    """RESULT_FIELDS plus a column for each selected metric outside the standard score set."""
+    return RESULT_FIELDS + [name for name in metric_names if name not in RESULT_FIELDS]
+
+
+def _log_metric_timings() -> None:
+    from nudging.metrics import METRICS
+
+    for name, timing in METRICS.timings().items():
+        logger.info(
+            "Scoring %s: %s pair(s) in %.2fs (%.2f ms/pair)",
+            name,
+            timing["pairs"],
+            timing["seconds"],
+            1000 * timing["seconds"] / timing["pairs"],
+        )
+
+
 def _configure_file_logging(log_path: Path) -> None:
     """Add one experiment-specific log file alongside the console log."""
     log_path.parent.mkdir(parents=True, exist_ok=True)
@@ -66,8 +106,14 @@ def _build_run_id(
     context_percentage: float,
     prompt_version: str,
     seed: int | None,
+    sample: int = 0,
 ) -> str:
-    """Create a stable ID for one exact experimental condition."""
+    """
+    Create a stable ID for one exact experimental condition.
+
+    sample tells apart unseeded samples of one condition; sample 0 leaves
+    the ID as it was before samples existed.
+    """
     condition = {
         "text_title": text_title,
         "model": model,
@@ -76,32 +122,30 @@ def _build_run_id(
         "prompt_version": prompt_version,
         "seed": seed,
     }
+    if sample:
+        condition["sample"] = sample
     encoded = json.dumps(condition, sort_keys=True, separators=(",", ":"))
     return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
 
 
 def _completed_run_ids(results_path: Path) -> set[str]:
+    from nudging.results_store import open_results_store
+
     if not results_path.exists():
         return set()
-
-    with results_path.open("r", newline="", encoding="utf-8") as results_file:
-        return {
-            row["run_id"]
-            for row in csv.DictReader(results_file)
-            if row.get("status") == "completed" and row.get("run_id")
-        }
+    store = open_results_store(results_path, RESULT_FIELDS)
+    try:
+        return store.completed_run_ids()
+    finally:
+        store.close()
 
 
 def _append_result(results_path: Path, result: dict) -> None:
-    results_path.parent.mkdir(parents=True, exist_ok=True)
-    write_header = not results_path.exists() or results_path.stat().st_size == 0
-    row = {field: result.get(field) for field in RESULT_FIELDS}
+    from nudging.results_store import open_results_store
 
-    with results_path.open("a", newline="", encoding="utf-8") as results_file:
-        writer = csv.DictWriter(results_file, fieldnames=RESULT_FIELDS)
-        if write_header:
-            writer.writeheader()
-        writer.writerow(row)
+    store = open_results_store(results_path, RESULT_FIELDS)
+    store.append(result)
+    store.close()
 
 
 def _select_dataset(dataset: dict[str, str], selected_text_ids: Iterable[str]) -> dict[str, str]:
@@ -120,119 +164,699 @@ def _category_from_title(text_title: str) -> str:
     return text_title.split("::", maxsplit=1)[0]
 
 
+def _log_generation_cache(generation_cache) -> None:
+    if generation_cache is not None:
+        stats = generation_cache.stats()
+        logger.info(
+            "Generation cache: hits=%s misses=%s entries=%s",
+            stats["hits"],
+            stats["misses"],
+            stats["entries"],
+        )
+
+
+def _model_endpoints(model_config, server_pool=None) -> list[str]:
+    """Explicit endpoints win; otherwise a managed pool replaces the default endpoint."""
+    endpoints = getattr(model_config, "endpoints", None)
+    if endpoints:
+        return list(endpoints)
+    if server_pool is not None:
+        return server_pool.endpoints
+    return [model_config.endpoint]
+
+
+def _build_client(model_config, experiment_config, generation_cache, server_pool=None):
+    """Create a plain client for one endpoint or a routed client for several."""
+    from nudging.models import OllamaClient
+    from nudging.routing import RoutedOllamaClient
+
+    endpoints = _model_endpoints(model_config, server_pool)
+    logger.info("Initialising model: %s (%s)", model_config.name, ", ".join(endpoints))
+    if len(endpoints) > 1:
+        return RoutedOllamaClient.from_endpoints(
+            model_config.name,
+            endpoints,
+            eject_seconds=getattr(model_config, "eject_seconds", 30.0),
+            cache=generation_cache,
+            keep_alive=experiment_config.keep_alive,
+        )
+    return OllamaClient(
+        model=model_config.name,
+        base_url=endpoints[0],
+        cache=generation_cache,
+        keep_alive=experiment_config.keep_alive,
+    )
+
+
+def _start_server_pool(experiment_config):
+    """Launch the configured `ollama serve` instances, if any."""
+    pool_config = experiment_config.server_pool
+    if pool_config is None:
+        return None
+
+    from dataclasses import asdict
+
+    from nudging.server_pool import OllamaServerPool
+
+    server_pool = OllamaServerPool(**asdict(pool_config))
+    server_pool.start()
+    return server_pool
+
+
+def _prompt_preparer(experiment_config, selected_dataset: dict[str, str]):
+    """Memoised condition -> (prompt, context, target); the prompt ignores model and temperature."""
+    from nudging.experiment import prepare_prompt
+
+    prepared = {}
+
+    def prepare(condition) -> tuple[str, str, str]:
+        key = (condition.text_title, condition.context_percentage)
+        if key not in prepared:
+            prepared[key] = prepare_prompt(
+                selected_dataset[condition.text_title],
+                condition.context_percentage,
+                experiment_config.prompt_version,
+            )
+        return prepared[key]
+
+    return prepare
+
+
+def _plan_conditions(experiment_config, selected_dataset: dict[str, str]) -> list:
+    """
+    Expand the configured grid and order it for prompt-prefix reuse.
+
+    Both orders keep each model's runs in one contiguous block, so a model is
+    loaded once and never swapped out mid-grid.
+    """
+    from math import ceil
+
+    from nudging.scheduling import expand_grid, order_for_prefix_reuse, shared_prefix_words
+
+    conditions = expand_grid(
+        text_titles=selected_dataset,
+        models=[model_config.name for model_config in experiment_config.models],
+        temperatures=experiment_config.temperatures,
+        context_percentages=experiment_config.context_percentages,
+        samples_per_condition=experiment_config.samples_per_condition,
+    )
+    if experiment_config.run_order == "grid":
+        return conditions
+    if experiment_config.run_order != "prefix":
+        raise ValueError(f"Unknown run_order: {experiment_config.run_order!r}. Known: ['grid', 'prefix']")
+
+    prepare = _prompt_preparer(experiment_config, selected_dataset)
+
+    def prompt_for(condition) -> str:
+        return prepare(condition)[0]
+
+    baseline_shared = shared_prefix_words(conditions, prompt_for)
+    conditions = order_for_prefix_reuse(conditions, prompt_for)
+    shared = shared_prefix_words(conditions, prompt_for)
+    logger.info(
+        "Prefix-aware order: ~%s prompt-eval tokens reusable from the KV cache (grid order: ~%s)",
+        ceil(shared * experiment_config.token_multiplier),
+        ceil(baseline_shared * experiment_config.token_multiplier),
+    )
+    return conditions
+
+
+def _build_pacing(experiment_config):
+    """
+    Build the optional concurrency limiter and rate limiter for the run.
+
+    A legacy context_delay_seconds without requests_per_second becomes an
+    equivalent rate, so old notebook configs keep their pacing without
+    sleeping after every row.
+    """
+    from nudging.concurrency import AdaptiveConcurrencyLimiter, TokenBucket
+
+    limiter = None
+    if experiment_config.adaptive_concurrency:
+        limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=1,
+            max_limit=experiment_config.max_concurrency,
+        )
+
+    rate = experiment_config.requests_per_second
+    if rate is None and experiment_config.context_delay_seconds > 0:
+        rate = 1.0 / experiment_config.context_delay_seconds
+    rate_limiter = TokenBucket(rate, burst=experiment_config.burst) if rate else None
+    return limiter, rate_limiter
+
+
+def _generated_tokens(metrics: dict) -> int:
+    """Server-counted tokens when reported, else generated words as a proxy."""
+    return int(metrics.get("eval_count") or metrics.get("raw_generated_words") or 0)
+
+
+def _start_telemetry(experiment_config, results_path: Path, pending_runs: int):
+    """
+    Create the run's telemetry and start the configured exporters.
+
+    A relative telemetry_filename is placed next to the results file. With
+    coordinate_workers each process writes its own file, named after its
+    pid, and labels its metrics with worker=<pid>.
+    Returns (telemetry, exporters); stop every exporter when the run ends.
+    """
+    from nudging.telemetry import MetricsHTTPServer, PrometheusTextfileExporter, RunTelemetry
+
+    worker = str(os.getpid()) if experiment_config.coordinate_workers else None
+    telemetry = RunTelemetry(experiment_config.name, pending_runs=pending_runs, worker=worker)
+    exporters = []
+    if experiment_config.telemetry_filename is not None:
+        path = results_path.parent / experiment_config.telemetry_filename
+        if worker is not None:
+            path = path.with_name(f"{path.stem}.{worker}{path.suffix}")
+        exporter = PrometheusTextfileExporter(
+            telemetry,
+            path,
+            interval_seconds=experiment_config.telemetry_interval_seconds,
+        )
+        exporters.append(exporter.start())
+        logger.info("Writing telemetry to %s", exporter.path)
+    if experiment_config.metrics_port is not None:
+        exporters.append(MetricsHTTPServer(telemetry, port=experiment_config.metrics_port).start())
+    return telemetry, exporters
+
+
+def _sample_seed(experiment_config, sample: int) -> int | None:
+    """Seed of the given sample; sample 0 keeps the configured seed, so its run_id is unchanged."""
+    if experiment_config.random_seed is None:
+        return None
+    return experiment_config.random_seed + sample
+
+
+def _condition_run_id(condition, experiment_config) -> str:
+    return _build_run_id(
+        text_title=condition.text_title,
+        model=condition.model,
+        temperature=condition.temperature,
+        context_percentage=condition.context_percentage,
+        prompt_version=experiment_config.prompt_version,
+        seed=_sample_seed(experiment_config, condition.sample),
+        # seeded samples already differ by seed
+        sample=condition.sample if experiment_config.random_seed is None else 0,
+    )
+
+
+def _condition_id(condition, experiment_config) -> str:
+    """ID shared by every sample of a condition: the run_id of its first sample."""
+    return _condition_run_id(replace(condition, sample=0), experiment_config)
+
+
+def _expected_run_ids(experiment_config) -> dict:
+    """Map every run_id of the configured grid to its condition, in grid order."""
+    from nudging.scheduling import expand_grid
+
+    conditions = expand_grid(
+        text_titles=experiment_config.selected_text_ids,
+        models=[model_config.name for model_config in experiment_config.models],
+        temperatures=experiment_config.temperatures,
+        context_percentages=experiment_config.context_percentages,
+        samples_per_condition=experiment_config.samples_per_condition,
+    )
+    return {_condition_run_id(condition, experiment_config): condition for condition in conditions}
+
+
+def _pending_conditions(
+    conditions,
+    experiment_config,
+    completed_ids: set[str],
+    max_runs: int | None,
+    shard: tuple[int, int] | None = None,
+):
+    """
+    Pair conditions with run IDs, dropping completed ones and applying the run limit.
+
+    Returns (pending, skipped) where pending holds at most max_runs
+    (condition, run_id) pairs in schedule order, exactly the conditions the
+    serial loop would have attempted. With shard=(i, N) only conditions whose
+    run_id hashes to shard i are kept.
+    """
+    from nudging.scheduling import shard_of
+
+    pending = []
+    skipped = 0
+    for condition in conditions:
+        if max_runs is not None and len(pending) >= max_runs:
+            logger.info("Reached run limit; %s newly attempted condition(s) queued.", max_runs)
+            break
+        run_id = _condition_run_id(condition, experiment_config)
+        if shard is not None and shard_of(run_id, shard[1]) != shard[0]:
+            continue
+        if run_id in completed_ids:
+            skipped += 1
+            logger.info("Skipping completed run %s", run_id)
+            continue
+        pending.append((condition, run_id))
+    return pending, skipped
+
+
+def _group_by_model(pending) -> list[tuple[str, list]]:
+    """Split the schedule into contiguous per-model blocks, preserving order."""
+    blocks = []
+    for condition, run_id in pending:
+        if not blocks or blocks[-1][0] != condition.model:
+            blocks.append((condition.model, []))
+        blocks[-1][1].append((condition, run_id))
+    return blocks
+
+
+def _is_results_database(path: Path) -> bool:
+    """Whether a SQLite file holds a results table; opened read-only, so nothing is created."""
+    import sqlite3
+
+    try:
+        with sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True) as conn:
+            return conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'results'"
+            ).fetchone() is not None
+    except sqlite3.Error:
+        return False
+
+
+def _history_rows(paths) -> list[dict]:
+    """
+    Result rows from earlier runs, for measured throughput.
+
+    Each file is read once however often it is listed. Missing and
+    unreadable files are skipped, as are SQLite files of other kinds
+    (generations, leases).
+    """
+    from nudging.results_store import SQLITE_SUFFIXES, open_results_store
+
+    rows = []
+    for path in {Path(path).resolve(): Path(path) for path in paths}.values():
+        if not path.exists():
+            continue
+        if path.suffix.lower() in SQLITE_SUFFIXES and not _is_results_database(path):
+            continue
+        try:
+            store = open_results_store(path, RESULT_FIELDS)
+            rows.extend(store.rows())
+            store.close()
+        except Exception as exc:
+            logger.warning("Could not read throughput history from %s: %s", path, exc)
+    return rows
+
+
+def plan_experiment(
+    experiment_config,
+    dataset: dict[str, str],
+    results_path: Path,
+    max_runs: int | None = None,
+    shard: tuple[int, int] | None = None,
+    concurrency: int | None = None,
+    history_paths=(),
+    probe: bool = False,
+) -> dict:
+    """
+    Estimate tokens and time for the runs run_experiment would attempt, without running them.
+
+    Throughput per model comes from completed rows in results_path and
+    history_paths; with probe=True, models without history are measured
+    with one short generation against their configured endpoint.
+    """
+    from math import ceil
+
+    from nudging.experiment import _get_num_predict_for_target
+    from nudging.planning import ConditionCost, probe_throughput, summarise_plan, throughput_from_rows
+    from nudging.results_store import open_results_store
+    from nudging.scheduling import shared_prefix_counts
+
+    selected_dataset = _select_dataset(dataset, experiment_config.selected_text_ids)
+    completed_ids = set()
+    # a dry run must not create the results file
+    if results_path.exists():
+        store = open_results_store(results_path, RESULT_FIELDS)
+        completed_ids = store.completed_run_ids()
+        store.close()
+    conditions = _plan_conditions(experiment_config, selected_dataset)
+    pending, skipped = _pending_conditions(conditions, experiment_config, completed_ids, max_runs, shard)
+    pending_conditions = [condition for condition, _ in pending]
+
+    prepare = _prompt_preparer(experiment_config, selected_dataset)
+    multiplier = experiment_config.token_multiplier
+    costs = [
+        ConditionCost(
+            condition=condition,
+            prompt_tokens=ceil(len(prepare(condition)[0].split()) * multiplier),
+            reused_prompt_tokens=ceil(shared_words * multiplier),
+            output_tokens=_get_num_predict_for_target(len(prepare(condition)[2].split()), multiplier),
+        )
+        for condition, shared_words in zip(
+            pending_conditions,
+            shared_prefix_counts(pending_conditions, lambda condition: prepare(condition)[0]),
+        )
+    ]
+
+    throughputs = throughput_from_rows(_history_rows([results_path, *history_paths]))
+    if probe:
+        for model_config in experiment_config.models:
+            if model_config.name in throughputs or not any(c.model == model_config.name for c in pending_conditions):
+                continue
+            client = _build_client(model_config, experiment_config, generation_cache=None)
+            try:
+                if client.ensure_running(start_if_needed=False):
+                    throughputs[model_config.name] = probe_throughput(client)
+                else:
+                    logger.warning("Cannot probe %s: endpoint unavailable", model_config.name)
+            finally:
+                client.close()
+
+    summary = summarise_plan(costs, throughputs, concurrency=concurrency or experiment_config.max_concurrency)
+    summary["skipped"] = skipped
+    return summary
+
+
+def _generation_record(result: dict, selected_dataset: dict[str, str], experiment_config):
+    from nudging.generations import GenerationRecord, text_sha256
+
+    return GenerationRecord(
+        run_id=result["run_id"],
+        text_title=result["text_title"],
+        text_sha256=text_sha256(selected_dataset[result["text_title"]]),
+        model=result["model"],
+        temperature=result["temperature"],
+        seed=result["seed"],
+        prompt_version=experiment_config.prompt_version,
+        context_words=result["context_words"],
+        target_words=result["target_words"],
+        raw_generation=result["raw_generation"],
+        generation=result["generation"],
+    )
+
+
+def _rewrite_results(results_path: Path, rows: list[dict], fields: list[str] = RESULT_FIELDS) -> None:
+    """Replace the results file with rows, via a temporary file in the same directory."""
+    from nudging.results_store import open_results_store
+
+    temporary = results_path.with_name(f".{results_path.stem}.rewrite{results_path.suffix}")
+    temporary.unlink(missing_ok=True)
+    store = open_results_store(temporary, fields, batch_size=max(len(rows), 1))
+    for row in rows:
+        store.append(row)
+    store.close()
+    # a leftover WAL of the old database must not be replayed onto the new one
+    for suffix in ("-wal", "-shm"):
+        Path(f"{results_path}{suffix}").unlink(missing_ok=True)
+    os.replace(temporary, results_path)
+
+
+def score_experiment(
+    experiment_config,
+    dataset: dict[str, str],
+    results_path: Path,
+    include_semantic: bool | None = None,
+) -> dict:
+    """
+    Recompute the score columns of completed rows from stored generations.
+
+    The configured metrics are computed in one batch; unselected standard
+    score columns are cleared. Targets are rebuilt from the dataset and the stored word offsets; rows
+    whose text changed since generation, or that have no stored generation,
+    keep their scores. The results file is rewritten in place. Returns
+    counts of scored, missing and stale rows.
+    """
+    from nudging.experiment import SCORE_FIELDS
+    from nudging.generations import GenerationStore, text_sha256
+    from nudging.metrics import score_batch
+    from nudging.results_store import open_results_store
+
+    generations_path = _generations_path(results_path)
+    if not generations_path.exists():
+        raise FileNotFoundError(f"No stored generations at {generations_path}; run the generate stage first.")
+    metric_names = _metric_names(experiment_config, include_semantic)
+    fields = _result_fields(metric_names)
+
+    store = open_results_store(results_path, fields)
+    rows = store.rows()
+    store.close()
+    summary = {"scored": 0, "missing": 0, "stale": 0}
+    with GenerationStore(generations_path) as generations:
+        # one scan decompresses each distinct text once
+        records = {record.run_id: record for record in generations.records()}
+    scored_rows, generated, targets = [], [], []
+    for row in rows:
+        if row.get("status") != "completed":
+            continue
+        record = records.get(row["run_id"])
+        if record is None:
+            summary["missing"] += 1
+            continue
+        content = dataset.get(record.text_title)
+        if content is None or text_sha256(content) != record.text_sha256:
+            logger.warning("Text of run %s changed since generation; not re-scored", row["run_id"])
+            summary["stale"] += 1
+            continue
+        scored_rows.append(row)
+        generated.append(record.generation)
+        targets.append(record.target_from(content))
+
+    embeddings = _configure_embeddings(experiment_config) if "semantic_similarity" in metric_names else None
+    scores = score_batch(generated, targets, metric_names)
+    if embeddings is not None:
+        logger.info("Embeddings: %s", embeddings.stats())
+    _log_metric_timings()
+    for index, row in enumerate(scored_rows):
+        row.update({field: None for field in SCORE_FIELDS})
+        row.update({metric: float(values[index]) for metric, values in scores.items()})
+    summary["scored"] = len(scored_rows)
+
+    _rewrite_results(results_path, rows, fields)
+    logger.info("Re-scored %s: %s", results_path, summary)
+    return summary
+
+
+def export_results(experiment_config, results_path: Path, export_path: Path) -> int:
+    """Write the results as CSV, keeping the columns of every selected metric."""
+    from nudging.results_store import open_results_store
+
+    store = open_results_store(results_path, _result_fields(_metric_names(experiment_config)))
+    try:
+        return store.export_csv(export_path)
+    finally:
+        store.close()
+
+
 def run_experiment(
     experiment_config,
     dataset: dict[str, str],
     results_path: Path,
     max_runs: int | None = None,
+    generation_cache=None,
+    shard: tuple[int, int] | None = None,
+    score: bool = True,
 ) -> None:
-    """Run all configured conditions, appending each completed or failed row."""
+    """
+    Run all configured conditions, appending each completed or failed row.
+
+    With store_generations the raw and trimmed outputs are kept in
+    <output>.generations.sqlite; score=False skips scoring so the score
+    columns can be filled later by score_experiment, and therefore requires
+    store_generations.
+
+    Conditions are queued per model block and drained by up to
+    max_concurrency worker threads; rows are written from the calling thread
+    as runs finish. With coordinate_workers each run is claimed through a
+    shared lease file first, and runs another process holds are left to it.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
     from nudging.experiment import run_experiments
-    from nudging.models import OllamaClient
+    from nudging.residency import ModelResidencyManager
+    from nudging.results_store import open_results_store
 
+    if not score and not experiment_config.store_generations:
+        raise ValueError(
+            "The generate stage needs store_generations=True; otherwise the outputs "
+            "are discarded and the runs can never be scored."
+        )
+    if experiment_config.coordinate_workers and experiment_config.metrics_port is not None:
+        raise ValueError(
+            "Coordinated runners cannot share one metrics_port; use telemetry_filename, "
+            "which each runner writes under its own name."
+        )
     selected_dataset = _select_dataset(dataset, experiment_config.selected_text_ids)
-    completed_ids = _completed_run_ids(results_path)
-    total_runs = (
-        len(selected_dataset)
-        * len(experiment_config.models)
-        * len(experiment_config.temperatures)
-        * len(experiment_config.context_percentages)
+    metric_names = _metric_names(experiment_config)
+    store = open_results_store(
+        results_path,
+        _result_fields(metric_names),
+        batch_size=experiment_config.results_batch_size,
     )
-    attempted = 0
-    skipped = 0
-    completed = 0
-    errors = 0
+    # everything opened after the results store is closed in the finally below
+    exporters = []
+    generations = leases = residency = server_pool = None
+    clients = {}
+    try:
+        completed_ids = store.completed_run_ids()
+        model_configs = {model_config.name: model_config for model_config in experiment_config.models}
+        samples = experiment_config.samples_per_condition
+        total_runs = (
+            len(selected_dataset)
+            * len(experiment_config.models)
+            # greedy conditions are sampled once
+            * sum(samples if temperature > 0 else 1 for temperature in experiment_config.temperatures)
+            * len(experiment_config.context_percentages)
+        )
+        attempted = 0
+        completed = 0
+        errors = 0
 
-    logger.info(
-        "Starting %s: %s planned runs (%s texts × %s models × %s temperatures × %s contexts)",
-        experiment_config.name,
-        total_runs,
-        len(selected_dataset),
-        len(experiment_config.models),
-        len(experiment_config.temperatures),
-        len(experiment_config.context_percentages),
-    )
-    logger.info("Results CSV: %s", results_path)
-    if max_runs is not None:
-        logger.info("Run limit: %s newly attempted condition(s)", max_runs)
-    logger.info("Seed=%s | token_multiplier=%s | semantic=%s",
-                experiment_config.random_seed,
-                experiment_config.token_multiplier,
-                experiment_config.include_semantic)
-    logger.info("Selected text IDs: %s", list(selected_dataset))
-    for model_config in experiment_config.models:
-        logger.info("Initialising model: %s (%s)", model_config.name, model_config.endpoint)
-        client = OllamaClient(
-            model=model_config.name,
-            base_url=model_config.endpoint,
+        logger.info(
+            "Starting %s: %s planned runs (%s texts × %s models × %s temperatures × %s contexts × %s samples)",
+            experiment_config.name,
+            total_runs,
+            len(selected_dataset),
+            len(experiment_config.models),
+            len(experiment_config.temperatures),
+            len(experiment_config.context_percentages),
+            samples,
+        )
+        logger.info("Results (%s): %s", type(store).__name__, results_path)
+        if max_runs is not None:
+            logger.info("Run limit: %s newly attempted condition(s)", max_runs)
+        logger.info("Seed=%s | token_multiplier=%s | metrics=%s | early_stop=%s",
+                    experiment_config.random_seed,
+                    experiment_config.token_multiplier,
+                    metric_names if score else "deferred",
+                    experiment_config.early_stop)
+        logger.info("Selected text IDs: %s", list(selected_dataset))
+        embeddings = (
+            _configure_embeddings(experiment_config)
+            if score and "semantic_similarity" in metric_names
+            else None
+        )
+        if embeddings is not None and experiment_config.embedding_warm_up:
+            embeddings.warm_up()
+        conditions = _plan_conditions(experiment_config, selected_dataset)
+        if shard is not None:
+            logger.info("Shard %s/%s: running only this host's slice of the grid", *shard)
+        pending, skipped = _pending_conditions(conditions, experiment_config, completed_ids, max_runs, shard)
+        limiter, rate_limiter = _build_pacing(experiment_config)
+        logger.info(
+            "Workers=%s | adaptive=%s | rate=%s/s",
+            experiment_config.max_concurrency,
+            limiter is not None,
+            "unlimited" if rate_limiter is None else f"{rate_limiter.rate:g}",
+        )
+        # coordinated runners share the server; unloading would evict a model their peers are timing
+        unload_previous = experiment_config.unload_between_models and not experiment_config.coordinate_workers
+        if experiment_config.unload_between_models and not unload_previous:
+            logger.info("Leaving models loaded between blocks: the server is shared with other runners")
+        residency = (
+            ModelResidencyManager(
+                keep_alive=experiment_config.keep_alive,
+                unload_previous=unload_previous,
+            )
+            if experiment_config.preload_models
+            else None
         )
-        if not client.ensure_running():
-            raise RuntimeError(f"Ollama is unavailable for model {model_config.name!r}.")
-        logger.info("Ollama is ready for %s", model_config.name)
-
-        for temperature in experiment_config.temperatures:
-            for text_title, content in selected_dataset.items():
-                for context_percentage in experiment_config.context_percentages:
-                    if max_runs is not None and attempted >= max_runs:
-                        logger.info("Reached run limit; stopping before the next condition.")
-                        logger.info(
-                            "Finished %s: completed=%s errors=%s skipped=%s results=%s",
-                            experiment_config.name,
-                            completed,
-                            errors,
-                            skipped,
-                            results_path,
-                        )
-                        return
-
-                    run_id = _build_run_id(
-                        text_title=text_title,
-                        model=model_config.name,
-                        temperature=temperature,
-                        context_percentage=context_percentage,
-                        prompt_version=experiment_config.prompt_version,
-                        seed=experiment_config.random_seed,
-                    )
-                    if run_id in completed_ids:
-                        skipped += 1
-                        logger.info("Skipping completed run %s", run_id)
-                        continue
 
-                    attempted += 1
+        def execute(condition, run_id, client) -> dict | None:
+            # claim as late as possible so faster runners take more of the grid
+            if leases is not None and not leases.claim(run_id):
+                return None
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            kwargs = dict(
+                title=condition.text_title,
+                content=selected_dataset[condition.text_title],
+                percentage=condition.context_percentage,
+                model_client=client,
+                prompt_version=experiment_config.prompt_version,
+                temperature=condition.temperature,
+                seed=_sample_seed(experiment_config, condition.sample),
+                token_multiplier=experiment_config.token_multiplier,
+                early_stop=experiment_config.early_stop,
+                score=score,
+                metrics=metric_names,
+            )
+            telemetry.run_started()
+            try:
+                if limiter is None:
+                    return run_experiments(**kwargs)
+                with limiter.slot() as slot:
+                    metrics = run_experiments(**kwargs)
+                    # a cache hit says nothing about server load; scoring time is not latency
+                    if not metrics.get("cache_hit"):
+                        slot.record(_generated_tokens(metrics), seconds=metrics.get("wall_seconds"))
+                return metrics
+            finally:
+                telemetry.run_stopped()
+
+        telemetry, exporters = _start_telemetry(experiment_config, results_path, len(pending))
+        if experiment_config.store_generations and pending:
+            from nudging.generations import GenerationStore
+
+            generations = GenerationStore(_generations_path(results_path))
+            logger.info("Generations: %s", generations.path)
+        claimed_elsewhere = 0
+        if experiment_config.coordinate_workers and pending:
+            from nudging.leases import RunLeaseQueue
+
+            leases = RunLeaseQueue(_lease_path(results_path), lease_seconds=experiment_config.lease_seconds)
+            leases.start_heartbeat()
+            logger.info("Coordinating through %s as %s", leases.path, leases.owner)
+
+        server_pool = _start_server_pool(experiment_config) if pending else None
+        for model_name, block in _group_by_model(pending):
+            if model_name not in clients:
+                client = _build_client(model_configs[model_name], experiment_config, generation_cache, server_pool)
+                if not client.ensure_running():
+                    raise RuntimeError(f"Ollama is unavailable for model {model_name!r}.")
+                logger.info("Ollama is ready for %s", model_name)
+                clients[model_name] = client
+            client = clients[model_name]
+            if residency is not None:
+                residency.switch_to(client)
+
+            with ThreadPoolExecutor(
+                max_workers=experiment_config.max_concurrency,
+                thread_name_prefix="run",
+            ) as executor:
+                futures = {}
+                for condition, run_id in block:
                     logger.info(
-                        "Starting run %s: model=%s temperature=%s text=%s context=%s%%",
+                        "Queued run %s: model=%s temperature=%s text=%s context=%s%%",
                         run_id,
-                        model_config.name,
-                        temperature,
-                        text_title,
-                        context_percentage,
+                        condition.model,
+                        condition.temperature,
+                        condition.text_title,
+                        condition.context_percentage,
                     )
+                    futures[executor.submit(execute, condition, run_id, client)] = (condition, run_id)
+
+                for future in as_completed(futures):
+                    condition, run_id = futures[future]
+                    if future.exception() is None and future.result() is None:
+                        claimed_elsewhere += 1
+                        telemetry.skip()
+                        logger.info("Run %s is claimed by another runner", run_id)
+                        continue
+                    attempted += 1
                     base_result = {
                         "run_id": run_id,
-                        "text_title": text_title,
-                        "category": _category_from_title(text_title),
-                        "model": model_config.name,
-                        "temperature": temperature,
-                        "seed": experiment_config.random_seed,
-                        "context_percentage": context_percentage,
+                        "text_title": condition.text_title,
+                        "category": _category_from_title(condition.text_title),
+                        "model": condition.model,
+                        "temperature": condition.temperature,
+                        "seed": _sample_seed(experiment_config, condition.sample),
+                        "condition_id": _condition_id(condition, experiment_config),
+                        "sample": condition.sample,
+                        "context_percentage": condition.context_percentage,
                     }
                     try:
-                        metrics = run_experiments(
-                            title=text_title,
-                            content=content,
-                            percentage=context_percentage,
-                            model_client=client,
-                            prompt_version=experiment_config.prompt_version,
-                            temperature=temperature,
-                            seed=experiment_config.random_seed,
-                            token_multiplier=experiment_config.token_multiplier,
-                            include_semantic=experiment_config.include_semantic,
-                        )
+                        metrics = future.result()
                         result = {**base_result, **metrics, "status": "completed", "error": ""}
+                        if generations is not None:
+                            # stored before the row so a completed run always has its text
+                            generations.put(_generation_record(result, selected_dataset, experiment_config))
                         completed_ids.add(run_id)
                         completed += 1
                     except Exception as exc:
-                        logger.exception("Run %s failed", run_id)
+                        logger.error("Run %s failed", run_id, exc_info=exc)
                         result = {
                             **base_result,
                             "status": "error",
@@ -240,27 +864,56 @@ def run_experiment(
                         }
                         errors += 1
 
-                    _append_result(results_path, result)
+                    store.append(result)
+                    telemetry.record(condition.model, result["status"], _generated_tokens(result))
+                    if leases is not None:
+                        if result["status"] == "completed":
+                            # the row must be on disk before other runners stop retrying it
+                            store.flush()
+                            leases.complete(run_id)
+                        else:
+                            leases.release(run_id)
+                    eta_seconds = telemetry.snapshot()["eta_seconds"]
                     logger.info(
-                        "Saved %s row %s/%s (%s skipped): raw_words=%s generated_words=%s",
+                        "Saved %s row %s/%s (%s skipped): raw_words=%s generated_words=%s eta=%s%s",
                         result["status"],
                         attempted,
                         total_runs,
                         skipped,
                         result.get("raw_generated_words"),
                         result.get("generated_words"),
+                        "?" if eta_seconds is None else f"{eta_seconds:.0f}s",
+                        "" if limiter is None else f" concurrency_limit={limiter.limit}",
                     )
+    finally:
+        store.close()
+        if generations is not None:
+            logger.info("Generation store: %s", generations.stats())
+            generations.close()
+        for exporter in exporters:
+            exporter.stop()
+        if leases is not None:
+            logger.info("Leases: %s", leases.counts())
+            leases.close()
+        if residency is not None:
+            residency.release()
+            residency.log_summary()
+        for client in clients.values():
+            client.close()
+        if server_pool is not None:
+            server_pool.shutdown()
 
-                    if experiment_config.context_delay_seconds > 0:
-                        logger.info("Waiting %.1f seconds before the next run", experiment_config.context_delay_seconds)
-                        time.sleep(experiment_config.context_delay_seconds)
-
+    _log_generation_cache(generation_cache)
+    if embeddings is not None:
+        logger.info("Embeddings: %s", embeddings.stats())
+    _log_metric_timings()
     logger.info(
-        "Finished %s: completed=%s errors=%s skipped=%s results=%s",
+        "Finished %s: completed=%s errors=%s skipped=%s claimed_elsewhere=%s results=%s",
         experiment_config.name,
         completed,
         errors,
         skipped,
+        claimed_elsewhere,
         results_path,
     )
 
@@ -280,6 +933,43 @@ def _parse_args(config_names: list[str]) -> argparse.Namespace:
         action="store_true",
         help="List available configuration names and exit.",
     )
+    parser.add_argument(
+        "--export-csv",
+        type=Path,
+        default=None,
+        metavar="PATH",
+        help="Export the configured results (CSV or SQLite) to a CSV at PATH and exit.",
+    )
+    parser.add_argument(
+        "--shard",
+        default=None,
+        metavar="I/N",
+        help="Run only shard I of N (1-based), split by run_id; outputs get a .shardIofN suffix.",
+    )
+    parser.add_argument(
+        "--stage",
+        choices=["all", "generate", "score"],
+        default="all",
+        help="all: generate and score; generate: store generations without scoring; "
+             "score: re-score completed rows from stored generations (default: all).",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Print token counts and estimated wall time for the pending runs, then exit.",
+    )
+    parser.add_argument(
+        "--probe",
+        action="store_true",
+        help="With --plan, measure models lacking earlier results with one short generation.",
+    )
+    parser.add_argument(
+        "--plan-concurrency",
+        type=int,
+        default=None,
+        metavar="N",
+        help="With --plan, estimate wall time at N workers (default: the config's max_concurrency).",
+    )
     parser.add_argument(
         "--max-runs",
         type=int,
@@ -289,9 +979,35 @@ def _parse_args(config_names: list[str]) -> argparse.Namespace:
     args = parser.parse_args()
     if args.max_runs is not None and args.max_runs <= 0:
         parser.error("--max-runs must be a positive integer.")
+    if args.plan_concurrency is not None and args.plan_concurrency <= 0:
+        parser.error("--plan-concurrency must be a positive integer.")
+    if args.shard is not None:
+        from nudging.scheduling import parse_shard
+
+        try:
+            args.shard = parse_shard(args.shard)
+        except ValueError as exc:
+            parser.error(str(exc))
     return args
 
 
+def _generations_path(results_path: Path) -> Path:
+    """pilot.csv -> pilot.generations.sqlite"""
+    return results_path.with_name(f"{results_path.stem}.generations.sqlite")
+
+
+def _lease_path(results_path: Path) -> Path:
+    """pilot.csv -> pilot.leases.sqlite"""
+    return results_path.with_name(f"{results_path.stem}.leases.sqlite")
+
+
+def _shard_path(path: Path, shard: tuple[int, int] | None) -> Path:
+    """pilot.csv -> pilot.shard2of4.csv"""
+    if shard is None:
+        return path
+    return path.with_name(f"{path.stem}.shard{shard[0]}of{shard[1]}{path.suffix}")
+
+
 def _setup_experiment_for_terminal(config_name: str):
     project_root = Path(__file__).resolve().parent.parent
     if str(project_root) not in sys.path:
@@ -311,6 +1027,40 @@ def _setup_experiment_for_terminal(config_name: str):
     return experiment_config, dataset, results_path, log_path
 
 
+def _configure_embeddings(experiment_config):
+    """Route semantic similarity through a batched service, cached on disk when configured."""
+    from nudging.embeddings import EmbeddingCache, EmbeddingService
+    from nudging.metrics import set_embedding_service
+
+    cache = None
+    if experiment_config.embedding_cache_filename is not None:
+        project_root = Path(__file__).resolve().parent.parent
+        cache_path = project_root / "results" / "cache" / experiment_config.embedding_cache_filename
+        logger.info("Embedding cache: %s", cache_path)
+        cache = EmbeddingCache(cache_path)
+    service = EmbeddingService(
+        cache=cache,
+        batch_size=experiment_config.embedding_batch_size,
+        backend=experiment_config.embedding_backend,
+    )
+    set_embedding_service(service)
+    return service
+
+
+def _open_generation_cache(experiment_config):
+    if experiment_config.generation_cache_filename is None:
+        return None
+
+    from nudging.cache import GenerationCache
+
+    project_root = Path(__file__).resolve().parent.parent
+    cache_path = project_root / "results" / "cache" / experiment_config.generation_cache_filename
+    logger.info("Generation cache: %s", cache_path)
+    if experiment_config.early_stop:
+        logger.warning("early_stop streams every run, and streams bypass the generation cache")
+    return GenerationCache(cache_path)
+
+
 if __name__ == "__main__":
     project_root = Path(__file__).resolve().parent.parent
     if str(project_root) not in sys.path:
@@ -324,13 +1074,51 @@ if __name__ == "__main__":
             print(f"{config_name}: {config.name}")
         raise SystemExit(0)
 
+    if args.export_csv is not None:
+        experiment_config = EXPERIMENT_CONFIGS[args.config]
+        results_path = project_root / "results" / "metrics" / experiment_config.output_filename
+        exported = export_results(experiment_config, results_path, args.export_csv)
+        print(f"Exported {exported} row(s) from {results_path} to {args.export_csv}")
+        raise SystemExit(0)
+
     experiment_config, dataset, results_path, log_path = _setup_experiment_for_terminal(args.config)
+    results_path = _shard_path(results_path, args.shard)
+    log_path = _shard_path(log_path, args.shard)
+    if args.plan:
+        from nudging.planning import format_plan
+        from nudging.results_store import SQLITE_SUFFIXES
+
+        summary = plan_experiment(
+            experiment_config,
+            dataset,
+            results_path,
+            max_runs=args.max_runs,
+            shard=args.shard,
+            concurrency=args.plan_concurrency,
+            history_paths=sorted(
+                path
+                for suffix in (".csv", *SQLITE_SUFFIXES)
+                for path in results_path.parent.glob(f"*{suffix}")
+            ),
+            probe=args.probe,
+        )
+        print(f"Plan for {experiment_config.name} ({summary['skipped']} completed run(s) skipped)")
+        print(format_plan(summary))
+        raise SystemExit(0)
     _configure_file_logging(log_path)
     logger.info("Selected terminal configuration: %s", args.config)
+    if args.stage == "score":
+        summary = score_experiment(experiment_config, dataset, results_path)
+        print(f"Re-scored {summary['scored']} row(s) in {results_path} "
+              f"({summary['missing']} without stored generations, {summary['stale']} stale)")
+        raise SystemExit(0)
     logger.info("Writing execution log to %s", log_path)
     run_experiment(
         experiment_config,
         dataset,
         results_path,
         max_runs=args.max_runs,
+        generation_cache=_open_generation_cache(experiment_config),
+        shard=args.shard,
+        score=args.stage == "all",
     )
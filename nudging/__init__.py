@@ -1,7 +1,7 @@
-from .models import OllamaClient
+from .models import AsyncOllamaClient, OllamaClient
 
 try:
     from .data_loader import preprocess_text, load_data
-    __all__ = ["preprocess_text", "load_data", "OllamaClient"]
+    __all__ = ["preprocess_text", "load_data", "OllamaClient", "AsyncOllamaClient"]
 except ImportError:
-    __all__ = ["OllamaClient"]
\ No newline at end of file
+    __all__ = ["OllamaClient", "AsyncOllamaClient"]
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+Content-addressed on-disk cache for Ollama generations.
+
+Entries are keyed by a hash of the full request payload (model, prompt,
+system prompt and decoding options), so a rerun of a deterministic condition
+returns the stored response instead of paying for inference again.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import logging
+logger = logging.getLogger(__name__)
+
+__all__ = ["GenerationCache", "is_cacheable"]
+
+
+def is_cacheable(payload: Dict) -> bool:
+    """Only greedy decoding or seeded sampling gives a reproducible response."""
+    if payload.get("stream"):
+        return False
+    options = payload.get("options", {})
+    return options.get("temperature") == 0 or options.get("seed") is not None
+
+
+class GenerationCache:
+    """
+    SQLite-backed response cache with least-recently-used eviction.
+
+    The stored size is tracked as a running total, so a put costs one
+    indexed lookup; the table is only summed on open and when the total
+    crosses max_bytes, which also corrects for other processes' writes.
+
+    args:
+        path: SQLite file, created with its parent directory if missing
+        max_bytes: evict least recently used responses above this total size
+    """
+
+    def __init__(self, path: str | Path, max_bytes: int = 512 * 1024 * 1024):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level="IMMEDIATE")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS generations (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS generations_last_used ON generations (last_used)"
+        )
+        self._conn.commit()
+        self._total_bytes = self._stored_bytes()
+
+    def _stored_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM generations").fetchone()[0]
+
+    @staticmethod
+    def key_for(payload: Dict) -> str:
+        """Hash everything that determines the response; streaming and keep_alive do not."""
+        keyed = {k: v for k, v in payload.items() if k not in ("stream", "keep_alive")}
+        encoded = json.dumps(keyed, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM generations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE generations SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, model: str, response: str) -> None:
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            replaced = self._conn.execute("SELECT size FROM generations WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO generations (key, model, response, size, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (key, model, response, size, now, now),
+            )
+            self._total_bytes += size - (replaced[0] if replaced else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        total = self._stored_bytes()
+        evicted = 0
+        if total > self.max_bytes:
+            for key, size in self._conn.execute(
+                "SELECT key, size FROM generations ORDER BY last_used ASC"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM generations WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+        self._total_bytes = total
+        logger.debug("evicted %s cached generation(s)", evicted)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM generations").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,189 @@
+"""
+Concurrency and pacing control for generation calls.
+
+AdaptiveConcurrencyLimiter finds how many requests a host can serve at once.
+It uses AIMD (additive increase, multiplicative decrease) driven by latency
+per generated token. While that latency stays near the best recently seen,
+the limit grows by one per window of successful requests. When latency grows,
+or a request times out or gets a 5xx, the limit is cut by a factor.
+
+TokenBucket paces request starts to a sustained rate with a bounded burst.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from nudging.models import is_server_failure
+
+import logging
+logger = logging.getLogger(__name__)
+
+__all__ = ["AdaptiveConcurrencyLimiter", "TokenBucket"]
+
+
+class _Slot:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.tokens: Optional[int] = None
+        self.seconds: Optional[float] = None
+
+    def record(self, tokens: int, seconds: Optional[float] = None) -> None:
+        """
+        Report how many tokens the request generated.
+
+        seconds is the time of the generation call itself; by default the
+        whole time the slot was held is used.
+        """
+        self.tokens = tokens
+        self.seconds = seconds
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Thread-safe AIMD limiter around blocking generation calls.
+
+    args:
+        initial_limit: in-flight requests allowed at start
+        min_limit / max_limit: bounds for the limit
+        latency_tolerance: latency per token above tolerance × baseline counts as overload
+        decrease_factor: multiplier applied to the limit on overload
+        baseline_window: recent samples the baseline (best) latency is taken from
+    """
+
+    def __init__(
+            self,
+            initial_limit: int = 1,
+            min_limit: int = 1,
+            max_limit: int = 16,
+            latency_tolerance: float = 1.5,
+            decrease_factor: float = 0.5,
+            baseline_window: int = 100,
+    ):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("Expected 1 <= min_limit <= initial_limit <= max_limit.")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._samples = deque(maxlen=baseline_window)
+        self._successes = 0
+        self._epoch = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self) -> int:
+        """Block until a slot is free; returns the epoch the request started in."""
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+            return self._epoch
+
+    def release(
+            self,
+            epoch: int,
+            latency_per_token: Optional[float] = None,
+            overloaded: bool = False,
+    ) -> None:
+        """Free a slot and adjust the limit from the request's outcome."""
+        with self._condition:
+            self._in_flight -= 1
+            if overloaded or self._is_slow(latency_per_token):
+                # requests started before the last cut saw the old load
+                if epoch == self._epoch:
+                    self._decrease()
+            elif latency_per_token is not None:
+                self._samples.append(latency_per_token)
+                self._successes += 1
+                if self._successes >= self.limit:
+                    self._increase()
+            self._condition.notify_all()
+
+    def _is_slow(self, latency_per_token: Optional[float]) -> bool:
+        if latency_per_token is None or len(self._samples) < 2:
+            return False
+        return latency_per_token > min(self._samples) * self.latency_tolerance
+
+    def _increase(self) -> None:
+        self._successes = 0
+        if self.limit < self.max_limit:
+            self._limit += 1
+            logger.info("Concurrency limit raised to %s", self.limit)
+
+    def _decrease(self) -> None:
+        previous = self.limit
+        self._limit = max(self.min_limit, math.floor(self._limit * self.decrease_factor))
+        self._successes = 0
+        self._epoch += 1
+        # forget latencies measured at the old load level
+        self._samples.clear()
+        if self.limit != previous:
+            logger.info("Concurrency limit lowered from %s to %s", previous, self.limit)
+
+    @contextmanager
+    def slot(self) -> Iterator[_Slot]:
+        """
+        Hold one in-flight slot around a generation call.
+
+        Call slot.record(tokens) after a successful call so its latency per
+        token feeds the controller; calls that never reached the server
+        (e.g. cache hits) should not record. Timeouts, connection errors and 5xx
+        responses raised inside the block count as overload.
+        """
+        epoch = self.acquire()
+        slot = _Slot()
+        try:
+            yield slot
+        except Exception as exc:
+            self.release(epoch, overloaded=is_server_failure(exc))
+            raise
+        elapsed = slot.seconds if slot.seconds is not None else time.perf_counter() - slot.started
+        latency = elapsed / slot.tokens if slot.tokens else None
+        self.release(epoch, latency_per_token=latency)
+
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter.
+
+    args:
+        rate: tokens added per second (sustained requests per second)
+        burst: bucket capacity, i.e. requests allowed back-to-back after idling
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be positive.")
+        if burst < 1:
+            raise ValueError("burst must be at least 1.")
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until it is available; returns seconds waited."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # reserve the token now so concurrent callers queue behind each other
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
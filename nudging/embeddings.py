@@ -0,0 +1,340 @@
+"""
+Batched sentence embeddings with in-memory and on-disk reuse.
+
+Semantic similarity used to encode [generated, target] for every run, so a
+target shared by every model, temperature and seed was embedded again each
+time. EmbeddingService deduplicates texts by hash and keeps recent vectors in
+memory. With an EmbeddingCache it also persists them across runs, keyed by
+embedding model and text hash. Only texts seen nowhere else are encoded,
+batch_size at a time.
+
+Two encoder backends share the same API. "sentence-transformers" loads the
+torch model. "onnx" runs the int8-quantised ONNX export of the same model
+with onnxruntime and tokenizers only, which starts faster and needs far
+less memory on CPU-only runners.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+import logging
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "DEFAULT_EMBEDDING_MODEL",
+    "EMBEDDING_BACKENDS",
+    "EmbeddingCache",
+    "EmbeddingService",
+    "OnnxEncoder",
+]
+
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_BACKENDS = ("sentence-transformers", "onnx")
+
+
+def _text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    float32 embeddings in a WAL-mode SQLite file, keyed by (model, text SHA-256).
+
+    Vectors are stored as raw bytes and read through SQLite's memory-mapped
+    I/O, so a warm lookup is a single indexed SELECT per batch.
+
+    args:
+        path: database file, created on first use
+        mmap_bytes: PRAGMA mmap_size for reads; 0 disables memory mapping
+    """
+
+    # stay below SQLite's default limit on bound parameters
+    _LOOKUP_CHUNK = 500
+
+    def __init__(self, path: str | Path, mmap_bytes: int = 256 * 1024 * 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False, isolation_level="IMMEDIATE")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA mmap_size={int(mmap_bytes)}")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, sha256)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Stored vectors for whichever keys are present."""
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), self._LOOKUP_CHUNK):
+                chunk = keys[start:start + self._LOOKUP_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT sha256, vector FROM embeddings WHERE model = ? "
+                    f"AND sha256 IN ({', '.join('?' for _ in chunk)})",
+                    (model, *chunk),
+                )
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32)
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, np.ndarray]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, sha256, dim, vector) VALUES (?, ?, ?, ?)",
+                [
+                    (model, key, vector.shape[0], np.asarray(vector, dtype=np.float32).tobytes())
+                    for key, vector in vectors.items()
+                ],
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class OnnxEncoder:
+    """
+    Mean-pooled, L2-normalised sentence embeddings from an ONNX export.
+
+    This is what sentence-transformers computes for MiniLM, without torch.
+    model_name is a local directory holding tokenizer.json and model_file,
+    or a Hugging Face repo; bare names resolve under sentence-transformers/,
+    which publishes quantised exports in its onnx/ folder.
+
+    args:
+        model_name: directory or repo of the exported model
+        model_file: ONNX file within it; the default is the int8 AVX2 export
+        max_length: word pieces kept per text, as in the original model
+        threads: onnxruntime intra-op threads; None lets it decide
+    """
+
+    def __init__(
+            self,
+            model_name: str = DEFAULT_EMBEDDING_MODEL,
+            model_file: str = "onnx/model_quint8_avx2.onnx",
+            max_length: int = 256,
+            threads: Optional[int] = None,
+    ):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as exc:
+            raise RuntimeError(
+                "The onnx embedding backend needs onnxruntime and tokenizers "
+                "(and huggingface_hub to download models)."
+            ) from exc
+
+        directory = Path(model_name)
+        if directory.is_dir():
+            model_path, tokenizer_path = directory / model_file, directory / "tokenizer.json"
+        else:
+            from huggingface_hub import hf_hub_download
+            repo = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+            model_path = hf_hub_download(repo, model_file)
+            tokenizer_path = hf_hub_download(repo, "tokenizer.json")
+
+        self.tokenizer = Tokenizer.from_file(str(tokenizer_path))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        texts = list(texts)
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+            attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+            feed = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self._input_names:
+                feed["token_type_ids"] = np.zeros_like(input_ids)
+            token_embeddings = self.session.run(None, feed)[0]
+            weights = attention_mask[..., None].astype(np.float32)
+            pooled = (token_embeddings * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+            batches.append(pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12))
+        return np.concatenate(batches).astype(np.float32) if batches else np.zeros((0, 0), dtype=np.float32)
+
+
+def _load_encoder(backend: str, model_name: str):
+    if backend == "onnx":
+        return OnnxEncoder(model_name)
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+class EmbeddingService:
+    """
+    Encode texts in batches, reusing every vector already computed.
+
+    Lookups go to memory first, then to the optional on-disk cache, and
+    only the remaining distinct texts are encoded. Thread-safe; the model is
+    loaded on the first encode, or ahead of it by warm_up().
+
+    args:
+        model_name: embedding model, also part of the cache key
+        cache: persistent EmbeddingCache shared across runs and configs
+        batch_size: texts per encode call
+        memory_entries: vectors kept in the in-process LRU
+        encoder: object with encode(texts, batch_size=...); default loads model_name
+        backend: "sentence-transformers" or "onnx"
+    """
+
+    def __init__(
+            self,
+            model_name: str = DEFAULT_EMBEDDING_MODEL,
+            cache: Optional[EmbeddingCache] = None,
+            batch_size: int = 64,
+            memory_entries: int = 50_000,
+            encoder=None,
+            backend: str = "sentence-transformers",
+    ):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unknown embedding backend: {backend!r}. Known: {list(EMBEDDING_BACKENDS)}")
+        self.model_name = model_name
+        self.backend = backend
+        # quantised vectors differ slightly, so each backend caches its own
+        self.cache_key = model_name if backend == "sentence-transformers" else f"{model_name}@{backend}"
+        self.cache = cache
+        self.batch_size = batch_size
+        self.memory_entries = memory_entries
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.encoded = 0
+        self._encoder = encoder
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def _get_encoder(self):
+        with self._load_lock:
+            if self._encoder is None:
+                started = time.perf_counter()
+                self._encoder = _load_encoder(self.backend, self.model_name)
+                logger.info(
+                    "Loaded embedding model %s (%s) in %.1fs",
+                    self.model_name,
+                    self.backend,
+                    time.perf_counter() - started,
+                )
+            return self._encoder
+
+    def warm_up(self, background: bool = True) -> Optional[threading.Thread]:
+        """
+        Load the model and run one encode, on a daemon thread by default.
+
+        A later embed() waits for a warm-up still in progress instead of
+        loading the model a second time. Failures are logged; the first
+        embed() then raises the underlying error.
+        """
+        def warm():
+            try:
+                self._get_encoder().encode(["warm-up"], batch_size=1)
+            except Exception as exc:
+                logger.warning("Embedding warm-up failed: %s", exc)
+
+        if not background:
+            warm()
+            return None
+        thread = threading.Thread(target=warm, name="embedding-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def embed(self, texts: Iterable[str]) -> np.ndarray:
+        """
+        One float32 row per text, in input order.
+
+        The lock covers only the in-memory LRU and the counters; disk lookups
+        and the encode of missing texts run outside it, so concurrent callers
+        encode in parallel. Two callers missing the same text may both encode it.
+        """
+        texts = list(texts)
+        keys = [_text_key(text) for text in texts]
+        vectors: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    vectors[key] = self._memory[key]
+            self.memory_hits += len(vectors)
+
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        stored: Dict[str, np.ndarray] = {}
+        if missing and self.cache is not None:
+            stored = self.cache.get_many(self.cache_key, missing)
+            missing = [key for key in missing if key not in stored]
+
+        fresh: Dict[str, np.ndarray] = {}
+        if missing:
+            text_for = dict(zip(keys, texts))
+            encoded = np.asarray(
+                self._get_encoder().encode([text_for[key] for key in missing], batch_size=self.batch_size),
+                dtype=np.float32,
+            )
+            fresh = dict(zip(missing, encoded))
+            if self.cache is not None:
+                self.cache.put_many(self.cache_key, fresh)
+
+        vectors.update(stored)
+        vectors.update(fresh)
+        with self._lock:
+            self.disk_hits += len(stored)
+            self.encoded += len(fresh)
+            for key, vector in vectors.items():
+                self._remember(key, vector)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([vectors[key] for key in keys])
+
+    def similarity(self, generated: Sequence[str], targets: Sequence[str]) -> np.ndarray:
+        """Cosine similarity of each pair; 0.0 where either text is blank."""
+        scores = np.zeros(len(targets))
+        rows = [row for row, (text, target) in enumerate(zip(generated, targets)) if text.strip() and target.strip()]
+        if not rows:
+            return scores
+        embeddings = self.embed([generated[row] for row in rows] + [targets[row] for row in rows])
+        left, right = embeddings[:len(rows)], embeddings[len(rows):]
+        scores[rows] = np.einsum("ij,ij->i", left, right) / (
+            np.linalg.norm(left, axis=1) * np.linalg.norm(right, axis=1)
+        )
+        return scores
+
+    def stats(self) -> Dict[str, int]:
+        return {"memory_hits": self.memory_hits, "disk_hits": self.disk_hits, "encoded": self.encoded}
@@ -1,8 +1,9 @@
 from collections import defaultdict
-from typing import Dict
+from typing import Dict, Iterable, List, Optional
 from math import ceil
-from nudging.models import OllamaClient
-from nudging.metrics import exact_match_score, fuzzy_match_score, token_overlap_score, semantic_similarity_score
+import time
+from nudging.models import GenerationTimings, OllamaClient
+from nudging.metrics import DEFAULT_METRICS, METRICS
 from nudging.prompt import build_continuation_prompt
 
 import logging
@@ -30,6 +31,42 @@ def _get_num_predict_for_target(target_word_count: int, token_multiplier: float
         return 1
     return ceil(target_word_count * token_multiplier)
 
+def prepare_prompt(content: str, percentage: float, prompt_version: str) -> tuple[str, str, str]:
+    """Split the text and build the continuation prompt; returns (prompt, context, target)."""
+    split_text = _get_split_text(content, percentage)
+    context = split_text["test_words"]
+    target = split_text["remaining_words"]
+    prompt = build_continuation_prompt(
+        version=prompt_version,
+        context_text=context,
+        target_word_count=len(target.split()),
+    )
+    return prompt, context, target
+
+
+def _stream_until_word_count(chunks, max_words: int) -> tuple[str, int, bool]:
+    """
+    Consume streamed chunks until max_words whitespace words are complete.
+
+    A word counts as complete once whitespace or a further word follows it,
+    so the stream is closed without cutting the final target word short.
+    Returns the streamed text, the number of chunks (tokens) received and
+    whether the stream was stopped before the model finished.
+    """
+    text = ""
+    streamed_tokens = 0
+    for chunk in chunks:
+        text += chunk
+        streamed_tokens += 1
+        words = len(text.split())
+        if words > max_words or (words == max_words and text[-1].isspace()):
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+            return text, streamed_tokens, True
+    return text, streamed_tokens, False
+
+
 def _generate_response(
     *,
     content: str,
@@ -39,6 +76,7 @@ def _generate_response(
     temperature: float,
     seed: int | None,
     token_multiplier: float,
+    early_stop: bool = False,
 ):
     '''
     it connects to our model and sends it the text.
@@ -46,30 +84,50 @@ def _generate_response(
     :param content: precontext string for the model to generate from
     :param percentage: how much content the model is seeing
     :param model_client: the model we are connecting to
+    :param early_stop: stream the response and close it once the target word count is reached.
+        Streams bypass the generation cache, since an early-stopped response is
+        incomplete. tokens_saved is then num_predict minus the tokens streamed:
+        an upper bound, as the model may have finished before num_predict anyway.
     '''
     logger.info("generating a response via model client.")
-    split_text = _get_split_text(content, percentage)
-    context = split_text["test_words"]
-    target = split_text["remaining_words"]
+    prompt, context, target = prepare_prompt(content, percentage, prompt_version)
     target_word_count = len(target.split())
 
-    prompt = build_continuation_prompt(
-        version=prompt_version,
-        context_text=context,
-        target_word_count=target_word_count,
-    )
-
     num_predict = _get_num_predict_for_target(
         target_word_count=target_word_count,
         token_multiplier=token_multiplier,
     )
 
-    raw_generated_response = model_client.generate(
-        prompt=prompt,
-        temperature=temperature,
-        seed=seed,
-        num_predict=num_predict,
-    )
+    early_stopped = False
+    tokens_saved = 0
+    started = time.perf_counter()
+    if early_stop:
+        chunks = model_client.generate(
+            prompt=prompt,
+            temperature=temperature,
+            seed=seed,
+            num_predict=num_predict,
+            stream=True,
+        )
+        raw_generated_response, streamed_tokens, early_stopped = _stream_until_word_count(
+            chunks,
+            target_word_count,
+        )
+        if early_stopped:
+            # upper bound: the server does not say when the model would have stopped
+            tokens_saved = max(num_predict - streamed_tokens, 0)
+        timings = getattr(chunks, "timings", None)
+    else:
+        raw_generated_response = model_client.generate(
+            prompt=prompt,
+            temperature=temperature,
+            seed=seed,
+            num_predict=num_predict,
+        )
+        timings = getattr(raw_generated_response, "timings", None)
+    if timings is None:
+        # clients without server counters still get a client-side wall time
+        timings = GenerationTimings(wall_seconds=time.perf_counter() - started)
 
     generated_response = _trim_to_n_words(
         raw_generated_response,
@@ -88,6 +146,11 @@ def _generate_response(
         "scored_length_ratio": generated_words / target_word_count if target_word_count else 0.0,
         "length_controlled": True,
         "trimmed_to_target_words": True,
+        "early_stopped": early_stopped,
+        "tokens_saved": tokens_saved,
+        **timings.as_metadata(),
+        # kept for the generation store; results files drop text columns
+        "raw_generation": str(raw_generated_response),
     }
     return generated_response, context, target, metadata
 
@@ -100,6 +163,8 @@ def run_single_experiment(
     temperature: float,
     seed: int | None,
     token_multiplier: float,
+    early_stop: bool = False,
+    metrics: Iterable[str] = ("exact_match",),
 ) -> Dict:
     """Run one experiment, return metrics dict"""
 
@@ -111,21 +176,46 @@ def run_single_experiment(
         temperature=temperature,
         seed=seed,
         token_multiplier=token_multiplier,
+        early_stop=early_stop,
     )
 
-    # Calculate exact_match metric only (for now)
-    exact_match = exact_match_score(generated=generated_response, target=target)
-
-    # Return dict with: percentage, context_words, target_words, 
-    #                   generated_words, exact_match
+    # Return dict with: percentage, context_words, target_words,
+    #                   generated_words, and the selected metrics
     return {
         "percentage": percentage,
         "context_words": len(context.split()),
         "target_words": len(target.split()),
-        "exact_match": exact_match,
+        **METRICS.score(generated_response, target, metrics),
         **generation_metadata,
     }
 
+SCORE_FIELDS = ("exact_match", "fuzzy_match", "token_overlap", "semantic_similarity")
+
+
+def selected_metrics(metrics: Optional[Iterable[str]] = None, include_semantic: bool = False) -> List[str]:
+    """Metric names to compute: metrics (default DEFAULT_METRICS), plus semantic_similarity if requested."""
+    names = list(DEFAULT_METRICS if metrics is None else metrics)
+    if include_semantic and "semantic_similarity" not in names:
+        names.append("semantic_similarity")
+    METRICS.select(names)
+    return names
+
+
+def score_response(
+    generated: str,
+    target: str,
+    include_semantic: bool = False,
+    metrics: Optional[Iterable[str]] = None,
+) -> Dict:
+    """Every score column for one generation; metrics that are not selected are None."""
+    names = selected_metrics(metrics, include_semantic)
+    return {
+        **dict.fromkeys(SCORE_FIELDS),
+        **dict.fromkeys(names),
+        **METRICS.score(generated, target, names),
+    }
+
+
 def run_experiments(
     *,
     title: str,
@@ -137,6 +227,9 @@ def run_experiments(
     seed: int | None,
     token_multiplier: float,
     include_semantic: bool = False,
+    early_stop: bool = False,
+    score: bool = True,
+    metrics: Optional[Iterable[str]] = None,
 ) -> Dict:
     """
     we first generate the response and then calculate all the metrics.
@@ -147,8 +240,10 @@ def run_experiments(
     :type percentage: float
     :param model_client: model client e.g. ollama model
     :type model_client: OllamaClient
-    :param verbose: Description
-    :type verbose: bool
+    :param score: compute the scores now; False leaves them None for a later scoring stage
+    :type score: bool
+    :param metrics: registered metric names to compute (default DEFAULT_METRICS)
+    :type metrics: Iterable[str] | None
     :return: data and all experimental results
     :rtype: Dict
     """
@@ -161,22 +256,21 @@ def run_experiments(
         temperature=temperature,
         seed=seed,
         token_multiplier=token_multiplier,
+        early_stop=early_stop,
     )
 
     # Calculate metrics
-    metrics = {
+    scores = (
+        score_response(generated_response, target, include_semantic, metrics)
+        if score
+        else dict.fromkeys([*SCORE_FIELDS, *selected_metrics(metrics, include_semantic)])
+    )
+    return {
         "content": title,
         "percentage": percentage,
         "context_words": len(context.split()),
         "target_words": len(target.split()),
-        "exact_match": exact_match_score(generated_response, target),
-        "fuzzy_match": fuzzy_match_score(generated_response, target),
-        "token_overlap": token_overlap_score(generated_response, target),
+        **scores,
         **generation_metadata,
+        "generation": generated_response,
     }
-    metrics["semantic_similarity"] = (
-        semantic_similarity_score(generated_response, target)
-        if include_semantic
-        else None
-    )
-    return metrics
@@ -0,0 +1,331 @@
+"""
+Ollama-compatible stand-in server for load and latency testing.
+
+Implements /api/tags, /api/generate and /api/chat (streaming and not) with
+configurable time-to-first-token, decode speed, parallelism and error
+injection, so OllamaClient and the runner can be benchmarked without a model.
+
+    python -m nudging.fake_ollama --port 11434 --tokens-per-second 40 --max-parallel 2
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional
+
+import logging
+logger = logging.getLogger(__name__)
+
+__all__ = ["FakeOllamaConfig", "FakeOllamaServer"]
+
+_VOCABULARY = (
+    "the night we left the city lights were burning slow and you said "
+    "nothing about the rain or the road that carried us home again"
+).split()
+
+
+@dataclass
+class FakeOllamaConfig:
+    """
+    Behaviour of the fake server.
+
+    args:
+        models: names reported by /api/tags; other models get a 404
+        ttft_seconds: delay before the first token
+        prompt_tokens_per_second: extra prompt-evaluation delay per prompt word; None disables it
+        tokens_per_second: decode speed; None streams as fast as possible
+        max_parallel: requests decoded at once, later ones queue (OLLAMA_NUM_PARALLEL)
+        error_rate: fraction of generate/chat requests answered with error_status
+        load_seconds: slept the first time a model is used; generations report it as
+            load_duration, load requests (empty prompt) report no durations, like Ollama
+        default_num_predict: tokens generated when the request sets no num_predict
+        seed: seeds error injection so failures are reproducible
+    """
+    models: List[str] = field(default_factory=lambda: ["qwen2.5:0.5b-instruct", "llama3.2:1b-instruct-q4_K_M"])
+    ttft_seconds: float = 0.0
+    prompt_tokens_per_second: Optional[float] = None
+    tokens_per_second: Optional[float] = None
+    max_parallel: int = 1
+    error_rate: float = 0.0
+    error_status: int = 500
+    load_seconds: float = 0.0
+    default_num_predict: int = 128
+    seed: int = 0
+
+
+class _Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.tokens = 0
+
+    def snapshot(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "cancelled": self.cancelled,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "tokens": self.tokens,
+            }
+
+
+class FakeOllamaServer:
+    """Threaded HTTP server; use as a context manager or call start()/stop()."""
+
+    def __init__(self, config: Optional[FakeOllamaConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeOllamaConfig()
+        self.stats = _Stats()
+        self.loaded_models: set[str] = set()
+        self._slots = threading.BoundedSemaphore(self.config.max_parallel)
+        self._random = random.Random(self.config.seed)
+        self._state_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            name="fake-ollama",
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def serve_forever(self) -> None:
+        logger.info("Fake Ollama listening on %s", self.base_url)
+        self._httpd.serve_forever()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _should_fail(self) -> bool:
+        with self._state_lock:
+            return self._random.random() < self.config.error_rate
+
+    def _load(self, model: str) -> float:
+        """Return the simulated load time, charging it only on first use."""
+        with self._state_lock:
+            if model in self.loaded_models:
+                return 0.0
+            self.loaded_models.add(model)
+        time.sleep(self.config.load_seconds)
+        return self.config.load_seconds
+
+    def _unload(self, model: str) -> None:
+        with self._state_lock:
+            self.loaded_models.discard(model)
+
+    @staticmethod
+    def _tokens(prompt: str, count: int) -> Iterator[str]:
+        offset = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16) % len(_VOCABULARY)
+        for index in range(count):
+            word = _VOCABULARY[(offset + index) % len(_VOCABULARY)]
+            yield word if index == 0 else f" {word}"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                logger.debug("fake ollama: " + format, *args)
+
+            def _send_json(self, status: int, body: Dict) -> None:
+                encoded = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def do_GET(self):
+                if self.path != "/api/tags":
+                    self._send_json(404, {"error": "not found"})
+                    return
+                self._send_json(200, {"models": [{"name": name, "model": name} for name in server.config.models]})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    self._send_json(400, {"error": "invalid JSON"})
+                    return
+                if self.path == "/api/generate":
+                    self._complete(payload, prompt=payload.get("prompt", ""), chat=False)
+                elif self.path == "/api/chat":
+                    prompt = "\n".join(m.get("content", "") for m in payload.get("messages", []))
+                    self._complete(payload, prompt=prompt, chat=True)
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def _complete(self, payload: Dict, prompt: str, chat: bool) -> None:
+                model = payload.get("model")
+                if model not in server.config.models:
+                    self._send_json(404, {"error": f"model '{model}' not found"})
+                    return
+                if payload.get("keep_alive") == 0 and not prompt:
+                    server._unload(model)
+                    self._send_json(200, {"model": model, "response": "", "done": True, "done_reason": "unload"})
+                    return
+
+                with server.stats.lock:
+                    server.stats.requests += 1
+                if server._should_fail():
+                    with server.stats.lock:
+                        server.stats.errors += 1
+                    self._send_json(server.config.error_status, {"error": "injected failure"})
+                    return
+
+                with server._slots:
+                    with server.stats.lock:
+                        server.stats.in_flight += 1
+                        server.stats.peak_in_flight = max(server.stats.peak_in_flight, server.stats.in_flight)
+                    try:
+                        self._decode(payload, model, prompt, chat)
+                    finally:
+                        with server.stats.lock:
+                            server.stats.in_flight -= 1
+                        # keep_alive 0 evicts the model once the request is done
+                        if payload.get("keep_alive") == 0:
+                            server._unload(model)
+
+            def _decode(self, payload: Dict, model: str, prompt: str, chat: bool) -> None:
+                config = server.config
+                started = time.perf_counter()
+                load_seconds = server._load(model)
+                if not prompt and not chat:
+                    # like Ollama, a load reply reports no durations
+                    self._send_json(200, {"model": model, "response": "", "done": True, "done_reason": "load"})
+                    return
+
+                prompt_tokens = len(prompt.split())
+                prompt_eval_seconds = config.ttft_seconds
+                if config.prompt_tokens_per_second:
+                    prompt_eval_seconds += prompt_tokens / config.prompt_tokens_per_second
+                time.sleep(prompt_eval_seconds)
+
+                num_predict = payload.get("options", {}).get("num_predict", config.default_num_predict)
+                delay = 1.0 / config.tokens_per_second if config.tokens_per_second else 0.0
+                stream = payload.get("stream", True)
+                decode_started = time.perf_counter()
+                pieces = []
+
+                def chunk(text: str, done: bool) -> Dict:
+                    body = {"model": model, "done": done}
+                    if chat:
+                        body["message"] = {"role": "assistant", "content": text}
+                    else:
+                        body["response"] = text
+                    return body
+
+                if stream:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+
+                for token in server._tokens(prompt, num_predict):
+                    if delay:
+                        time.sleep(delay)
+                    pieces.append(token)
+                    if stream:
+                        try:
+                            self._write_chunk(chunk(token, False))
+                        except (BrokenPipeError, ConnectionResetError):
+                            with server.stats.lock:
+                                server.stats.cancelled += 1
+                                server.stats.tokens += len(pieces)
+                            self.close_connection = True
+                            return
+
+                with server.stats.lock:
+                    server.stats.tokens += len(pieces)
+                now = time.perf_counter()
+                final = chunk("" if stream else "".join(pieces), True)
+                final.update({
+                    "done_reason": "length",
+                    "total_duration": int((now - started) * 1e9),
+                    "load_duration": int(load_seconds * 1e9),
+                    "prompt_eval_count": prompt_tokens,
+                    "prompt_eval_duration": int(prompt_eval_seconds * 1e9),
+                    "eval_count": len(pieces),
+                    "eval_duration": int((now - decode_started) * 1e9),
+                })
+                if not stream:
+                    self._send_json(200, final)
+                    return
+                try:
+                    self._write_chunk(final)
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+
+            def _write_chunk(self, body: Dict) -> None:
+                line = json.dumps(body).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run an Ollama-compatible fake server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--model", action="append", dest="models", help="Model name to serve (repeatable).")
+    parser.add_argument("--ttft", type=float, default=0.0, help="Seconds before the first token.")
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=None)
+    parser.add_argument("--tokens-per-second", type=float, default=None)
+    parser.add_argument("--max-parallel", type=int, default=1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--load-seconds", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    args = _parse_args()
+    config = FakeOllamaConfig(
+        ttft_seconds=args.ttft,
+        prompt_tokens_per_second=args.prompt_tokens_per_second,
+        tokens_per_second=args.tokens_per_second,
+        max_parallel=args.max_parallel,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        load_seconds=args.load_seconds,
+        seed=args.seed,
+    )
+    if args.models:
+        config.models = args.models
+    FakeOllamaServer(config, host=args.host, port=args.port).serve_forever()
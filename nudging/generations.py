@@ -0,0 +1,229 @@
+"""
+Persisted model outputs, so runs can be re-scored without re-running inference.
+
+The generation stage stores, per run_id, where the context and target sit in
+the source text (as word offsets) together with the raw and trimmed
+generations. The scoring stage rebuilds the target from the dataset and the
+offsets and computes any metric set from the stored text. Texts are stored
+once per distinct content and compressed.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import zlib
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib is used instead
+    zstandard = None
+
+import logging
+logger = logging.getLogger(__name__)
+
+__all__ = ["GenerationRecord", "GenerationStore", "text_sha256"]
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class GenerationRecord:
+    """
+    One run's output and the slice of its source text it is scored against.
+
+    The context is words[:context_words] of the whitespace-split text and the
+    target the following target_words words; text_sha256 detects a dataset
+    that changed since generation.
+    """
+    run_id: str
+    text_title: str
+    text_sha256: str
+    model: str
+    temperature: float
+    seed: Optional[int]
+    prompt_version: str
+    context_words: int
+    target_words: int
+    raw_generation: str
+    generation: str
+
+    def target_from(self, content: str) -> str:
+        words = content.split()
+        return " ".join(words[self.context_words:self.context_words + self.target_words])
+
+
+_COLUMNS = [field.name for field in fields(GenerationRecord)]
+_TEXT_COLUMNS = ("raw_generation", "generation")
+_RUN_COLUMNS = [column for column in _COLUMNS if column not in _TEXT_COLUMNS]
+
+
+def _default_codec() -> str:
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def _compress(text: str, codec: str) -> tuple[str, bytes]:
+    """Compress text, falling back to raw bytes when compression does not pay."""
+    data = text.encode("utf-8")
+    if codec == "zstd":
+        packed = zstandard.ZstdCompressor(level=10).compress(data)
+    elif codec == "zlib":
+        packed = zlib.compress(data, 9)
+    else:
+        raise ValueError(f"Unknown codec: {codec!r}. Known: ['zlib', 'zstd']")
+    return (codec, packed) if len(packed) < len(data) else ("raw", data)
+
+
+def _decompress(codec: str, data: bytes) -> str:
+    if codec == "raw":
+        return bytes(data).decode("utf-8")
+    if codec == "zlib":
+        return zlib.decompress(data).decode("utf-8")
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This generation store holds zstd blobs; install zstandard to read it.")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    raise ValueError(f"Unknown codec: {codec!r}")
+
+
+class GenerationStore:
+    """
+    GenerationRecords keyed by run_id, with their text in a content-addressed blob table.
+
+    Each distinct text is stored once under its SHA-256 and compressed on
+    its own (zstd when the zstandard package is installed, zlib otherwise),
+    so identical temperature-0 or fixed-seed outputs cost one blob. Reads go
+    through SQLite's memory-mapped I/O, and records() decompresses each
+    distinct text only once while scanning.
+
+    args:
+        path: database file, created on first use
+        codec: "zstd" or "zlib" for new blobs; default picks zstd when available
+        mmap_bytes: PRAGMA mmap_size for reads; 0 disables memory mapping
+    """
+
+    def __init__(self, path: str | Path, codec: Optional[str] = None, mmap_bytes: int = 256 * 1024 * 1024):
+        self.path = Path(path)
+        self.codec = codec or _default_codec()
+        _compress("", self.codec)  # reject unknown or unavailable codecs up front
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False, isolation_level="IMMEDIATE")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA mmap_size={int(mmap_bytes)}")
+        columns = ", ".join(column for column in _RUN_COLUMNS if column != "run_id")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS runs (run_id TEXT PRIMARY KEY, {columns}, raw_sha256, generation_sha256)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS blobs (sha256 TEXT PRIMARY KEY, codec TEXT, size INTEGER, data BLOB)"
+        )
+        self._conn.commit()
+
+    def _put_blob(self, text: str) -> str:
+        sha256 = text_sha256(text)
+        if self._conn.execute("SELECT 1 FROM blobs WHERE sha256 = ?", (sha256,)).fetchone() is None:
+            codec, data = _compress(text, self.codec)
+            self._conn.execute(
+                "INSERT OR IGNORE INTO blobs (sha256, codec, size, data) VALUES (?, ?, ?, ?)",
+                (sha256, codec, len(text.encode("utf-8")), data),
+            )
+        return sha256
+
+    def _text(self, sha256: str) -> str:
+        codec, data = self._conn.execute("SELECT codec, data FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        return _decompress(codec, data)
+
+    def put(self, record: GenerationRecord) -> None:
+        """Insert or replace the record for record.run_id; known texts are referenced, not re-stored."""
+        values = asdict(record)
+        with self._lock, self._conn:
+            hashes = [self._put_blob(values[column]) for column in _TEXT_COLUMNS]
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO runs ({', '.join(_RUN_COLUMNS)}, raw_sha256, generation_sha256) "
+                f"VALUES ({', '.join('?' for _ in range(len(_RUN_COLUMNS) + 2))})",
+                [values[column] for column in _RUN_COLUMNS] + hashes,
+            )
+
+    def get(self, run_id: str) -> Optional[GenerationRecord]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_RUN_COLUMNS)}, raw_sha256, generation_sha256 FROM runs WHERE run_id = ?",
+                (run_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            return self._record(row, self._text)
+
+    def _record(self, row, text_for) -> GenerationRecord:
+        *run_values, raw_sha256, generation_sha256 = row
+        values = dict(zip(_RUN_COLUMNS, run_values))
+        return GenerationRecord(
+            **values,
+            raw_generation=text_for(raw_sha256),
+            generation=text_for(generation_sha256),
+        )
+
+    def records(self) -> Iterator[GenerationRecord]:
+        """Every record in insertion order, decompressing each distinct text once."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_RUN_COLUMNS)}, raw_sha256, generation_sha256 FROM runs ORDER BY rowid"
+            ).fetchall()
+            texts = {
+                sha256: _decompress(codec, data)
+                for sha256, codec, data in self._conn.execute("SELECT sha256, codec, data FROM blobs")
+            }
+        for row in rows:
+            yield self._record(row, texts.__getitem__)
+
+    def prune(self) -> int:
+        """Delete blobs no run references any more; returns how many were removed."""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                """
+                DELETE FROM blobs WHERE sha256 NOT IN (
+                    SELECT raw_sha256 FROM runs UNION SELECT generation_sha256 FROM runs
+                )
+                """
+            ).rowcount
+
+    def stats(self) -> dict:
+        """Runs, distinct texts, and text bytes before and after compression."""
+        with self._lock:
+            runs = self._conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+            blobs, text_bytes, stored_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM blobs"
+            ).fetchone()
+            referenced_bytes = self._conn.execute(
+                """
+                SELECT COALESCE(SUM(raw.size + generation.size), 0) FROM runs
+                JOIN blobs AS raw ON raw.sha256 = runs.raw_sha256
+                JOIN blobs AS generation ON generation.sha256 = runs.generation_sha256
+                """
+            ).fetchone()[0]
+        return {
+            "runs": runs,
+            "blobs": blobs,
+            "referenced_bytes": referenced_bytes,
+            "text_bytes": text_bytes,
+            "stored_bytes": stored_bytes,
+        }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
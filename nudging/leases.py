@@ -0,0 +1,160 @@
+"""
+Lease-based claiming of runs shared by several runner processes.
+
+Each runner claims a run_id before generating it. A claim is a row in a
+small SQLite table holding the owner and an expiry time. A background
+heartbeat keeps the leases a live runner holds from expiring. If a runner
+dies, its leases lapse and the next runner to reach those runs takes them
+over. Finished runs are marked done and are never claimed again, so runners
+that share a lease file never generate the same condition twice.
+"""
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import logging
+logger = logging.getLogger(__name__)
+
+__all__ = ["RunLeaseQueue"]
+
+
+class RunLeaseQueue:
+    """
+    Exclusive, expiring claims on run IDs in a WAL-mode SQLite file.
+
+    args:
+        path: lease database shared by the cooperating runners
+        owner: identity written with each claim (default: host, pid and a random suffix)
+        lease_seconds: how long a claim survives without a heartbeat
+        heartbeat_seconds: renewal interval (default: a third of lease_seconds)
+    """
+
+    def __init__(
+            self,
+            path: str | Path,
+            owner: Optional[str] = None,
+            lease_seconds: float = 600.0,
+            heartbeat_seconds: Optional[float] = None,
+    ):
+        if lease_seconds <= 0:
+            raise ValueError("lease_seconds must be positive.")
+        self.path = Path(path)
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds or lease_seconds / 3
+        self._held: set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False, isolation_level="IMMEDIATE")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS leases (
+                run_id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                done INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.commit()
+
+    def claim(self, run_id: str) -> bool:
+        """Take the lease on run_id unless it is done or held by a live runner."""
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                """
+                INSERT INTO leases (run_id, owner, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(run_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE leases.done = 0 AND (leases.expires_at < ? OR leases.owner = excluded.owner)
+                """,
+                (run_id, self.owner, now + self.lease_seconds, now),
+            )
+            if cursor.rowcount == 0:
+                return False
+            self._held.add(run_id)
+            return True
+
+    def complete(self, run_id: str) -> None:
+        """Mark run_id done; call only once its result is durably stored."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE leases SET done = 1 WHERE run_id = ? AND owner = ?",
+                (run_id, self.owner),
+            )
+            self._held.discard(run_id)
+
+    def release(self, run_id: str) -> None:
+        """Give up an unfinished lease so another runner may retry the run."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM leases WHERE run_id = ? AND owner = ? AND done = 0",
+                (run_id, self.owner),
+            )
+            self._held.discard(run_id)
+
+    def renew(self) -> int:
+        """Extend every lease this runner holds; returns how many were renewed."""
+        with self._lock, self._conn:
+            if not self._held:
+                return 0
+            cursor = self._conn.execute(
+                "UPDATE leases SET expires_at = ? WHERE owner = ? AND done = 0",
+                (time.time() + self.lease_seconds, self.owner),
+            )
+            return cursor.rowcount
+
+    def start_heartbeat(self) -> None:
+        """Renew held leases from a daemon thread until close()."""
+        if self._heartbeat is not None:
+            return
+
+        def beat():
+            while not self._stop.wait(self.heartbeat_seconds):
+                try:
+                    self.renew()
+                except sqlite3.Error as exc:
+                    logger.warning("Lease heartbeat failed: %s", exc)
+
+        self._heartbeat = threading.Thread(target=beat, name="lease-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def counts(self) -> dict:
+        """Done, live and expired lease counts across all runners."""
+        with self._lock:
+            done, live, expired = self._conn.execute(
+                """
+                SELECT
+                    COALESCE(SUM(done = 1), 0),
+                    COALESCE(SUM(done = 0 AND expires_at >= ?), 0),
+                    COALESCE(SUM(done = 0 AND expires_at < ?), 0)
+                FROM leases
+                """,
+                (time.time(), time.time()),
+            ).fetchone()
+        return {"done": done, "live": live, "expired": expired}
+
+    def close(self) -> None:
+        """Stop the heartbeat, release unfinished leases and close the database."""
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+        for run_id in list(self._held):
+            self.release(run_id)
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,23 +1,37 @@
-from rapidfuzz import fuzz
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import partial
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from rapidfuzz import fuzz, process
 import numpy as np
 
 import logging
 logger = logging.getLogger(__name__)
 
-semantic_model = None
+_embedding_service = None
+
+
+def get_embedding_service():
+    """The EmbeddingService semantic similarity uses; created on first use without a disk cache."""
+    global _embedding_service
+    if _embedding_service is None:
+        from nudging.embeddings import EmbeddingService
+        _embedding_service = EmbeddingService()
+    return _embedding_service
 
 
-def _get_semantic_model():
-    """Load the embedding model only when semantic similarity is requested."""
-    global semantic_model
-    if semantic_model is None:
-        from sentence_transformers import SentenceTransformer
-        semantic_model = SentenceTransformer('all-MiniLM-L6-v2')
-    return semantic_model
+def set_embedding_service(service) -> None:
+    """Route semantic similarity through service, e.g. one backed by an EmbeddingCache."""
+    global _embedding_service
+    _embedding_service = service
+
 
 def exact_match_score(generated:str,target:str) -> float:
     """Simple exact character match"""
-    logger.info('calculating exact match')
+    logger.debug('calculating exact match')
     generated_cleaned = generated.lower().strip()
     target_cleaned = target.lower().strip()
     if not target_cleaned:
@@ -28,11 +42,11 @@ def exact_match_score(generated:str,target:str) -> float:
 def fuzzy_match_score(generated:str, target:str) -> float:
     """compare 2 texts using fuzzy matching (Levenshtein distance).
     Returns between 0.0 -> 1.0 (the higher, the more similar)"""
-    logger.info('calculating fuzzy match')
+    logger.debug('calculating fuzzy match')
     return fuzz.ratio(generated.lower(), target.lower()) / 100.0
 
 def token_overlap_score(generated:str, target:str) -> float:
-    logger.info('calculating token overlap')
+    logger.debug('calculating token overlap')
     generated_tokens = set(generated.lower().split())
     target_tokens = set(target.lower().split())
     if not target_tokens:
@@ -43,13 +57,313 @@ def token_overlap_score(generated:str, target:str) -> float:
 
 def semantic_similarity_score(generated:str, target:str) -> float:
     "cosine similarity of embeddings"
-    logger.info('calculating semantic similarity')
+    logger.debug('calculating semantic similarity')
 
     if not generated.strip() or not target.strip():
         return 0.0
-    semantic_model = _get_semantic_model()
-    embeddings = semantic_model.encode([generated, target])
-    similarity = np.dot(embeddings[0], embeddings[1]) / (
-        np.linalg.norm(embeddings[0]) * np.linalg.norm(embeddings[1])
+    return float(get_embedding_service().similarity([generated], [target])[0])
+
+def _words(text: str) -> list[str]:
+    return text.lower().split()
+
+
+def _longest_common_span(generated: list[str], target: list[str]) -> int:
+    """Longest run of consecutive words shared by both, via a suffix automaton of target.
+
+    Building the automaton and walking generated through it are both linear
+    in the number of words.
+    """
+    # states: outgoing transitions, suffix link and longest match length
+    transitions: list[dict] = [{}]
+    links = [-1]
+    lengths = [0]
+    last = 0
+    for word in target:
+        current = len(lengths)
+        transitions.append({})
+        links.append(0)
+        lengths.append(lengths[last] + 1)
+        state = last
+        while state != -1 and word not in transitions[state]:
+            transitions[state][word] = current
+            state = links[state]
+        if state != -1:
+            following = transitions[state][word]
+            if lengths[state] + 1 == lengths[following]:
+                links[current] = following
+            else:
+                clone = len(lengths)
+                transitions.append(dict(transitions[following]))
+                links.append(links[following])
+                lengths.append(lengths[state] + 1)
+                while state != -1 and transitions[state].get(word) == following:
+                    transitions[state][word] = clone
+                    state = links[state]
+                links[following] = clone
+                links[current] = clone
+        last = current
+
+    best = matched = state = 0
+    for word in generated:
+        while state and word not in transitions[state]:
+            state = links[state]
+            matched = lengths[state]
+        if word in transitions[state]:
+            state = transitions[state][word]
+            matched += 1
+            best = max(best, matched)
+    return best
+
+
+def longest_common_span_score(generated: str, target: str) -> float:
+    """Longest verbatim word span shared with the target, as a share of the target's words."""
+    target_words = _words(target)
+    if not target_words:
+        return 0.0
+    return _longest_common_span(_words(generated), target_words) / len(target_words)
+
+
+def _ngram_counts(words: list[str], n: int) -> Counter:
+    return Counter(tuple(words[start:start + n]) for start in range(len(words) - n + 1))
+
+
+def _matching_ngrams(generated: str, target: str, n: int) -> tuple[int, int, int]:
+    """Clipped shared n-grams, and the generated and target n-gram totals."""
+    generated_ngrams = _ngram_counts(_words(generated), n)
+    target_ngrams = _ngram_counts(_words(target), n)
+    matched = sum((generated_ngrams & target_ngrams).values())
+    return matched, sum(generated_ngrams.values()), sum(target_ngrams.values())
+
+
+def ngram_precision_score(generated: str, target: str, n: int = 8) -> float:
+    """Share of the generation's word n-grams that occur in the target (counts clipped)."""
+    matched, generated_total, _ = _matching_ngrams(generated, target, n)
+    return matched / generated_total if generated_total else 0.0
+
+
+def ngram_recall_score(generated: str, target: str, n: int = 8) -> float:
+    """Share of the target's word n-grams reproduced by the generation (counts clipped)."""
+    matched, _, target_total = _matching_ngrams(generated, target, n)
+    return matched / target_total if target_total else 0.0
+
+
+def _lcs_length(generated: list[str], target: list[str]) -> int:
+    """Word LCS length with bit-parallel rows: one big-integer update per generated word."""
+    positions: Dict[str, int] = {}
+    for index, word in enumerate(target):
+        positions[word] = positions.get(word, 0) | (1 << index)
+    mask = (1 << len(target)) - 1
+    # zero bits of row mark the target positions where the LCS grows
+    row = mask
+    for word in generated:
+        matches = row & positions.get(word, 0)
+        row = ((row + matches) | (row - matches)) & mask
+    return len(target) - bin(row).count("1")
+
+
+def rouge_l_score(generated: str, target: str) -> float:
+    """ROUGE-L F1 over lowercased words."""
+    generated_words = _words(generated)
+    target_words = _words(target)
+    if not generated_words or not target_words:
+        return 0.0
+    lcs = _lcs_length(generated_words, target_words)
+    if not lcs:
+        return 0.0
+    precision = lcs / len(generated_words)
+    recall = lcs / len(target_words)
+    return 2 * precision * recall / (precision + recall)
+
+
+def _code_points(texts: Iterable[str]) -> np.ndarray:
+    return np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32)
+
+
+def _segment_sums(values: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Sum consecutive runs of values with the given lengths (zero lengths allowed)."""
+    totals = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+    ends = np.cumsum(lengths)
+    return totals[ends] - totals[ends - lengths]
+
+
+def _exact_match_batch(generated: list[str], targets: list[str]) -> np.ndarray:
+    generated = [text.lower().strip() for text in generated]
+    targets = [text.lower().strip() for text in targets]
+    target_lengths = np.fromiter(map(len, targets), dtype=np.int64, count=len(targets))
+    overlaps = np.minimum(np.fromiter(map(len, generated), dtype=np.int64, count=len(generated)), target_lengths)
+    # only the first min(len) characters of each pair can match
+    equal = (
+        _code_points(text[:overlap] for text, overlap in zip(generated, overlaps.tolist()))
+        == _code_points(text[:overlap] for text, overlap in zip(targets, overlaps.tolist()))
     )
-    return float(similarity)
+    matches = _segment_sums(equal, overlaps)
+    return np.divide(matches, target_lengths, out=np.zeros(len(targets)), where=target_lengths > 0)
+
+
+def _fuzzy_match_batch(generated: list[str], targets: list[str]) -> np.ndarray:
+    if not generated:
+        return np.zeros(0)
+    return process.cpdist(
+        [text.lower() for text in generated],
+        [text.lower() for text in targets],
+        scorer=fuzz.ratio,
+        dtype=np.float64,
+        workers=-1,
+    ) / 100.0
+
+
+def _token_set_counts(generated: str, target: str) -> tuple[int, int, int]:
+    generated_tokens = set(generated.lower().split())
+    target_tokens = set(target.lower().split())
+    shared = len(generated_tokens & target_tokens)
+    return shared, len(generated_tokens) + len(target_tokens) - shared, len(target_tokens)
+
+
+def _token_overlap_batch(generated: list[str], targets: list[str]) -> np.ndarray:
+    """Jaccard overlap of token sets; each pair's sets are freed before the next is built."""
+    counts = np.fromiter(
+        map(_token_set_counts, generated, targets),
+        dtype=np.dtype((np.int64, 3)),
+        count=len(targets),
+    ).reshape(-1, 3)
+    shared, union, target_sizes = counts.T
+    return np.divide(shared, union, out=np.zeros(len(targets)), where=target_sizes > 0)
+
+
+def _semantic_similarity_batch(generated: list[str], targets: list[str]) -> np.ndarray:
+    return get_embedding_service().similarity(generated, targets)
+
+
+METRIC_COSTS = ("cheap", "moderate", "expensive")
+NGRAM_SIZES = (4, 8, 16)
+
+
+@dataclass(frozen=True)
+class Metric:
+    """
+    A named score of one generation against its target.
+
+    score handles one pair; batch, when given, scores whole columns and must
+    agree with score. cost is one of METRIC_COSTS and only informs selection.
+    """
+    name: str
+    score: Callable[[str, str], float]
+    batch: Optional[Callable[[List[str], List[str]], np.ndarray]] = None
+    cost: str = "cheap"
+
+    @property
+    def batchable(self) -> bool:
+        return self.batch is not None
+
+
+class MetricRegistry:
+    """Metrics by name, plus the cumulative time each has spent scoring."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._seconds: Dict[str, float] = defaultdict(float)
+        self._pairs: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.cost not in METRIC_COSTS:
+            raise ValueError(f"Unknown cost class: {metric.cost!r}. Known: {list(METRIC_COSTS)}")
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name!r} is already registered.")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def names(self, cost: Optional[str] = None) -> List[str]:
+        return [name for name, metric in self._metrics.items() if cost is None or metric.cost == cost]
+
+    def select(self, names: Iterable[str]) -> List[Metric]:
+        """The named metrics in the given order; unknown names raise ValueError."""
+        names = list(names)
+        unknown = [name for name in names if name not in self._metrics]
+        if unknown:
+            raise ValueError(f"Unknown metric(s): {unknown}. Known: {self.names()}")
+        return [self._metrics[name] for name in names]
+
+    def _timed(self, metric: Metric, pairs: int, compute):
+        started = time.perf_counter()
+        try:
+            return compute()
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._seconds[metric.name] += elapsed
+                self._pairs[metric.name] += pairs
+
+    def score(self, generated: str, target: str, names: Iterable[str]) -> Dict[str, float]:
+        """Compute only the named metrics for one pair."""
+        return {
+            metric.name: self._timed(metric, 1, lambda: metric.score(generated, target))
+            for metric in self.select(names)
+        }
+
+    def score_batch(
+            self,
+            generated: Sequence[str],
+            targets: Sequence[str],
+            names: Iterable[str],
+    ) -> Dict[str, np.ndarray]:
+        """Compute only the named metrics for every pair, batched where the metric allows."""
+        generated = list(generated)
+        targets = list(targets)
+        if len(generated) != len(targets):
+            raise ValueError(f"Got {len(generated)} generations for {len(targets)} targets.")
+        metrics = self.select(names)
+        logger.debug('scoring %s pairs: %s', len(generated), [metric.name for metric in metrics])
+
+        def column(metric: Metric) -> np.ndarray:
+            if metric.batchable:
+                return np.asarray(metric.batch(generated, targets), dtype=np.float64)
+            return np.fromiter(map(metric.score, generated, targets), dtype=np.float64, count=len(targets))
+
+        return {metric.name: self._timed(metric, len(targets), lambda: column(metric)) for metric in metrics}
+
+    def timings(self) -> Dict[str, Dict[str, float]]:
+        """Pairs scored and seconds spent per metric since the last reset."""
+        with self._lock:
+            return {
+                name: {"pairs": self._pairs[name], "seconds": self._seconds[name]}
+                for name in self._metrics
+                if self._pairs[name]
+            }
+
+    def reset_timings(self) -> None:
+        with self._lock:
+            self._seconds.clear()
+            self._pairs.clear()
+
+
+METRICS = MetricRegistry()
+METRICS.register(Metric("exact_match", exact_match_score, _exact_match_batch))
+METRICS.register(Metric("fuzzy_match", fuzzy_match_score, _fuzzy_match_batch))
+METRICS.register(Metric("token_overlap", token_overlap_score, _token_overlap_batch))
+METRICS.register(Metric("semantic_similarity", semantic_similarity_score, _semantic_similarity_batch, "expensive"))
+# verbatim-memorisation metrics over lowercased words, linear or near-linear in text length
+METRICS.register(Metric("longest_common_span", longest_common_span_score))
+for _n in NGRAM_SIZES:
+    METRICS.register(Metric(f"ngram_precision_{_n}", partial(ngram_precision_score, n=_n)))
+    METRICS.register(Metric(f"ngram_recall_{_n}", partial(ngram_recall_score, n=_n)))
+METRICS.register(Metric("rouge_l", rouge_l_score, cost="moderate"))
+
+DEFAULT_METRICS = ("exact_match", "fuzzy_match", "token_overlap")
+
+
+def score_batch(
+        generated: Sequence[str],
+        targets: Sequence[str],
+        metrics: Iterable[str] = DEFAULT_METRICS,
+) -> Dict[str, np.ndarray]:
+    """Score generated[i] against targets[i] for every i.
+
+    Returns one float64 array per requested metric, equal to calling the
+    matching *_score function on each pair but without the per-pair Python
+    overhead: fuzzy ratios go through rapidfuzz's pairwise cpdist, exact
+    and token scores are computed with NumPy over the whole batch, and
+    semantic similarity embeds each distinct text once through the
+    embedding service.
+    """
+    return METRICS.score_batch(generated, targets, metrics)
@@ -1,13 +1,157 @@
 import requests
-from typing import List, Dict, Optional, Iterator
-from dataclasses import dataclass
+import requests.adapters
+from typing import TYPE_CHECKING, AsyncIterator, List, Dict, Optional, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from functools import partial
+import asyncio
 import json
 import subprocess
 import time
 
+from nudging.cache import GenerationCache, is_cacheable
+
+if TYPE_CHECKING:
+    from nudging.concurrency import AdaptiveConcurrencyLimiter
+
 import logging
 logger = logging.getLogger(__name__)
 
+def is_server_failure(exc: Exception) -> bool:
+    """Transport errors, timeouts and 5xx responses; 4xx are the caller's fault."""
+    if isinstance(exc, requests.HTTPError):
+        response = exc.response
+        return response is None or response.status_code >= 500
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout))
+
+
+def wait_until(
+        predicate,
+        timeout: float,
+        initial_interval: float = 0.05,
+        max_interval: float = 1.0,
+) -> bool:
+    """Poll predicate with exponential backoff until it is true or timeout passes."""
+    deadline = time.monotonic() + timeout
+    interval = initial_interval
+    while True:
+        if predicate():
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(interval, remaining))
+        interval = min(interval * 2, max_interval)
+
+
+@dataclass
+class GenerationTimings:
+    """
+    Server counters and client wall time for one generation.
+
+    Ollama reports durations in nanoseconds; they are stored here in seconds.
+    Counters stay None when the server sent none, i.e. for cache hits and
+    for streams closed before their final chunk.
+    """
+    wall_seconds: float
+    total_seconds: Optional[float] = None
+    load_seconds: Optional[float] = None
+    prompt_eval_count: Optional[int] = None
+    prompt_eval_seconds: Optional[float] = None
+    eval_count: Optional[int] = None
+    eval_seconds: Optional[float] = None
+    cache_hit: bool = False
+
+    @classmethod
+    def from_response(cls, data: Dict, wall_seconds: float) -> "GenerationTimings":
+        def seconds(key: str) -> Optional[float]:
+            value = data.get(key)
+            return None if value is None else value / 1e9
+
+        return cls(
+            wall_seconds=wall_seconds,
+            total_seconds=seconds("total_duration"),
+            load_seconds=seconds("load_duration"),
+            prompt_eval_count=data.get("prompt_eval_count"),
+            prompt_eval_seconds=seconds("prompt_eval_duration"),
+            eval_count=data.get("eval_count"),
+            eval_seconds=seconds("eval_duration"),
+        )
+
+    @property
+    def eval_tokens_per_second(self) -> Optional[float]:
+        if not self.eval_count or not self.eval_seconds:
+            return None
+        return self.eval_count / self.eval_seconds
+
+    @property
+    def prompt_eval_tokens_per_second(self) -> Optional[float]:
+        if not self.prompt_eval_count or not self.prompt_eval_seconds:
+            return None
+        return self.prompt_eval_count / self.prompt_eval_seconds
+
+    def as_metadata(self) -> Dict:
+        """Flat dict of the timing columns written with each result row."""
+        return {
+            **asdict(self),
+            "eval_tokens_per_second": self.eval_tokens_per_second,
+            "prompt_eval_tokens_per_second": self.prompt_eval_tokens_per_second,
+        }
+
+
+class GeneratedText(str):
+    """Response text that also carries the GenerationTimings of its call."""
+
+    def __new__(cls, text: str, timings: Optional[GenerationTimings] = None):
+        generated = super().__new__(cls, text)
+        generated.timings = timings
+        return generated
+
+
+class _TimedChunks:
+    """
+    Iterator over streamed chunks that records timings from the final chunk.
+
+    Closing it closes the connection, which makes Ollama stop decoding.
+    """
+
+    def __init__(self, resp: requests.Response, started: float, extract):
+        self.timings: Optional[GenerationTimings] = None
+        self._resp = resp
+        self._started = started
+        self._chunks = self._iterate(extract)
+
+    def _iterate(self, extract) -> Iterator[str]:
+        try:
+            for line in self._resp.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line.decode("utf-8"))
+                if data.get("done"):
+                    self.timings = GenerationTimings.from_response(data, time.perf_counter() - self._started)
+                chunk = extract(data)
+                if chunk:
+                    yield chunk
+        finally:
+            self._finish()
+
+    def _finish(self) -> None:
+        self._resp.close()
+        if self.timings is None:
+            self.timings = GenerationTimings(wall_seconds=time.perf_counter() - self._started)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        return next(self._chunks)
+
+    def close(self) -> None:
+        self._chunks.close()
+        # a generator closed before its first chunk never runs its finally
+        self._finish()
+
+
 @dataclass
 class OllamaClient:
     """
@@ -20,11 +164,49 @@ class OllamaClient:
     timeout: int = 120
     max_tokens: Optional[int] = None
     words_to_token_multiplier: float = 1.2
+    pool_maxsize: int = 10
+    http_keep_alive: bool = True
+    keep_alive: Optional[str | int] = None
+    session: Optional[requests.Session] = field(default=None, repr=False, compare=False)
+    cache: Optional[GenerationCache] = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.session is None:
+            self.session = self._build_session()
+
+    def _build_session(self) -> requests.Session:
+        """
+        Create the pooled HTTP session reused for every call from this client.
+
+        pool_block caps open connections at pool_maxsize, so worker threads
+        sharing one client wait for a free connection instead of opening
+        throwaway ones.
+        """
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=True,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers["Connection"] = "keep-alive" if self.http_keep_alive else "close"
+        return session
+
+    def close(self) -> None:
+        """Release pooled connections."""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def is_running(self) -> bool:
         """Return whether the configured Ollama endpoint is reachable."""
         try:
-            resp = requests.get(
+            resp = self.session.get(
                 f"{self.base_url.rstrip('/')}/api/tags",
                 timeout=2,
             )
@@ -36,9 +218,15 @@ class OllamaClient:
     def ensure_running(
             self,
             start_if_needed: bool = True,
-            startup_wait_seconds: float = 3.0,
+            startup_wait_seconds: float = 30.0,
     ) -> bool:
-        """Check Ollama availability, optionally starting the local service."""
+        """
+        Check Ollama availability, optionally starting the local service.
+
+        After starting `ollama serve` the endpoint is polled with backoff, so
+        this returns as soon as the server answers, or False after
+        startup_wait_seconds.
+        """
         if self.is_running():
             return True
 
@@ -51,15 +239,31 @@ class OllamaClient:
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
         )
-        time.sleep(startup_wait_seconds)
-        return self.is_running()
+        return wait_until(self.is_running, timeout=startup_wait_seconds)
+
+    def load(self, keep_alive: Optional[str | int] = None) -> Dict:
+        """
+        Load the model into memory without generating.
+
+        Ollama loads the model for an empty prompt and answers with
+        done_reason "load"; the reply carries no load_duration.
+        """
+        payload = {"model": self.model, "prompt": ""}
+        keep_alive = self.keep_alive if keep_alive is None else keep_alive
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        return self._post("/api/generate", payload).json()
+
+    def unload(self) -> None:
+        """Ask Ollama to evict the model from memory now."""
+        self._post("/api/generate", {"model": self.model, "keep_alive": 0})
 
     def _post(self, path:str, payload:Dict, stream:bool=False):
         """
         Helps makes HTTP post requests.
         """
         url = f"{self.base_url.rstrip('/')}{path}"
-        resp = requests.post(
+        resp = self.session.post(
             url,
             json=payload,
             timeout=self.timeout,
@@ -70,23 +274,16 @@ class OllamaClient:
 
 # TODO: add network retry logic
 
-    def generate(
+    def _build_generate_payload(
             self,
             prompt: str,
             system: Optional[str] = None,
             temperature: float = 0.7,
             stream: bool = False,
+            keep_alive: Optional[str | int] = None,
             **extra
-    ) -> str | Iterator[str]:
-        """
-        prompt-based text generation function.
-
-        params:
-            - prompt: str
-            - system: str
-            - temperature: float creativity param
-            - max_tokens: int  
-        """
+    ) -> Dict:
+        """Build the /api/generate request body shared by sync and async calls."""
         payload = {
             "model": self.model,
             "prompt": prompt,
@@ -99,6 +296,9 @@ class OllamaClient:
 
         if system:
             payload["system"] = system
+        keep_alive = self.keep_alive if keep_alive is None else keep_alive
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
         if self.max_tokens is not None:
             num_predict = int(self.max_tokens * self.words_to_token_multiplier)
             payload["options"]["num_predict"] = num_predict
@@ -108,32 +308,16 @@ class OllamaClient:
             """)
         
         payload["options"].update(extra)
+        return payload
 
-        resp = self._post("/api/generate", payload, stream=stream)
-
-        if not stream:
-            return resp.json().get("response", "")
-        
-        def _iter_chunks() -> Iterator[str]:
-            for line in resp.iter_lines():
-                if not line:
-                    continue
-                data = json.loads(line.decode("utf-8"))
-                chunk = data.get("response")
-                if chunk:
-                    yield chunk
-        return _iter_chunks()
-    
-    def chat(
+    def _build_chat_payload(
             self,
             messages: List[Dict[str, str]],
             temperature: float = 0.7,
             stream: bool = False,
             **extra,
-    ) -> str | Iterator[str]:
-        """
-        Multi-turn conversation function.
-        """
+    ) -> Dict:
+        """Build the /api/chat request body shared by sync and async calls."""
         payload = {
             "model": self.model,
             "messages": messages,
@@ -143,25 +327,222 @@ class OllamaClient:
             }
         }
 
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
         if self.max_tokens is not None:
             num_predict = int(self.max_tokens * self.words_to_token_multiplier)
             payload["options"]["num_predict"] = num_predict
         
         payload["options"].update(extra)
+        return payload
 
+    def generate(
+            self,
+            prompt: str,
+            system: Optional[str] = None,
+            temperature: float = 0.7,
+            stream: bool = False,
+            keep_alive: Optional[str | int] = None,
+            **extra
+    ) -> str | Iterator[str]:
+        """
+        prompt-based text generation function.
+
+        The text is a GeneratedText whose .timings holds Ollama's counters
+        and the client wall time; a stream exposes .timings once it has been
+        consumed or closed.
+
+        params:
+            - prompt: str
+            - system: str
+            - temperature: float creativity param
+            - keep_alive: overrides the client's keep_alive for this request
+            - max_tokens: int  
+        """
+        payload = self._build_generate_payload(
+            prompt,
+            system=system,
+            temperature=temperature,
+            stream=stream,
+            keep_alive=keep_alive,
+            **extra,
+        )
+
+        started = time.perf_counter()
+        cache_key = None
+        if self.cache is not None and is_cacheable(payload):
+            cache_key = self.cache.key_for(payload)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return GeneratedText(cached, GenerationTimings(
+                    wall_seconds=time.perf_counter() - started,
+                    cache_hit=True,
+                ))
+
+        resp = self._post("/api/generate", payload, stream=stream)
+
+        if not stream:
+            data = resp.json()
+            response = data.get("response", "")
+            if cache_key is not None:
+                self.cache.put(cache_key, self.model, response)
+            return GeneratedText(response, GenerationTimings.from_response(data, time.perf_counter() - started))
+
+        return _TimedChunks(resp, started, lambda data: data.get("response"))
+    
+    def chat(
+            self,
+            messages: List[Dict[str, str]],
+            temperature: float = 0.7,
+            stream: bool = False,
+            **extra,
+    ) -> str | Iterator[str]:
+        """
+        Multi-turn conversation function.
+        """
+        payload = self._build_chat_payload(
+            messages,
+            temperature=temperature,
+            stream=stream,
+            **extra,
+        )
+
+        started = time.perf_counter()
         resp = self._post("/api/chat", payload, stream=stream)
 
         if not stream:
             data = resp.json()
-            return data.get("message", {}).get("content", "")
-        
-        def _iter_chunks() -> Iterator[str]:
-            for line in resp.iter_lines():
-                if not line:
-                    continue
-                data = json.loads(line.decode("utf-8"))
-                msg = data.get("message", {})
-                chunk = msg.get("content")
-                if chunk:
+            return GeneratedText(
+                data.get("message", {}).get("content", ""),
+                GenerationTimings.from_response(data, time.perf_counter() - started),
+            )
+
+        return _TimedChunks(resp, started, lambda data: data.get("message", {}).get("content"))
+
+
+@dataclass
+class AsyncOllamaClient:
+    """
+    asyncio counterpart to OllamaClient with a bounded number of in-flight requests.
+
+    Requests reuse OllamaClient's payload building and HTTP handling, and run on
+    a dedicated thread pool so up to ``max_in_flight`` generations can be served
+    by Ollama at once (see OLLAMA_NUM_PARALLEL on the server side).
+
+    With a limiter, non-streaming calls are additionally gated by its adaptive
+    limit and max_in_flight defaults to the limiter's max_limit; passing a
+    different max_in_flight as well is an error.
+    """
+    client: OllamaClient = field(default_factory=OllamaClient)
+    max_in_flight: Optional[int] = None
+    limiter: Optional["AdaptiveConcurrencyLimiter"] = None
+
+    def __post_init__(self):
+        if self.limiter is not None:
+            if self.max_in_flight not in (None, self.limiter.max_limit):
+                raise ValueError(
+                    f"max_in_flight={self.max_in_flight} conflicts with the limiter's "
+                    f"max_limit={self.limiter.max_limit}; pass only one of them."
+                )
+            self.max_in_flight = self.limiter.max_limit
+        elif self.max_in_flight is None:
+            self.max_in_flight = 4
+        if self.max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1.")
+        if self.max_in_flight > self.client.pool_maxsize:
+            logger.warning(
+                "max_in_flight=%s exceeds pool_maxsize=%s; requests will queue for connections.",
+                self.max_in_flight,
+                self.client.pool_maxsize,
+            )
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_in_flight,
+            thread_name_prefix="ollama",
+        )
+
+    @property
+    def model(self) -> str:
+        return self.client.model
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    def _call_limited(self, func, *args, **kwargs) -> str:
+        """Acquire, call and release in one worker thread so slot holders never wait for a thread."""
+        with self.limiter.slot() as slot:
+            response = func(*args, **kwargs)
+            timings = getattr(response, "timings", None)
+            # a cache hit says nothing about server load
+            if timings is None:
+                slot.record(len(response.split()))
+            elif not timings.cache_hit:
+                slot.record(timings.eval_count or len(response.split()), seconds=timings.wall_seconds)
+        return response
+
+    async def _call(self, func, *args, **kwargs) -> str:
+        async with self._semaphore:
+            if self.limiter is None:
+                return await self._run(func, *args, **kwargs)
+            return await self._run(self._call_limited, func, *args, **kwargs)
+
+    async def _stream(self, func, *args, **kwargs) -> AsyncIterator[str]:
+        """Hold one in-flight slot while pulling a blocking chunk iterator."""
+        sentinel = object()
+        async with self._semaphore:
+            chunks = await self._run(func, *args, stream=True, **kwargs)
+            try:
+                while True:
+                    chunk = await self._run(next, chunks, sentinel)
+                    if chunk is sentinel:
+                        return
                     yield chunk
-        return _iter_chunks()
+            finally:
+                # a consumer that stops early must still release the connection
+                await self._run(chunks.close)
+
+    async def generate(
+            self,
+            prompt: str,
+            system: Optional[str] = None,
+            temperature: float = 0.7,
+            stream: bool = False,
+            **extra
+    ) -> str | AsyncIterator[str]:
+        """Async version of OllamaClient.generate."""
+        if stream:
+            return self._stream(
+                self.client.generate, prompt, system=system,
+                temperature=temperature, **extra,
+            )
+        return await self._call(
+            self.client.generate, prompt, system=system,
+            temperature=temperature, **extra,
+        )
+
+    async def chat(
+            self,
+            messages: List[Dict[str, str]],
+            temperature: float = 0.7,
+            stream: bool = False,
+            **extra,
+    ) -> str | AsyncIterator[str]:
+        """Async version of OllamaClient.chat."""
+        if stream:
+            return self._stream(
+                self.client.chat, messages, temperature=temperature, **extra,
+            )
+        return await self._call(
+            self.client.chat, messages, temperature=temperature, **extra,
+        )
+
+    async def generate_many(self, prompts: List[str], **options) -> List[str]:
+        """Generate for every prompt concurrently, returning responses in input order."""
+        return await asyncio.gather(
+            *(self.generate(prompt, **options) for prompt in prompts)
+        )
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.client.close()
@@ -0,0 +1,239 @@
+"""
+Estimate the token and wall-clock cost of an experiment grid before running it.
+
+Each condition costs its new prompt tokens at the model's prompt-eval rate,
+plus its output budget at the decode rate. New prompt tokens are the prompt
+minus the prefix shared with the previous run on the same model. Rates come
+from the timing columns of earlier results, from a one-request calibration
+probe, or from conservative defaults.
+"""
+
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from nudging.scheduling import RunCondition
+
+import logging
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "ConditionCost",
+    "DEFAULT_THROUGHPUT",
+    "ModelThroughput",
+    "format_plan",
+    "probe_throughput",
+    "summarise_plan",
+    "throughput_from_rows",
+]
+
+
+@dataclass(frozen=True)
+class ModelThroughput:
+    """Serving rates of one model, and where they came from."""
+    prompt_tokens_per_second: float
+    eval_tokens_per_second: float
+    load_seconds: float = 0.0
+    # per-request wall time outside the server's total_duration
+    overhead_seconds: float = 0.0
+    source: str = "default"
+    samples: int = 0
+
+
+# deliberately pessimistic: a small model on a laptop CPU
+DEFAULT_THROUGHPUT = ModelThroughput(prompt_tokens_per_second=100.0, eval_tokens_per_second=10.0, load_seconds=10.0)
+
+
+@dataclass(frozen=True)
+class ConditionCost:
+    """Token counts one run is expected to spend."""
+    condition: RunCondition
+    prompt_tokens: int
+    reused_prompt_tokens: int
+    output_tokens: int
+
+    def seconds(self, throughput: ModelThroughput) -> float:
+        new_prompt_tokens = max(self.prompt_tokens - self.reused_prompt_tokens, 0)
+        return (
+            throughput.overhead_seconds
+            + new_prompt_tokens / throughput.prompt_tokens_per_second
+            + self.output_tokens / throughput.eval_tokens_per_second
+        )
+
+
+def _number(value) -> Optional[float]:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if number == number else None  # drop NaN
+
+
+def throughput_from_rows(rows: Iterable[Dict]) -> Dict[str, ModelThroughput]:
+    """
+    Median prompt-eval and decode rates per model from earlier result rows.
+
+    Only completed, uncached rows carrying both rates are used; the load cost
+    is the largest load_seconds seen, since warm runs report almost none.
+    """
+    samples: Dict[str, List[Dict]] = {}
+    for row in rows:
+        if row.get("status") != "completed" or str(row.get("cache_hit")) == "True":
+            continue
+        prompt_rate = _number(row.get("prompt_eval_tokens_per_second"))
+        eval_rate = _number(row.get("eval_tokens_per_second"))
+        if not prompt_rate or not eval_rate:
+            continue
+        samples.setdefault(row["model"], []).append({
+            "prompt_rate": prompt_rate,
+            "eval_rate": eval_rate,
+            "load": _number(row.get("load_seconds")) or 0.0,
+            "overhead": max(
+                (_number(row.get("wall_seconds")) or 0.0) - (_number(row.get("total_seconds")) or 0.0),
+                0.0,
+            ),
+        })
+
+    return {
+        model: ModelThroughput(
+            prompt_tokens_per_second=statistics.median(sample["prompt_rate"] for sample in model_samples),
+            eval_tokens_per_second=statistics.median(sample["eval_rate"] for sample in model_samples),
+            load_seconds=max(sample["load"] for sample in model_samples),
+            overhead_seconds=statistics.median(sample["overhead"] for sample in model_samples),
+            source="results",
+            samples=len(model_samples),
+        )
+        for model, model_samples in samples.items()
+    }
+
+
+def probe_throughput(client, prompt_words: int = 256, num_predict: int = 64) -> ModelThroughput:
+    """
+    Measure a model's rates with one uncached generation.
+
+    The probe is the first request after a possible cold start, so its
+    load_duration doubles as the model's load cost.
+    """
+    prompt = "Continue counting: " + " ".join(str(number) for number in range(prompt_words))
+    started = time.perf_counter()
+    response = client.generate(prompt, temperature=0.0, num_predict=num_predict, keep_alive=0)
+    timings = getattr(response, "timings", None)
+    if timings is None or not timings.eval_tokens_per_second or not timings.prompt_eval_tokens_per_second:
+        raise RuntimeError(f"Probe of {client.model!r} returned no server timings.")
+    logger.info(
+        "Probed %s in %.1fs: prompt %.0f tok/s, decode %.1f tok/s",
+        client.model,
+        time.perf_counter() - started,
+        timings.prompt_eval_tokens_per_second,
+        timings.eval_tokens_per_second,
+    )
+    return ModelThroughput(
+        prompt_tokens_per_second=timings.prompt_eval_tokens_per_second,
+        eval_tokens_per_second=timings.eval_tokens_per_second,
+        load_seconds=timings.load_seconds or 0.0,
+        overhead_seconds=max(timings.wall_seconds - (timings.total_seconds or timings.wall_seconds), 0.0),
+        source="probe",
+        samples=1,
+    )
+
+
+def summarise_plan(
+        costs: List[ConditionCost],
+        throughputs: Dict[str, ModelThroughput],
+        concurrency: int = 1,
+        top: int = 10,
+) -> Dict:
+    """
+    Total tokens and time for the planned runs.
+
+    wall_seconds assumes the server spreads concurrency across requests with
+    no loss of aggregate throughput, so treat it as a lower bound when
+    concurrency is above 1; serial_seconds is the single-worker figure.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1.")
+    models: Dict[str, Dict] = {}
+    by_context: Dict[float, float] = {}
+    timed = []
+    for cost in costs:
+        model = cost.condition.model
+        throughput = throughputs.get(model, DEFAULT_THROUGHPUT)
+        seconds = cost.seconds(throughput)
+        timed.append((seconds, cost))
+        entry = models.setdefault(model, {
+            "runs": 0,
+            "prompt_tokens": 0,
+            "reused_prompt_tokens": 0,
+            "output_tokens": 0,
+            "seconds": throughput.load_seconds,
+            "throughput": throughput,
+        })
+        entry["runs"] += 1
+        entry["prompt_tokens"] += cost.prompt_tokens
+        entry["reused_prompt_tokens"] += cost.reused_prompt_tokens
+        entry["output_tokens"] += cost.output_tokens
+        entry["seconds"] += seconds
+        percentage = cost.condition.context_percentage
+        by_context[percentage] = by_context.get(percentage, 0.0) + seconds
+
+    serial_seconds = sum(entry["seconds"] for entry in models.values())
+    load_seconds = sum(entry["throughput"].load_seconds for entry in models.values())
+    timed.sort(key=lambda item: item[0], reverse=True)
+    return {
+        "runs": len(costs),
+        "prompt_tokens": sum(entry["prompt_tokens"] for entry in models.values()),
+        "reused_prompt_tokens": sum(entry["reused_prompt_tokens"] for entry in models.values()),
+        "output_tokens": sum(entry["output_tokens"] for entry in models.values()),
+        "serial_seconds": serial_seconds,
+        "concurrency": concurrency,
+        # model loads happen once per block and do not overlap
+        "wall_seconds": load_seconds + (serial_seconds - load_seconds) / concurrency,
+        "models": models,
+        "by_context": dict(sorted(by_context.items())),
+        "top": timed[:top],
+    }
+
+
+def _duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+
+def format_plan(summary: Dict) -> str:
+    """Render summarise_plan output as a plain-text report."""
+    lines = [
+        f"Runs: {summary['runs']}",
+        f"Prompt tokens: {summary['prompt_tokens']:,} "
+        f"({summary['reused_prompt_tokens']:,} reusable from the KV cache)",
+        f"Output tokens (num_predict budget): {summary['output_tokens']:,}",
+        f"Serial time: {_duration(summary['serial_seconds'])}",
+        f"Wall time at concurrency {summary['concurrency']}: ~{_duration(summary['wall_seconds'])} "
+        "(assumes linear scaling)",
+        "",
+        "Per model:",
+    ]
+    for model, entry in summary["models"].items():
+        throughput = entry["throughput"]
+        lines.append(
+            f"  {model}: {entry['runs']} runs, {_duration(entry['seconds'])} | "
+            f"prompt {throughput.prompt_tokens_per_second:.0f} tok/s, "
+            f"decode {throughput.eval_tokens_per_second:.1f} tok/s, "
+            f"load {throughput.load_seconds:.1f}s [{throughput.source}"
+            + (f", n={throughput.samples}" if throughput.samples else "")
+            + "]"
+        )
+    lines += ["", "Per context percentage:"]
+    total = summary["serial_seconds"] or 1.0
+    for percentage, seconds in summary["by_context"].items():
+        lines.append(f"  {percentage:g}%: {_duration(seconds)} ({seconds / total:.0%})")
+    lines += ["", "Most expensive conditions:"]
+    for seconds, cost in summary["top"]:
+        condition = cost.condition
+        lines.append(
+            f"  {_duration(seconds)}  {condition.model} t={condition.temperature:g} "
+            f"{condition.context_percentage:g}% {condition.text_title} "
+            f"(prompt {cost.prompt_tokens - cost.reused_prompt_tokens} new tokens, output {cost.output_tokens})"
+        )
+    return "\n".join(lines)
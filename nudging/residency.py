@@ -0,0 +1,82 @@
+"""
+Control when Ollama loads and unloads model weights.
+
+Ollama loads a model on its first request and evicts it after keep_alive
+expires or when another model needs the memory. Left alone, that load lands
+inside the first timed run of each model, and interleaving models causes
+swaps. The manager warms each model before its block of runs, pins it with
+keep_alive, and unloads it explicitly when the block is done.
+"""
+
+import time
+from typing import Dict, Optional
+
+from nudging.models import OllamaClient
+
+import logging
+logger = logging.getLogger(__name__)
+
+__all__ = ["ModelResidencyManager"]
+
+_NS_PER_SECOND = 1e9
+
+
+class ModelResidencyManager:
+    """
+    Keep exactly one model block resident at a time.
+
+    args:
+        keep_alive: Ollama keep_alive used to pin a warmed model
+        unload_previous: evict the previous model when switching blocks
+    """
+
+    def __init__(self, keep_alive: Optional[str | int] = "30m", unload_previous: bool = True):
+        self.keep_alive = keep_alive
+        self.unload_previous = unload_previous
+        self.load_durations: Dict[str, float] = {}
+        self._resident: Optional[OllamaClient] = None
+
+    @property
+    def resident_model(self) -> Optional[str]:
+        return None if self._resident is None else self._resident.model
+
+    def warm(self, client: OllamaClient) -> float:
+        """
+        Load client's model and return the load time in seconds.
+
+        Ollama answers a load request (done_reason "load") without
+        load_duration, so the client-side time of the request is used unless
+        the server reports one.
+        """
+        started = time.perf_counter()
+        data = client.load(keep_alive=self.keep_alive)
+        elapsed = time.perf_counter() - started
+        load_duration = data.get("load_duration")
+        load_seconds = load_duration / _NS_PER_SECOND if load_duration is not None else elapsed
+        self.load_durations[client.model] = self.load_durations.get(client.model, 0.0) + load_seconds
+        logger.info("Loaded %s in %.2fs (keep_alive=%s)", client.model, load_seconds, self.keep_alive)
+        return load_seconds
+
+    def switch_to(self, client: OllamaClient) -> None:
+        """Make client's model the resident one, unloading the previous model first."""
+        if self._resident is not None and self._resident.model == client.model:
+            return
+        self.release()
+        self.warm(client)
+        self._resident = client
+
+    def release(self) -> None:
+        """Unload the resident model, if any."""
+        if self._resident is None:
+            return
+        if self.unload_previous:
+            try:
+                self._resident.unload()
+                logger.info("Unloaded %s", self._resident.model)
+            except Exception:
+                logger.warning("Could not unload %s", self._resident.model, exc_info=True)
+        self._resident = None
+
+    def log_summary(self) -> None:
+        for model, seconds in self.load_durations.items():
+            logger.info("Model load time: %s %.2fs", model, seconds)
@@ -0,0 +1,252 @@
+"""
+Results backends for the batch runner.
+
+CsvResultsStore keeps the original append-only CSV but opens it once, buffers
+rows and reads completed run IDs a single time. SQLiteResultsStore keeps one
+row per run_id in a WAL-mode database: completed-run lookups hit the primary
+key index, writes are committed in batches, and several processes can write
+to the same file. Either store exports a CSV with the runner's columns.
+"""
+
+import csv
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+import logging
+logger = logging.getLogger(__name__)
+
+__all__ = ["CsvResultsStore", "SQLiteResultsStore", "open_results_store"]
+
+SQLITE_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+
+
+class CsvResultsStore:
+    """
+    Append-only CSV results file.
+
+    A file with an older header is rewritten once on open with the missing
+    columns added; earlier rows leave them empty.
+
+    args:
+        path: CSV file, created with a header on first write
+        fields: column order; keys outside it are dropped
+        batch_size: rows buffered before they are written and flushed
+    """
+
+    def __init__(self, path: str | Path, fields: Sequence[str], batch_size: int = 1):
+        self.path = Path(path)
+        self.fields = list(fields)
+        self.batch_size = max(1, batch_size)
+        self._file_fields = self.fields
+        self._completed = self._read_existing()
+        self._buffer: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def _read_existing(self) -> set[str]:
+        """Load completed run IDs once, adding any missing columns to the file's header."""
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return set()
+        with self.path.open("r+", newline="", encoding="utf-8") as results_file:
+            if fcntl is not None:
+                fcntl.flock(results_file, fcntl.LOCK_EX)
+            reader = csv.DictReader(results_file)
+            rows = list(reader)
+            file_fields = list(reader.fieldnames or [])
+            missing = [field for field in self.fields if field not in file_fields]
+            if missing:
+                # rewrite in place, so a runner waiting on the lock appends to the same file
+                self._file_fields = self.fields + [field for field in file_fields if field not in self.fields]
+                results_file.seek(0)
+                results_file.truncate()
+                writer = csv.DictWriter(results_file, fieldnames=self._file_fields)
+                writer.writeheader()
+                writer.writerows(rows)
+                logger.info("Added columns to the header of %s: %s", self.path, missing)
+            else:
+                self._file_fields = file_fields
+        return {
+            row["run_id"]
+            for row in rows
+            if row.get("status") == "completed" and row.get("run_id")
+        }
+
+    def completed_run_ids(self) -> set[str]:
+        return set(self._completed)
+
+    def is_completed(self, run_id: str) -> bool:
+        return run_id in self._completed
+
+    def append(self, result: Dict) -> None:
+        with self._lock:
+            self._buffer.append({field: result.get(field) for field in self.fields})
+            if result.get("status") == "completed":
+                self._completed.add(result["run_id"])
+            if len(self._buffer) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._buffer:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a+", newline="", encoding="utf-8") as results_file:
+            # another runner may share the file; write whole batches under a lock
+            if fcntl is not None:
+                fcntl.flock(results_file, fcntl.LOCK_EX)
+            results_file.seek(0)
+            # follow the header as it is now, in case another runner has added columns
+            header = next(csv.reader(results_file), None)
+            if header:
+                self._file_fields = header
+            results_file.seek(0, 2)
+            writer = csv.DictWriter(results_file, fieldnames=self._file_fields, extrasaction="ignore")
+            if results_file.tell() == 0:
+                writer.writeheader()
+            writer.writerows(self._buffer)
+            results_file.flush()
+        self._buffer = []
+
+    def rows(self) -> List[Dict]:
+        self.flush()
+        if not self.path.exists():
+            return []
+        with self.path.open("r", newline="", encoding="utf-8") as results_file:
+            return list(csv.DictReader(results_file))
+
+    def export_csv(self, path: str | Path) -> int:
+        return _write_csv(path, self.fields, self.rows())
+
+    def close(self) -> None:
+        self.flush()
+
+
+class SQLiteResultsStore:
+    """
+    One row per run_id in a WAL-mode SQLite table.
+
+    A completed row is never overwritten by a later error for the same run;
+    any other repeat replaces the earlier row. Columns missing from an older
+    file are added on open.
+
+    args:
+        path: database file
+        fields: column order; must include run_id and status
+        batch_size: rows buffered per transaction
+    """
+
+    def __init__(self, path: str | Path, fields: Sequence[str], batch_size: int = 20):
+        self.path = Path(path)
+        self.fields = list(fields)
+        self.batch_size = max(1, batch_size)
+        self._buffer: List[Dict] = []
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # writers take the lock when their transaction begins; a deferred
+        # transaction in WAL mode can fail at once instead of waiting for it
+        self._conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False, isolation_level="IMMEDIATE")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        columns = ", ".join(f'"{field}"' for field in self.fields if field != "run_id")
+        self._conn.execute(f'CREATE TABLE IF NOT EXISTS results (run_id TEXT PRIMARY KEY, {columns})')
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(results)")}
+        for field in self.fields:
+            if field not in existing:
+                self._conn.execute(f'ALTER TABLE results ADD COLUMN "{field}"')
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_status ON results (status)")
+        self._conn.commit()
+
+    def completed_run_ids(self) -> set[str]:
+        with self._lock:
+            self._flush_locked()
+            return {
+                row[0]
+                for row in self._conn.execute("SELECT run_id FROM results WHERE status = 'completed'")
+            }
+
+    def is_completed(self, run_id: str) -> bool:
+        with self._lock:
+            if any(row["run_id"] == run_id and row["status"] == "completed" for row in self._buffer):
+                return True
+            return self._conn.execute(
+                "SELECT 1 FROM results WHERE run_id = ? AND status = 'completed'", (run_id,)
+            ).fetchone() is not None
+
+    def append(self, result: Dict) -> None:
+        with self._lock:
+            self._buffer.append({field: result.get(field) for field in self.fields})
+            if len(self._buffer) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._buffer:
+            return
+        quoted = ", ".join(f'"{field}"' for field in self.fields)
+        placeholders = ", ".join("?" for _ in self.fields)
+        updates = ", ".join(f'"{field}" = excluded."{field}"' for field in self.fields if field != "run_id")
+        with self._conn:
+            self._conn.executemany(
+                f"""
+                INSERT INTO results ({quoted}) VALUES ({placeholders})
+                ON CONFLICT(run_id) DO UPDATE SET {updates}
+                WHERE results.status IS NOT 'completed'
+                """,
+                [tuple(_sqlite_value(row[field]) for field in self.fields) for row in self._buffer],
+            )
+        self._buffer = []
+
+    def rows(self) -> List[Dict]:
+        with self._lock:
+            self._flush_locked()
+            quoted = ", ".join(f'"{field}"' for field in self.fields)
+            cursor = self._conn.execute(f"SELECT {quoted} FROM results ORDER BY rowid")
+            return [dict(zip(self.fields, row)) for row in cursor]
+
+    def export_csv(self, path: str | Path) -> int:
+        return _write_csv(path, self.fields, self.rows())
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+
+def _sqlite_value(value):
+    # booleans are stored as the CSV backend writes them
+    if isinstance(value, bool) or not (value is None or isinstance(value, (int, float, str, bytes))):
+        return str(value)
+    return value
+
+
+def _write_csv(path: str | Path, fields: Sequence[str], rows: Iterable[Dict]) -> int:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.DictWriter(handle, fieldnames=list(fields), extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def open_results_store(path: str | Path, fields: Sequence[str], batch_size: Optional[int] = None):
+    """Pick the backend from the file suffix: .sqlite/.sqlite3/.db or CSV otherwise."""
+    path = Path(path)
+    if path.suffix.lower() in SQLITE_SUFFIXES:
+        return SQLiteResultsStore(path, fields, batch_size=batch_size or 20)
+    return CsvResultsStore(path, fields, batch_size=batch_size or 1)
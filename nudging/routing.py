@@ -0,0 +1,245 @@
+"""
+Route one model's requests across several Ollama endpoints.
+
+Each endpoint is an OllamaClient for the same model on a different
+``ollama serve`` instance. Requests go to the healthy endpoint with the
+fewest outstanding requests; an endpoint that fails at the transport level
+or with a 5xx is ejected for a cooldown period and then tried again.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+from nudging.models import OllamaClient, is_server_failure
+
+import logging
+logger = logging.getLogger(__name__)
+
+__all__ = ["EndpointPool", "RoutedOllamaClient", "NoHealthyEndpointError"]
+
+
+class NoHealthyEndpointError(RuntimeError):
+    """Raised when every endpoint in a pool has failed."""
+
+
+@dataclass
+class _Endpoint:
+    client: OllamaClient
+    outstanding: int = 0
+    ejected_until: float = 0.0
+    failures: int = 0
+    served: int = 0
+
+    def is_healthy(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+
+class EndpointPool:
+    """
+    Least-outstanding-requests balancer over OllamaClients.
+
+    args:
+        clients: one client per endpoint, all for the same model
+        eject_seconds: how long a failing endpoint is skipped before a retry
+    """
+
+    def __init__(self, clients: List[OllamaClient], eject_seconds: float = 30.0):
+        if not clients:
+            raise ValueError("EndpointPool needs at least one client.")
+        self.eject_seconds = eject_seconds
+        self._endpoints = [_Endpoint(client) for client in clients]
+        self._lock = threading.Lock()
+
+    @property
+    def clients(self) -> List[OllamaClient]:
+        return [endpoint.client for endpoint in self._endpoints]
+
+    def acquire(self, exclude: tuple = ()) -> OllamaClient:
+        """Reserve the least-loaded healthy endpoint."""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [
+                endpoint for endpoint in self._endpoints
+                if endpoint.is_healthy(now) and endpoint.client.base_url not in exclude
+            ]
+            if not candidates:
+                raise NoHealthyEndpointError(
+                    f"No healthy endpoint for {self._endpoints[0].client.model!r}."
+                )
+            # min() keeps list order on ties, so idle pools fill endpoints in order
+            endpoint = min(candidates, key=lambda candidate: candidate.outstanding)
+            endpoint.outstanding += 1
+            return endpoint.client
+
+    def release(self, client: OllamaClient, failed: bool = False) -> None:
+        with self._lock:
+            endpoint = self._find(client)
+            endpoint.outstanding -= 1
+            if not failed:
+                endpoint.served += 1
+                endpoint.failures = 0
+                return
+            endpoint.failures += 1
+            endpoint.ejected_until = time.monotonic() + self.eject_seconds
+        logger.warning(
+            "Ejecting %s for %.0fs after %s consecutive failure(s)",
+            client.base_url,
+            self.eject_seconds,
+            endpoint.failures,
+        )
+
+    def eject(self, client: OllamaClient) -> None:
+        with self._lock:
+            self._find(client).ejected_until = time.monotonic() + self.eject_seconds
+
+    def _find(self, client: OllamaClient) -> _Endpoint:
+        for endpoint in self._endpoints:
+            if endpoint.client is client:
+                return endpoint
+        raise KeyError(client.base_url)
+
+    def stats(self) -> Dict[str, Dict[str, int | bool]]:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                endpoint.client.base_url: {
+                    "outstanding": endpoint.outstanding,
+                    "served": endpoint.served,
+                    "healthy": endpoint.is_healthy(now),
+                }
+                for endpoint in self._endpoints
+            }
+
+
+class _ReleasingStream:
+    """Chunk iterator that calls on_release(failed) exactly once when it ends."""
+
+    def __init__(self, chunks: Iterator[str], on_release):
+        self._chunks = chunks
+        self._on_release = on_release
+
+    @property
+    def timings(self):
+        return getattr(self._chunks, "timings", None)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            self._release(failed=False)
+            raise
+        except Exception as exc:
+            self._release(failed=is_server_failure(exc))
+            raise
+
+    def _release(self, failed: bool) -> None:
+        if self._on_release is not None:
+            on_release, self._on_release = self._on_release, None
+            on_release(failed)
+
+    def close(self) -> None:
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()
+        self._release(failed=False)
+
+
+class RoutedOllamaClient:
+    """
+    Drop-in replacement for OllamaClient that spreads calls over an EndpointPool.
+
+    A call that fails because of its endpoint is retried once on each other
+    healthy endpoint before the error is raised.
+    """
+
+    def __init__(self, pool: EndpointPool):
+        self.pool = pool
+        self.model = pool.clients[0].model
+
+    @classmethod
+    def from_endpoints(cls, model: str, endpoints: List[str], eject_seconds: float = 30.0, **client_options):
+        clients = [OllamaClient(model=model, base_url=endpoint, **client_options) for endpoint in endpoints]
+        return cls(EndpointPool(clients, eject_seconds=eject_seconds))
+
+    def _call(self, method: str, *args, **kwargs):
+        tried = []
+        last_error = None
+        while True:
+            try:
+                client = self.pool.acquire(exclude=tuple(tried))
+            except NoHealthyEndpointError:
+                if not tried:
+                    raise
+                raise last_error
+            tried.append(client.base_url)
+            try:
+                result = getattr(client, method)(*args, **kwargs)
+            except Exception as exc:
+                failed = is_server_failure(exc)
+                self.pool.release(client, failed=failed)
+                if not failed:
+                    raise
+                last_error = exc
+                continue
+            if kwargs.get("stream"):
+                return self._release_after(client, result)
+            self.pool.release(client)
+            return result
+
+    def _release_after(self, client: OllamaClient, chunks: Iterator[str]) -> Iterator[str]:
+        """Keep the endpoint reserved until the stream is consumed or closed."""
+        return _ReleasingStream(chunks, lambda failed: self.pool.release(client, failed=failed))
+
+    def generate(self, prompt: str, **options):
+        return self._call("generate", prompt, **options)
+
+    def chat(self, messages, **options):
+        return self._call("chat", messages, **options)
+
+    def is_running(self) -> bool:
+        return any(client.is_running() for client in self.pool.clients)
+
+    def ensure_running(self, start_if_needed: bool = False, **kwargs) -> bool:
+        """Eject unreachable endpoints; pooled servers are started by their owner."""
+        running = False
+        for client in self.pool.clients:
+            if client.is_running():
+                running = True
+            else:
+                logger.warning("Endpoint %s is not reachable", client.base_url)
+                self.pool.eject(client)
+        return running
+
+    def load(self, keep_alive: Optional[str | int] = None) -> Dict:
+        """Load the model on every healthy endpoint, reporting the slowest load."""
+        slowest: Dict = {}
+        for client in self.pool.clients:
+            try:
+                data = client.load(keep_alive=keep_alive)
+            except Exception as exc:
+                if not is_server_failure(exc):
+                    raise
+                logger.warning("Could not load %s on %s", self.model, client.base_url)
+                self.pool.eject(client)
+                continue
+            if data.get("load_duration", 0) >= slowest.get("load_duration", 0):
+                slowest = data
+        return slowest
+
+    def unload(self) -> None:
+        for client in self.pool.clients:
+            try:
+                client.unload()
+            except Exception as exc:
+                if not is_server_failure(exc):
+                    raise
+                logger.warning("Could not unload %s on %s", self.model, client.base_url)
+
+    def close(self) -> None:
+        for client in self.pool.clients:
+            client.close()
@@ -0,0 +1,148 @@
+"""
+Expansion and ordering of the experiment grid.
+
+Ollama keeps the KV cache of the last prompt evaluated in each slot and only
+re-evaluates the part of a new prompt that differs from it. Sending prompts
+that share long prefixes back-to-back to the same model therefore skips most
+of the prompt evaluation, which dominates latency at high context levels.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Callable, Iterable, List
+
+import logging
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "RunCondition",
+    "expand_grid",
+    "order_for_prefix_reuse",
+    "parse_shard",
+    "shard_of",
+    "shared_prefix_counts",
+    "shared_prefix_words",
+]
+
+
+@dataclass(frozen=True)
+class RunCondition:
+    """One cell of the experiment grid; sample numbers the seeds drawn for it."""
+    text_title: str
+    model: str
+    temperature: float
+    context_percentage: float
+    sample: int = 0
+
+
+def expand_grid(
+        text_titles: Iterable[str],
+        models: Iterable[str],
+        temperatures: Iterable[float],
+        context_percentages: Iterable[float],
+        samples_per_condition: int = 1,
+) -> List[RunCondition]:
+    """
+    Expand the grid in config order: model → temperature → text → context → sample.
+
+    Samples of a condition are adjacent so they share its evaluated prompt.
+    Greedy (temperature 0) conditions get one sample, since another seed
+    cannot change their output.
+    """
+    if samples_per_condition < 1:
+        raise ValueError("samples_per_condition must be at least 1.")
+    text_titles = list(text_titles)
+    temperatures = list(temperatures)
+    context_percentages = list(context_percentages)
+    return [
+        RunCondition(
+            text_title=text_title,
+            model=model,
+            temperature=temperature,
+            context_percentage=context_percentage,
+            sample=sample,
+        )
+        for model in models
+        for temperature in temperatures
+        for text_title in text_titles
+        for context_percentage in context_percentages
+        for sample in range(samples_per_condition if temperature > 0 else 1)
+    ]
+
+
+def order_for_prefix_reuse(
+        conditions: Iterable[RunCondition],
+        prompt_for: Callable[[RunCondition], str],
+) -> List[RunCondition]:
+    """
+    Reorder conditions so prompts sharing a prefix run consecutively.
+
+    Models keep their first-seen order so each model's runs form one block.
+    Within a block, prompts are sorted lexicographically, which places every
+    prompt next to the one it shares the longest prefix with; identical
+    prompts (the same text and context at different temperatures) end up
+    adjacent and keep their original relative order.
+    """
+    conditions = list(conditions)
+    model_order = {}
+    for condition in conditions:
+        model_order.setdefault(condition.model, len(model_order))
+    keyed = [
+        (model_order[condition.model], prompt_for(condition), position, condition)
+        for position, condition in enumerate(conditions)
+    ]
+    keyed.sort(key=lambda item: item[:3])
+    return [condition for *_, condition in keyed]
+
+
+def shared_prefix_counts(
+        conditions: Iterable[RunCondition],
+        prompt_for: Callable[[RunCondition], str],
+) -> List[int]:
+    """Prompt words each run shares with the previous run on the same model."""
+    counts = []
+    previous_model = None
+    previous_prompt = ""
+    for condition in conditions:
+        prompt = prompt_for(condition)
+        shared_words = 0
+        if condition.model == previous_model:
+            prefix = os.path.commonprefix([previous_prompt, prompt])
+            # a word cut mid-way by the divergence point is not shared
+            shared_words = len(prefix.split())
+            if prefix and prefix != prompt and not prefix[-1].isspace():
+                shared_words -= 1
+        counts.append(max(shared_words, 0))
+        previous_model = condition.model
+        previous_prompt = prompt
+    return counts
+
+
+def shared_prefix_words(
+        conditions: Iterable[RunCondition],
+        prompt_for: Callable[[RunCondition], str],
+) -> int:
+    """Count prompt words each run shares with the previous run on the same model."""
+    return sum(shared_prefix_counts(conditions, prompt_for))
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """Parse "i/N" (1-based) into (i, N)."""
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must look like i/N, got {spec!r}.") from None
+    if not 1 <= index <= count:
+        raise ValueError(f"Shard index must be between 1 and {count}, got {index}.")
+    return index, count
+
+
+def shard_of(run_id: str, shard_count: int) -> int:
+    """
+    Return the 1-based shard a run belongs to.
+
+    run_id is already a hex SHA-256 prefix of the condition, so taking it
+    modulo the shard count spreads conditions evenly and gives every host
+    the same answer without coordination.
+    """
+    return int(run_id, 16) % shard_count + 1
@@ -0,0 +1,153 @@
+"""
+Launch and manage a pool of local `ollama serve` processes.
+
+Each instance listens on its own port (via OLLAMA_HOST) with the configured
+parallelism and memory settings. Readiness is polled with backoff rather than
+a fixed sleep, and the resulting endpoints can be handed to
+RoutedOllamaClient.
+"""
+
+import os
+import subprocess
+import time
+from typing import Dict, List, Optional, Sequence
+
+import requests
+
+from nudging.models import wait_until
+
+import logging
+logger = logging.getLogger(__name__)
+
+__all__ = ["OllamaServerPool", "ServerPoolError"]
+
+
+class ServerPoolError(RuntimeError):
+    """Raised when a pooled server fails to start."""
+
+
+class OllamaServerPool:
+    """
+    N `ollama serve` processes on consecutive ports.
+
+    args:
+        instances: number of server processes
+        base_port: port of the first instance; the rest follow consecutively
+        host: interface the servers bind to
+        num_parallel: OLLAMA_NUM_PARALLEL, requests each server decodes at once
+        max_loaded_models: OLLAMA_MAX_LOADED_MODELS per server
+        keep_alive: OLLAMA_KEEP_ALIVE default for the servers
+        env: further environment, e.g. OLLAMA_KV_CACHE_TYPE or OLLAMA_FLASH_ATTENTION
+        command: server command; "{host}" and "{port}" placeholders are filled in
+        startup_timeout: seconds to wait for every server to answer /api/tags
+    """
+
+    def __init__(
+            self,
+            instances: int = 1,
+            base_port: int = 11435,
+            host: str = "127.0.0.1",
+            num_parallel: int = 1,
+            max_loaded_models: int = 1,
+            keep_alive: Optional[str] = None,
+            env: Optional[Dict[str, str]] = None,
+            command: Sequence[str] = ("ollama", "serve"),
+            startup_timeout: float = 60.0,
+    ):
+        if instances < 1:
+            raise ValueError("instances must be at least 1.")
+        self.instances = instances
+        self.base_port = base_port
+        self.host = host
+        self.num_parallel = num_parallel
+        self.max_loaded_models = max_loaded_models
+        self.keep_alive = keep_alive
+        self.env = dict(env or {})
+        self.command = list(command)
+        self.startup_timeout = startup_timeout
+        self._processes: List[subprocess.Popen] = []
+        self._session = requests.Session()
+
+    @property
+    def ports(self) -> List[int]:
+        return [self.base_port + index for index in range(self.instances)]
+
+    @property
+    def endpoints(self) -> List[str]:
+        return [f"http://{self.host}:{port}" for port in self.ports]
+
+    def _environment(self, port: int) -> Dict[str, str]:
+        env = {
+            **os.environ,
+            "OLLAMA_HOST": f"{self.host}:{port}",
+            "OLLAMA_NUM_PARALLEL": str(self.num_parallel),
+            "OLLAMA_MAX_LOADED_MODELS": str(self.max_loaded_models),
+            **self.env,
+        }
+        if self.keep_alive is not None:
+            env["OLLAMA_KEEP_ALIVE"] = self.keep_alive
+        return env
+
+    def _is_ready(self, endpoint: str) -> bool:
+        try:
+            self._session.get(f"{endpoint}/api/tags", timeout=1).raise_for_status()
+            return True
+        except requests.RequestException:
+            return False
+
+    def start(self) -> List[str]:
+        """Start every instance and wait until all are ready; returns their endpoints."""
+        started = time.monotonic()
+        for port in self.ports:
+            command = [part.format(host=self.host, port=port) for part in self.command]
+            logger.info("Starting %s on %s:%s", command[0], self.host, port)
+            self._processes.append(subprocess.Popen(
+                command,
+                env=self._environment(port),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            ))
+
+        deadline = started + self.startup_timeout
+        for process, endpoint in zip(self._processes, self.endpoints):
+            ready = wait_until(
+                lambda: self._is_ready(endpoint) or process.poll() is not None,
+                timeout=max(deadline - time.monotonic(), 0),
+            )
+            if not ready or process.poll() is not None:
+                self.shutdown()
+                raise ServerPoolError(
+                    f"Server at {endpoint} did not become ready"
+                    + (f" (exit code {process.returncode})" if process.returncode is not None else "")
+                )
+        logger.info(
+            "%s server(s) ready in %.1fs: %s",
+            self.instances,
+            time.monotonic() - started,
+            ", ".join(self.endpoints),
+        )
+        return self.endpoints
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Terminate every instance, killing any that ignore SIGTERM."""
+        for process in self._processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in self._processes:
+            try:
+                process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                logger.warning("Killing unresponsive server process %s", process.pid)
+                process.kill()
+                process.wait()
+        if self._processes:
+            logger.info("Stopped %s server(s)", len(self._processes))
+        self._processes = []
+        self._session.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
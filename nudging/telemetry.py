@@ -0,0 +1,256 @@
+"""
+Live throughput telemetry for the batch runner.
+
+RunTelemetry counts runs, errors and generated tokens as they finish. It
+keeps a rolling window for rates and derives the ETA from the recent run
+rate. Both exporters render the same snapshot in the Prometheus text
+format:
+
+- PrometheusTextfileExporter rewrites a .prom file periodically, for
+  node_exporter's textfile collector.
+- MetricsHTTPServer serves /metrics for a direct scrape.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+
+import logging
+logger = logging.getLogger(__name__)
+
+__all__ = ["MetricsHTTPServer", "PrometheusTextfileExporter", "RunTelemetry"]
+
+
+class RunTelemetry:
+    """
+    Thread-safe counters and rolling rates for one experiment run.
+
+    args:
+        experiment: value of the experiment label on every metric
+        worker: value of a worker label on every metric, for runners sharing a grid; None omits it
+        pending_runs: runs this invocation expects to attempt
+        window_seconds: span the rolling rates and error ratio are computed over
+    """
+
+    def __init__(
+            self,
+            experiment: str,
+            pending_runs: int = 0,
+            window_seconds: float = 300.0,
+            worker: Optional[str] = None,
+    ):
+        self.experiment = experiment
+        self.worker = worker
+        self.window_seconds = window_seconds
+        self._remaining = pending_runs
+        self._in_flight = 0
+        self._runs: Dict[tuple[str, str], int] = {}
+        self._tokens: Dict[str, int] = {}
+        self._recent = deque()  # (finished_at, model, tokens, failed)
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def run_started(self) -> None:
+        with self._lock:
+            self._in_flight += 1
+
+    def run_stopped(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def record(self, model: str, status: str, tokens: int = 0) -> None:
+        """Count one finished run and the tokens it generated."""
+        now = time.monotonic()
+        with self._lock:
+            self._runs[(model, status)] = self._runs.get((model, status), 0) + 1
+            self._tokens[model] = self._tokens.get(model, 0) + tokens
+            self._remaining = max(self._remaining - 1, 0)
+            self._recent.append((now, model, tokens, status != "completed"))
+            self._trim(now)
+
+    def skip(self, count: int = 1) -> None:
+        """Drop runs that will not be attempted here, e.g. claimed by another runner."""
+        with self._lock:
+            self._remaining = max(self._remaining - count, 0)
+
+    def _trim(self, now: float) -> None:
+        while self._recent and self._recent[0][0] < now - self.window_seconds:
+            self._recent.popleft()
+
+    def snapshot(self) -> Dict:
+        """Current counters, rolling rates and ETA (None until a run has finished)."""
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            # a run that started less than a window ago is rated over its own span
+            span = max(min(self.window_seconds, now - self._started), 1e-9)
+            recent_tokens: Dict[str, int] = {}
+            for _, model, tokens, _failed in self._recent:
+                recent_tokens[model] = recent_tokens.get(model, 0) + tokens
+            recent_runs = len(self._recent)
+            recent_errors = sum(1 for *_, failed in self._recent if failed)
+            runs_per_second = recent_runs / span
+            return {
+                "runs": dict(self._runs),
+                "tokens": dict(self._tokens),
+                "runs_per_second": runs_per_second,
+                "tokens_per_second": {model: tokens / span for model, tokens in recent_tokens.items()},
+                "error_ratio": recent_errors / recent_runs if recent_runs else 0.0,
+                "in_flight": self._in_flight,
+                "remaining": self._remaining,
+                "eta_seconds": self._remaining / runs_per_second if runs_per_second else None,
+            }
+
+    def render_prometheus(self) -> str:
+        """Snapshot in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        common = [f'experiment="{_label(self.experiment)}"']
+        if self.worker is not None:
+            common.append(f'worker="{_label(self.worker)}"')
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                rendered = ",".join([*common, *labels])
+                lines.append(f"{name}{{{rendered}}} {_value(value)}")
+
+        metric("nudging_runs_total", "counter", "Finished runs by model and status.", [
+            ((f'model="{_label(model)}"', f'status="{_label(status)}"'), count)
+            for (model, status), count in sorted(snapshot["runs"].items())
+        ])
+        metric("nudging_generated_tokens_total", "counter", "Tokens generated by model.", [
+            ((f'model="{_label(model)}"',), tokens) for model, tokens in sorted(snapshot["tokens"].items())
+        ])
+        metric("nudging_tokens_per_second", "gauge", "Rolling generated tokens per second by model.", [
+            ((f'model="{_label(model)}"',), rate)
+            for model, rate in sorted(snapshot["tokens_per_second"].items())
+        ])
+        metric("nudging_runs_per_second", "gauge", "Rolling finished runs per second.",
+               [((), snapshot["runs_per_second"])])
+        metric("nudging_error_ratio", "gauge", "Share of failed runs in the rolling window.",
+               [((), snapshot["error_ratio"])])
+        metric("nudging_runs_in_flight", "gauge", "Runs currently generating.", [((), snapshot["in_flight"])])
+        metric("nudging_runs_remaining", "gauge", "Runs this invocation has yet to finish.",
+               [((), snapshot["remaining"])])
+        metric("nudging_eta_seconds", "gauge", "Remaining runs divided by the rolling run rate.",
+               [((), snapshot["eta_seconds"])])
+        metric("nudging_last_update_timestamp_seconds", "gauge", "Unix time of this snapshot.",
+               [((), time.time())])
+        return "\n".join(lines) + "\n"
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _value(value) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NaN"
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+class PrometheusTextfileExporter:
+    """
+    Rewrite a .prom file from a daemon thread every interval_seconds.
+
+    The file is replaced atomically, so a collector never reads a partial one.
+    """
+
+    def __init__(self, telemetry: RunTelemetry, path: str | Path, interval_seconds: float = 15.0):
+        self.telemetry = telemetry
+        self.path = Path(path)
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def write(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        temporary.write_text(self.telemetry.render_prometheus(), encoding="utf-8")
+        os.replace(temporary, self.path)
+
+    def start(self) -> "PrometheusTextfileExporter":
+        def loop():
+            while not self._stop.wait(self.interval_seconds):
+                try:
+                    self.write()
+                except OSError as exc:
+                    logger.warning("Could not write telemetry to %s: %s", self.path, exc)
+
+        self.write()
+        self._thread = threading.Thread(target=loop, name="telemetry-textfile", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the thread and write the final counters."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.write()
+
+
+class MetricsHTTPServer:
+    """Serve telemetry at /metrics; use as a context manager or call start()/stop()."""
+
+    def __init__(self, telemetry: RunTelemetry, host: str = "127.0.0.1", port: int = 0):
+        self.telemetry = telemetry
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        telemetry = self.telemetry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = telemetry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("metrics: " + format, *args)
+
+        return Handler
+
+    def start(self) -> "MetricsHTTPServer":
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            name="telemetry-http",
+            daemon=True,
+        )
+        self._thread.start()
+        logger.info("Serving metrics at %s/metrics", self.base_url)
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
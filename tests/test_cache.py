@@ -0,0 +1,91 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from nudging.cache import GenerationCache, is_cacheable
+from nudging.models import OllamaClient
+
+
+class TestGenerationCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = GenerationCache(Path(self.temp_dir.name) / "cache" / "generations.sqlite")
+
+    def tearDown(self):
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    def test_key_ignores_stream_flag_but_not_options(self):
+        payload = {"model": "m", "prompt": "p", "stream": False, "options": {"temperature": 0.0}}
+        self.assertEqual(
+            GenerationCache.key_for(payload),
+            GenerationCache.key_for({**payload, "stream": True}),
+        )
+        self.assertNotEqual(
+            GenerationCache.key_for(payload),
+            GenerationCache.key_for({**payload, "options": {"temperature": 0.0, "num_predict": 5}}),
+        )
+
+    def test_key_ignores_keep_alive(self):
+        payload = {"model": "m", "prompt": "p", "stream": False, "keep_alive": "30m", "options": {}}
+        self.assertEqual(
+            GenerationCache.key_for(payload),
+            GenerationCache.key_for({**payload, "keep_alive": 0}),
+        )
+        self.assertEqual(
+            GenerationCache.key_for(payload),
+            GenerationCache.key_for({k: v for k, v in payload.items() if k != "keep_alive"}),
+        )
+
+    def test_get_and_put_count_hits_and_misses(self):
+        self.assertIsNone(self.cache.get("key"))
+        self.cache.put("key", "m", "response")
+        self.assertEqual(self.cache.get("key"), "response")
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 1, "entries": 1})
+
+    def test_eviction_drops_least_recently_used(self):
+        self.cache.max_bytes = 10
+        self.cache.put("old", "m", "aaaaa")
+        self.cache.put("new", "m", "bbbbb")
+        self.cache.get("old")
+        self.cache.put("newest", "m", "ccccc")
+
+        self.assertIsNone(self.cache.get("new"))
+        self.assertEqual(self.cache.get("old"), "aaaaa")
+        self.assertEqual(len(self.cache), 2)
+
+    def test_puts_below_the_limit_do_not_sum_the_table(self):
+        self.cache.max_bytes = 10
+        with patch.object(self.cache, "_stored_bytes", wraps=self.cache._stored_bytes) as stored_bytes:
+            self.cache.put("a", "m", "aaaaa")
+            self.cache.put("a", "m", "AAAAA")  # a replaced entry is not counted twice
+            self.cache.put("b", "m", "bbbbb")
+        self.assertFalse(stored_bytes.called)
+        self.assertEqual(len(self.cache), 2)
+
+        self.cache.put("c", "m", "ccccc")
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get("a"))
+
+    def test_only_reproducible_payloads_are_cacheable(self):
+        self.assertTrue(is_cacheable({"options": {"temperature": 0.0}}))
+        self.assertTrue(is_cacheable({"options": {"temperature": 0.7, "seed": 42}}))
+        self.assertFalse(is_cacheable({"options": {"temperature": 0.7}}))
+        self.assertFalse(is_cacheable({"stream": True, "options": {"temperature": 0.0}}))
+
+    def test_client_serves_repeat_generation_from_cache(self):
+        client = OllamaClient(model="m", cache=self.cache)
+        with patch.object(client.session, "post") as mock_post:
+            mock_post.return_value.json.return_value = {"response": "Response"}
+            first = client.generate("prompt", temperature=0.0, seed=42, num_predict=5)
+            second = client.generate("prompt", temperature=0.0, seed=42, num_predict=5)
+            client.generate("prompt", temperature=0.0, seed=42, num_predict=6)
+
+        self.assertEqual((first, second), ("Response", "Response"))
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual(self.cache.hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch
+
+import requests
+
+from nudging.concurrency import AdaptiveConcurrencyLimiter, TokenBucket
+from nudging.models import AsyncOllamaClient, GeneratedText, GenerationTimings, OllamaClient
+
+
+class TestAdaptiveConcurrencyLimiter(unittest.TestCase):
+    def test_flat_latency_raises_limit_additively(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=3)
+        for _ in range(1 + 2 + 3):
+            limiter.release(limiter.acquire(), latency_per_token=0.01)
+        self.assertEqual(limiter.limit, 3)
+
+    def test_latency_growth_halves_limit(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+        for _ in range(2):
+            limiter.release(limiter.acquire(), latency_per_token=0.01)
+        limiter.release(limiter.acquire(), latency_per_token=0.05)
+        self.assertEqual(limiter.limit, 4)
+
+    def test_overload_errors_lower_limit_once_per_epoch(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+        epochs = [limiter.acquire() for _ in range(3)]
+        for epoch in epochs:
+            limiter.release(epoch, overloaded=True)
+        self.assertEqual(limiter.limit, 4)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_slot_treats_timeouts_as_overload_but_not_client_errors(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4)
+        with self.assertRaises(ValueError):
+            with limiter.slot():
+                raise ValueError("bad prompt")
+        self.assertEqual(limiter.limit, 4)
+
+        with self.assertRaises(requests.Timeout):
+            with limiter.slot():
+                raise requests.Timeout("slow host")
+        self.assertEqual(limiter.limit, 2)
+
+    def test_unrecorded_slots_do_not_set_the_latency_baseline(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=5)
+        for _ in range(2):
+            with limiter.slot():
+                pass  # a cache hit: nothing recorded
+        for _ in range(3):
+            with limiter.slot() as slot:
+                slot.record(10, seconds=1.0)
+        self.assertEqual(limiter.limit, 5)
+
+    def test_recorded_seconds_replace_time_held(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=5)
+        for held in (0.0, 0.0, 0.05):
+            with limiter.slot() as slot:
+                threading.Event().wait(held)  # e.g. scoring after the generation call
+                slot.record(10, seconds=0.01)
+        self.assertEqual(limiter.limit, 5)
+
+    def test_limit_never_drops_below_minimum(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, min_limit=2)
+        limiter.release(limiter.acquire(), overloaded=True)
+        self.assertEqual(limiter.limit, 2)
+
+    def test_acquire_blocks_at_limit(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+        epoch = limiter.acquire()
+        acquired = threading.Event()
+        waiter = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+        waiter.start()
+        self.assertFalse(acquired.wait(0.05))
+        limiter.release(epoch)
+        self.assertTrue(acquired.wait(1))
+        waiter.join()
+
+    def test_async_client_gates_calls_through_limiter(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=2)
+        client = OllamaClient()
+        async_client = AsyncOllamaClient(client=client, limiter=limiter)
+        with patch.object(client, "generate", return_value="one two three"):
+            results = asyncio.run(async_client.generate_many(["a", "b", "c"]))
+
+        self.assertEqual(results, ["one two three"] * 3)
+        self.assertEqual(async_client.max_in_flight, 2)
+        self.assertEqual(limiter.in_flight, 0)
+
+
+    def test_async_cache_hits_leave_the_limit_unchanged(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=4)
+        client = OllamaClient()
+        async_client = AsyncOllamaClient(client=client, limiter=limiter)
+        hit = GeneratedText("one two three", GenerationTimings(wall_seconds=1e-4, cache_hit=True))
+        with patch.object(client, "generate", return_value=hit):
+            asyncio.run(async_client.generate_many(["prompt"] * 8))
+
+        self.assertEqual(limiter.limit, 1)
+        self.assertEqual(limiter.in_flight, 0)
+
+class TestTokenBucket(unittest.TestCase):
+    @patch("nudging.concurrency.time.sleep")
+    @patch("nudging.concurrency.time.monotonic", return_value=100.0)
+    def test_burst_then_paced_waits(self, mock_monotonic, mock_sleep):
+        bucket = TokenBucket(rate=2.0, burst=2)
+        waits = [bucket.acquire() for _ in range(4)]
+        self.assertEqual(waits, [0.0, 0.0, 0.5, 1.0])
+        self.assertEqual([call.args[0] for call in mock_sleep.call_args_list], [0.5, 1.0])
+
+    @patch("nudging.concurrency.time.sleep")
+    @patch("nudging.concurrency.time.monotonic")
+    def test_tokens_refill_over_time(self, mock_monotonic, mock_sleep):
+        mock_monotonic.side_effect = [0.0, 0.0, 10.0]
+        bucket = TokenBucket(rate=1.0, burst=1)
+        self.assertEqual(bucket.acquire(), 0.0)
+        self.assertEqual(bucket.acquire(), 0.0)
+        mock_sleep.assert_not_called()
+
+    def test_rate_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+
+from nudging import metrics
+from nudging.embeddings import EmbeddingCache, EmbeddingService, OnnxEncoder
+
+
+class FakeEncoder:
+    """Deterministic two-dimensional embeddings that record every batch."""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size=32):
+        self.calls.append((list(texts), batch_size))
+        return np.array([[len(text), text.count("a") + 1] for text in texts], dtype=np.float32)
+
+
+class TestEmbeddingService(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name) / "cache" / "embeddings.sqlite"
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_distinct_texts_are_encoded_once_in_one_batch(self):
+        encoder = FakeEncoder()
+        service = EmbeddingService(encoder=encoder, batch_size=8)
+        scores = service.similarity(["aa", "ab", "aa"], ["target", "target", ""])
+        service.similarity(["ab"], ["target"])
+
+        self.assertEqual(encoder.calls, [(["aa", "ab", "target"], 8)])
+        self.assertEqual(scores[2], 0.0)
+        self.assertGreater(scores[0], 0.0)
+        self.assertEqual(service.stats(), {"memory_hits": 2, "disk_hits": 0, "encoded": 3})
+
+    def test_disk_cache_is_shared_across_services_and_keyed_by_model(self):
+        with EmbeddingCache(self.path) as cache:
+            first = EmbeddingService(cache=cache, encoder=FakeEncoder()).embed(["one", "two"])
+            encoder = FakeEncoder()
+            second = EmbeddingService(cache=cache, encoder=encoder).embed(["two", "one"])
+            other_model = FakeEncoder()
+            EmbeddingService("other-model", cache=cache, encoder=other_model).embed(["one"])
+            stored = len(cache)
+
+        np.testing.assert_array_equal(second, first[::-1])
+        self.assertEqual(encoder.calls, [])
+        self.assertEqual(len(other_model.calls), 1)
+        self.assertEqual(stored, 3)
+
+    def test_concurrent_callers_encode_in_parallel(self):
+        both_encoding = threading.Barrier(2, timeout=5)
+
+        class MeetingEncoder(FakeEncoder):
+            def encode(self, texts, batch_size=32):
+                both_encoding.wait()  # breaks if the second caller is kept waiting
+                return super().encode(texts, batch_size)
+
+        service = EmbeddingService(encoder=MeetingEncoder())
+        results = {}
+        callers = [
+            threading.Thread(target=lambda text=text: results.setdefault(text, service.embed([text])))
+            for text in ("one", "two")
+        ]
+        for caller in callers:
+            caller.start()
+        for caller in callers:
+            caller.join()
+
+        self.assertEqual(sorted(results), ["one", "two"])
+        self.assertEqual(service.stats(), {"memory_hits": 0, "disk_hits": 0, "encoded": 2})
+
+    def test_metrics_route_semantic_similarity_through_the_service(self):
+        service = EmbeddingService(encoder=FakeEncoder())
+        previous = metrics.get_embedding_service()
+        metrics.set_embedding_service(service)
+        try:
+            batch = metrics.score_batch(["aa", "bb"], ["ab", "bb"], ["semantic_similarity"])
+            single = metrics.semantic_similarity_score("aa", "ab")
+        finally:
+            metrics.set_embedding_service(previous)
+
+        self.assertAlmostEqual(batch["semantic_similarity"][0], single, places=6)
+        self.assertAlmostEqual(batch["semantic_similarity"][1], 1.0, places=6)
+
+
+class TestEmbeddingBackends(unittest.TestCase):
+    def test_unknown_backend_is_rejected(self):
+        with self.assertRaises(ValueError):
+            EmbeddingService(backend="tensorflow")
+
+    def test_backends_cache_under_separate_keys(self):
+        self.assertEqual(EmbeddingService().cache_key, "all-MiniLM-L6-v2")
+        self.assertEqual(EmbeddingService(backend="onnx").cache_key, "all-MiniLM-L6-v2@onnx")
+
+    def test_background_warm_up_loads_the_model_once(self):
+        release = threading.Event()
+        loads = []
+
+        def slow_load(backend, model_name):
+            loads.append((backend, model_name))
+            release.wait(5)
+            return FakeEncoder()
+
+        with patch("nudging.embeddings._load_encoder", side_effect=slow_load):
+            service = EmbeddingService(backend="onnx")
+            warm_up = service.warm_up()
+            release.set()
+            embeddings = service.embed(["text"])
+            warm_up.join()
+
+        self.assertEqual(loads, [("onnx", "all-MiniLM-L6-v2")])
+        self.assertEqual(embeddings.shape, (1, 2))
+
+    def test_onnx_backend_explains_missing_dependencies(self):
+        try:
+            import onnxruntime  # noqa: F401
+            import tokenizers  # noqa: F401
+        except ImportError:
+            with self.assertRaisesRegex(RuntimeError, "onnxruntime"):
+                OnnxEncoder()
+        else:
+            self.skipTest("onnxruntime is installed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,22 +8,76 @@ from unittest.mock import patch
 from experiments.run_memorisation_experiment import (
     RESULT_FIELDS,
     _append_result,
+    _build_pacing,
     _build_run_id,
+    _completed_run_ids,
+    _expected_run_ids,
+    _pending_conditions,
+    _shard_path,
+    export_results,
+    plan_experiment,
     run_experiment,
+    score_experiment,
 )
-from nudging.experiment import _generate_response, _get_num_predict_for_target, _trim_to_n_words, run_experiments
+from experiments.merge_shards import merge_shards
+from nudging.experiment import (
+    _generate_response,
+    _get_num_predict_for_target,
+    _stream_until_word_count,
+    _trim_to_n_words,
+    run_experiments,
+)
+from nudging.fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from nudging.metrics import METRICS
 from nudging.prompt import build_continuation_prompt
+from nudging.results_store import open_results_store
+from nudging.scheduling import expand_grid
 
 
 class FakeModelClient:
     def __init__(self, response="five six seven eight nine"):
         self.response = response
         self.calls = []
+        self.stream_closed = False
 
-    def generate(self, prompt, **options):
+    def generate(self, prompt, stream=False, **options):
         self.calls.append({"prompt": prompt, "options": options})
+        if stream:
+            return self._stream()
         return self.response
 
+    def _stream(self):
+        try:
+            for word in self.response.split():
+                yield f" {word}"
+        finally:
+            self.stream_closed = True
+
+
+def _runner_config(**overrides):
+    config = dict(
+        name="test", models=[SimpleNamespace(name="model", endpoint="http://unused")],
+        temperatures=[0.0], context_percentages=[50], random_seed=42,
+        prompt_version="v4", token_multiplier=1.5, include_semantic=False,
+        early_stop=False, run_order="prefix", keep_alive=None,
+        preload_models=True, unload_between_models=True, server_pool=None,
+        selected_text_ids=["songs::artist::title"], context_delay_seconds=0.0,
+        max_concurrency=1, adaptive_concurrency=False, requests_per_second=None, burst=1,
+        results_batch_size=None, coordinate_workers=False, lease_seconds=600.0,
+        telemetry_filename=None, telemetry_interval_seconds=15.0, metrics_port=None,
+        store_generations=True, samples_per_condition=1,
+        embedding_cache_filename=None, embedding_batch_size=64,
+        embedding_backend="sentence-transformers", embedding_warm_up=True,
+        metrics=["exact_match", "fuzzy_match", "token_overlap"],
+    )
+    config.update(overrides)
+    return SimpleNamespace(**config)
+
+
+def _read_rows(path):
+    with path.open(newline="", encoding="utf-8") as handle:
+        return list(csv.DictReader(handle))
+
 
 class TestExperimentLengthControl(unittest.TestCase):
     def test_v4_prompt_contains_context_and_target_length(self):
@@ -60,6 +114,33 @@ class TestExperimentLengthControl(unittest.TestCase):
         self.assertEqual(metadata["raw_generated_words"], 5)
         self.assertEqual(metadata["generated_words"], 2)
 
+    def test_early_stop_closes_stream_after_target_words(self):
+        client = FakeModelClient()
+        generated, _, target, metadata = _generate_response(
+            content="one two three four",
+            percentage=50,
+            model_client=client,
+            prompt_version="v4",
+            temperature=0.0,
+            seed=42,
+            token_multiplier=3.0,
+            early_stop=True,
+        )
+
+        self.assertEqual((target, generated), ("three four", "five six"))
+        self.assertTrue(client.stream_closed)
+        self.assertTrue(metadata["early_stopped"])
+        self.assertEqual(metadata["raw_generated_words"], 3)
+        self.assertEqual(metadata["tokens_saved"], 3)
+
+    def test_stream_until_word_count_keeps_final_word_whole(self):
+        chunks = iter(["five si", "x se", "ven"])
+        text, tokens, stopped = _stream_until_word_count(chunks, 2)
+        self.assertEqual((text, tokens, stopped), ("five six se", 2, True))
+
+        text, tokens, stopped = _stream_until_word_count(iter(["five", " six"]), 2)
+        self.assertEqual((text, tokens, stopped), ("five six", 2, False))
+
     def test_run_returns_configured_scores(self):
         result = run_experiments(
             title="songs::artist::title",
@@ -85,6 +166,15 @@ class TestBatchRunner(unittest.TestCase):
         self.assertEqual(_build_run_id(**args), _build_run_id(**args))
         self.assertNotEqual(_build_run_id(**args), _build_run_id(**{**args, "temperature": 0.7}))
 
+    def test_completed_run_ids_reads_an_existing_file(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            results_path = Path(temp_dir) / "results.csv"
+            _append_result(results_path, {"run_id": "done", "status": "completed"})
+            _append_result(results_path, {"run_id": "failed", "status": "error"})
+
+            self.assertEqual(_completed_run_ids(results_path), {"done"})
+            self.assertEqual(_completed_run_ids(Path(temp_dir) / "missing.csv"), set())
+
     def test_append_result_uses_only_configured_csv_fields(self):
         with tempfile.TemporaryDirectory() as temp_dir:
             path = Path(temp_dir) / "results.csv"
@@ -96,12 +186,7 @@ class TestBatchRunner(unittest.TestCase):
         self.assertEqual(rows[0]["run_id"], "id")
 
     def test_resume_skips_completed_run(self):
-        config = SimpleNamespace(
-            name="test", models=[SimpleNamespace(name="model", endpoint="http://unused")],
-            temperatures=[0.0], context_percentages=[50], random_seed=42,
-            prompt_version="v4", token_multiplier=1.5, include_semantic=False,
-            selected_text_ids=["songs::artist::title"], context_delay_seconds=0.0,
-        )
+        config = _runner_config()
         run_id = _build_run_id(
             text_title="songs::artist::title", model="model", temperature=0.0,
             context_percentage=50, prompt_version="v4", seed=42,
@@ -118,6 +203,337 @@ class TestBatchRunner(unittest.TestCase):
 
         self.assertFalse(client_class.return_value.generate.called)
 
+    def test_parallel_workers_run_grid_with_limit_and_resume(self):
+        texts = {
+            "songs::artist::one": "one two three four five six seven eight",
+            "songs::artist::two": "nine ten eleven twelve thirteen fourteen fifteen sixteen",
+        }
+        with FakeOllamaServer(FakeOllamaConfig(models=["model"], ttft_seconds=0.02, max_parallel=4)) as server, \
+                tempfile.TemporaryDirectory() as temp_dir:
+            config = _runner_config(
+                models=[SimpleNamespace(name="model", endpoint=server.base_url)],
+                temperatures=[0.0, 0.7], context_percentages=[25, 50, 75],
+                selected_text_ids=list(texts), max_concurrency=4,
+                telemetry_filename="run.prom",
+            )
+            results_path = Path(temp_dir) / "results.csv"
+            run_experiment(config, texts, results_path, max_runs=5)
+            first_pass = _read_rows(results_path)
+            run_experiment(config, texts, results_path)
+            rows = _read_rows(results_path)
+            telemetry = (Path(temp_dir) / "run.prom").read_text()
+
+        self.assertEqual(len(first_pass), 5)
+        self.assertEqual(len(rows), 12)
+        self.assertEqual(len({row["run_id"] for row in rows}), 12)
+        self.assertTrue(all(row["status"] == "completed" for row in rows))
+        self.assertTrue(all(int(row["eval_count"]) > 0 and float(row["wall_seconds"]) > 0 for row in rows))
+        self.assertTrue(all(int(row["prompt_eval_count"]) > 0 for row in rows))
+        self.assertIn('nudging_runs_total{experiment="test",model="model",status="completed"} 7', telemetry)
+        self.assertIn('nudging_runs_remaining{experiment="test"} 0', telemetry)
+        self.assertGreater(server.stats.snapshot()["peak_in_flight"], 1)
+
+    def test_coordinated_runners_split_the_grid_without_repeats(self):
+        import threading
+
+        texts = {
+            "songs::artist::one": "one two three four five six seven eight",
+            "songs::artist::two": "nine ten eleven twelve thirteen fourteen fifteen sixteen",
+        }
+        fake = FakeOllamaConfig(models=["model"], ttft_seconds=0.02, max_parallel=4)
+        with FakeOllamaServer(fake) as server, tempfile.TemporaryDirectory() as temp_dir:
+            config = _runner_config(
+                models=[SimpleNamespace(name="model", endpoint=server.base_url)],
+                temperatures=[0.0, 0.7], context_percentages=[25, 50, 75],
+                selected_text_ids=list(texts), coordinate_workers=True,
+            )
+            results_path = Path(temp_dir) / "results.csv"
+            runners = [
+                threading.Thread(target=run_experiment, args=(config, texts, results_path))
+                for _ in range(2)
+            ]
+            for runner in runners:
+                runner.start()
+            for runner in runners:
+                runner.join()
+            rows = _read_rows(results_path)
+            requests_served = server.stats.snapshot()["requests"]
+
+        self.assertEqual(sorted(row["run_id"] for row in rows), sorted(_expected_run_ids(config)))
+        self.assertTrue(all(row["status"] == "completed" for row in rows))
+        self.assertLessEqual(requests_served, 12 + 2 * 2)  # runs plus load/unload per runner
+
+    def test_coordinated_runner_leaves_models_loaded(self):
+        texts = {"songs::artist::one": "one two three four five six seven eight"}
+        with FakeOllamaServer(FakeOllamaConfig(models=["model"])) as server, \
+                tempfile.TemporaryDirectory() as temp_dir:
+            config = _runner_config(
+                models=[SimpleNamespace(name="model", endpoint=server.base_url)],
+                selected_text_ids=list(texts), coordinate_workers=True,
+            )
+            run_experiment(config, texts, Path(temp_dir) / "results.csv")
+            loaded = set(server.loaded_models)
+
+        self.assertEqual(loaded, {"model"})
+
+    def test_shards_merge_to_the_full_grid(self):
+        texts = {
+            "songs::artist::one": "one two three four five six seven eight",
+            "songs::artist::two": "nine ten eleven twelve thirteen fourteen fifteen sixteen",
+        }
+        with FakeOllamaServer(FakeOllamaConfig(models=["model"])) as server, \
+                tempfile.TemporaryDirectory() as temp_dir:
+            config = _runner_config(
+                models=[SimpleNamespace(name="model", endpoint=server.base_url)],
+                temperatures=[0.0, 0.7], context_percentages=[25, 50, 75],
+                selected_text_ids=list(texts),
+            )
+            root = Path(temp_dir)
+            shard_rows = []
+            for shard in ((1, 2), (2, 2)):
+                shard_path = _shard_path(root / "results.csv", shard)
+                run_experiment(config, texts, shard_path, shard=shard)
+                shard_rows.append(_read_rows(shard_path))
+            summary = merge_shards(
+                [_shard_path(root / "results.csv", (1, 2)), _shard_path(root / "results.csv", (2, 2))],
+                root / "merged.csv",
+                config,
+            )
+            merged = _read_rows(root / "merged.csv")
+
+        self.assertEqual(len(shard_rows[0]) + len(shard_rows[1]), 12)
+        self.assertFalse({r["run_id"] for r in shard_rows[0]} & {r["run_id"] for r in shard_rows[1]})
+        self.assertEqual([row["run_id"] for row in merged], list(_expected_run_ids(config)))
+        self.assertEqual((summary["missing"], summary["failed"]), ([], []))
+
+    def test_merge_reports_gaps_and_prefers_completed_rows(self):
+        config = _runner_config(context_percentages=[25, 50])
+        first, second = _expected_run_ids(config)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            _append_result(root / "a.csv", {"run_id": first, "status": "completed"})
+            _append_result(root / "b.csv", {"run_id": first, "status": "error"})
+            _append_result(root / "b.csv", {"run_id": "unknown", "status": "completed"})
+            summary = merge_shards([root / "a.csv", root / "b.csv"], root / "merged.csv", config)
+            merged = _read_rows(root / "merged.csv")
+
+        self.assertEqual([(row["run_id"], row["status"]) for row in merged], [(first, "completed")])
+        self.assertEqual(summary["missing"], [second])
+        self.assertEqual(summary["unknown"], 1)
+
+    def test_plan_counts_pending_runs_with_measured_throughput(self):
+        texts = {"songs::artist::one": " ".join(f"w{index}" for index in range(40))}
+        config = _runner_config(
+            temperatures=[0.0, 0.7], context_percentages=[25, 75],
+            selected_text_ids=list(texts),
+        )
+        done_id = next(iter(_expected_run_ids(config)))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            results_path = Path(temp_dir) / "results.csv"
+            _append_result(results_path, {
+                "run_id": done_id, "status": "completed", "model": "model",
+                "prompt_eval_tokens_per_second": 400.0, "eval_tokens_per_second": 40.0,
+            })
+            summary = plan_experiment(config, texts, results_path, concurrency=2)
+
+        self.assertEqual((summary["runs"], summary["skipped"]), (3, 1))
+        self.assertEqual(summary["models"]["model"]["throughput"].source, "results")
+        # the two temperatures of one context share the whole prompt
+        self.assertGreater(summary["reused_prompt_tokens"], 0)
+        self.assertLess(summary["wall_seconds"], summary["serial_seconds"])
+
+    def test_plan_reads_history_once_without_creating_files(self):
+        from nudging.generations import GenerationStore
+
+        texts = {"songs::artist::one": " ".join(f"w{index}" for index in range(40))}
+        config = _runner_config(selected_text_ids=list(texts))
+        row = {
+            "run_id": "earlier", "status": "completed", "model": "model",
+            "prompt_eval_tokens_per_second": 400.0, "eval_tokens_per_second": 40.0,
+        }
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            _append_result(root / "old.csv", row)
+            store = open_results_store(root / "old.sqlite", RESULT_FIELDS)
+            store.append({**row, "run_id": "earlier-sqlite"})
+            store.close()
+            GenerationStore(root / "old.generations.sqlite").close()
+            history = sorted(root.iterdir())
+
+            fresh = plan_experiment(config, texts, root / "new.sqlite", history_paths=history)
+            created = (root / "new.sqlite").exists()
+            rerun = plan_experiment(config, texts, root / "old.csv", history_paths=history)
+
+        self.assertFalse(created)
+        self.assertEqual(fresh["models"]["model"]["throughput"].samples, 2)
+        self.assertEqual(rerun["models"]["model"]["throughput"].samples, 2)
+
+    def test_generate_stage_then_score_stage_matches_inline_scoring(self):
+        texts = {"songs::artist::one": "the night we left the city lights were burning slow and you said"}
+        with FakeOllamaServer(FakeOllamaConfig(models=["model"])) as server, \
+                tempfile.TemporaryDirectory() as temp_dir:
+            config = _runner_config(
+                models=[SimpleNamespace(name="model", endpoint=server.base_url)],
+                context_percentages=[25, 50], selected_text_ids=list(texts),
+            )
+            inline_path = Path(temp_dir) / "inline.csv"
+            staged_path = Path(temp_dir) / "staged.csv"
+            run_experiment(config, texts, inline_path)
+            run_experiment(config, texts, staged_path, score=False)
+            unscored = _read_rows(staged_path)
+            summary = score_experiment(config, texts, staged_path)
+            rescored = _read_rows(staged_path)
+            inline = _read_rows(inline_path)
+            changed = score_experiment(config, {"songs::artist::one": "a different text"}, staged_path)
+
+        score_columns = ["exact_match", "fuzzy_match", "token_overlap"]
+        self.assertTrue(all(row[column] == "" for row in unscored for column in score_columns))
+        self.assertEqual(summary, {"scored": 2, "missing": 0, "stale": 0})
+        self.assertEqual(
+            sorted((row["run_id"], *(row[column] for column in score_columns)) for row in rescored),
+            sorted((row["run_id"], *(row[column] for column in score_columns)) for row in inline),
+        )
+        self.assertEqual(changed["stale"], 2)
+
+    def test_samples_share_a_condition_and_draw_consecutive_seeds(self):
+        texts = {"songs::artist::one": "one two three four five six seven eight"}
+        with FakeOllamaServer(FakeOllamaConfig(models=["model"])) as server, \
+                tempfile.TemporaryDirectory() as temp_dir:
+            config = _runner_config(
+                models=[SimpleNamespace(name="model", endpoint=server.base_url)],
+                temperatures=[0.0, 0.7], selected_text_ids=list(texts), samples_per_condition=3,
+            )
+            results_path = Path(temp_dir) / "results.csv"
+            run_experiment(config, texts, results_path)
+            rows = _read_rows(results_path)
+
+        sampled = [row for row in rows if row["temperature"] == "0.7"]
+        greedy = [row for row in rows if row["temperature"] == "0.0"]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(sorted(row["run_id"] for row in rows), sorted(_expected_run_ids(config)))
+        self.assertEqual([(row["sample"], row["seed"]) for row in sampled], [("0", "42"), ("1", "43"), ("2", "44")])
+        self.assertEqual({row["condition_id"] for row in sampled}, {sampled[0]["run_id"]})
+        self.assertEqual(greedy[0]["condition_id"], greedy[0]["run_id"])
+        # sample 0 keeps the run_id a single-sample run of the condition had
+        self.assertIn(sampled[0]["run_id"], _expected_run_ids(_runner_config(
+            temperatures=[0.0, 0.7], selected_text_ids=list(texts),
+        )))
+
+    def test_unseeded_samples_get_distinct_run_ids(self):
+        texts = {"songs::artist::one": "one two three four five six seven eight"}
+        with FakeOllamaServer(FakeOllamaConfig(models=["model"])) as server, \
+                tempfile.TemporaryDirectory() as temp_dir:
+            config = _runner_config(
+                models=[SimpleNamespace(name="model", endpoint=server.base_url)], random_seed=None,
+                temperatures=[0.7], selected_text_ids=list(texts), samples_per_condition=3,
+            )
+            results_path = Path(temp_dir) / "results.csv"
+            run_experiment(config, texts, results_path)
+            rows = _read_rows(results_path)
+
+        self.assertEqual(len(_expected_run_ids(config)), 3)
+        self.assertEqual(sorted(row["run_id"] for row in rows), sorted(_expected_run_ids(config)))
+        self.assertEqual(sorted(row["sample"] for row in rows), ["0", "1", "2"])
+        self.assertEqual({row["condition_id"] for row in rows}, {rows[0]["run_id"]})
+
+    def test_runner_computes_only_configured_metrics(self):
+        texts = {"songs::artist::one": "one two three four five six seven eight"}
+        with FakeOllamaServer(FakeOllamaConfig(models=["model"])) as server, \
+                tempfile.TemporaryDirectory() as temp_dir:
+            config = _runner_config(
+                models=[SimpleNamespace(name="model", endpoint=server.base_url)],
+                selected_text_ids=list(texts), metrics=["exact_match"],
+            )
+            results_path = Path(temp_dir) / "results.csv"
+            METRICS.reset_timings()
+            run_experiment(config, texts, results_path)
+            rows = _read_rows(results_path)
+
+        self.assertEqual(list(METRICS.timings()), ["exact_match"])
+        self.assertNotEqual(rows[0]["exact_match"], "")
+        self.assertEqual((rows[0]["fuzzy_match"], rows[0]["token_overlap"]), ("", ""))
+
+    def test_generate_stage_requires_stored_generations(self):
+        config = _runner_config(store_generations=False)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            results_path = Path(temp_dir) / "results.csv"
+            with self.assertRaisesRegex(ValueError, "store_generations"):
+                run_experiment(config, {"songs::artist::title": "one two three four"}, results_path, score=False)
+            self.assertFalse(results_path.exists())
+
+    def test_server_pool_failure_still_closes_the_run(self):
+        import threading
+
+        from nudging.server_pool import ServerPoolError
+
+        config = _runner_config(coordinate_workers=True, telemetry_filename="metrics.prom")
+        with tempfile.TemporaryDirectory() as temp_dir, patch(
+            "experiments.run_memorisation_experiment._start_server_pool",
+            side_effect=ServerPoolError("did not become ready"),
+        ):
+            with self.assertRaises(ServerPoolError):
+                run_experiment(config, {"songs::artist::title": "one two three four"}, Path(temp_dir) / "results.csv")
+            running = {thread.name for thread in threading.enumerate()}
+
+        self.assertNotIn("lease-heartbeat", running)
+        self.assertNotIn("telemetry-textfile", running)
+
+    def test_setup_failure_still_closes_the_run(self):
+        import os
+        import threading
+
+        config = _runner_config(coordinate_workers=True, telemetry_filename="metrics.prom")
+        with tempfile.TemporaryDirectory() as temp_dir, patch(
+            "nudging.leases.RunLeaseQueue", side_effect=OSError("disk full"),
+        ):
+            with self.assertRaises(OSError):
+                run_experiment(config, {"songs::artist::title": "one two three four"}, Path(temp_dir) / "results.csv")
+            running = {thread.name for thread in threading.enumerate()}
+            written = [path.name for path in Path(temp_dir).glob("metrics*.prom")]
+
+        self.assertNotIn("telemetry-textfile", running)
+        self.assertEqual(written, [f"metrics.{os.getpid()}.prom"])
+
+    def test_coordinated_runners_cannot_share_a_metrics_port(self):
+        config = _runner_config(coordinate_workers=True, metrics_port=9109)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            results_path = Path(temp_dir) / "results.csv"
+            with self.assertRaisesRegex(ValueError, "metrics_port"):
+                run_experiment(config, {"songs::artist::title": "one two three four"}, results_path)
+            self.assertFalse(results_path.exists())
+
+    def test_export_keeps_selected_metric_columns(self):
+        config = _runner_config(metrics=["exact_match", "rouge_l"])
+        with tempfile.TemporaryDirectory() as temp_dir:
+            results_path = Path(temp_dir) / "results.sqlite"
+            store = open_results_store(results_path, RESULT_FIELDS + ["rouge_l"])
+            store.append({"run_id": "run", "status": "completed", "exact_match": 0.5, "rouge_l": 0.25})
+            store.close()
+            exported = export_results(config, results_path, Path(temp_dir) / "export.csv")
+            rows = _read_rows(Path(temp_dir) / "export.csv")
+
+        self.assertEqual(exported, 1)
+        self.assertEqual((rows[0]["exact_match"], rows[0]["rouge_l"]), ("0.5", "0.25"))
+
+    def test_pending_conditions_apply_limit_after_skipping(self):
+        conditions = expand_grid(["songs::artist::title"], ["model"], [0.0, 0.7], [25, 50])
+        config = _runner_config()
+        done = _build_run_id(
+            text_title="songs::artist::title", model="model", temperature=0.0,
+            context_percentage=25, prompt_version="v4", seed=42,
+        )
+        pending, skipped = _pending_conditions(conditions, config, {done}, max_runs=2)
+
+        self.assertEqual(skipped, 1)
+        self.assertEqual([condition for condition, _ in pending], conditions[1:3])
+
+    def test_context_delay_becomes_rate_limit(self):
+        _, rate_limiter = _build_pacing(_runner_config(context_delay_seconds=5.0))
+        self.assertEqual(rate_limiter.rate, 0.2)
+        limiter, rate_limiter = _build_pacing(_runner_config(adaptive_concurrency=True, max_concurrency=4))
+        self.assertIsNone(rate_limiter)
+        self.assertEqual(limiter.max_limit, 4)
+
 
 if __name__ == "__main__":
     unittest.main()
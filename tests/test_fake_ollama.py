@@ -0,0 +1,117 @@
+import threading
+import time
+import unittest
+
+import requests
+
+from nudging.experiment import run_experiments
+from nudging.fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from nudging.models import OllamaClient
+
+
+class TestFakeOllamaServer(unittest.TestCase):
+    def _client(self, server, **options):
+        return OllamaClient(model="qwen2.5:0.5b-instruct", base_url=server.base_url, **options)
+
+    def test_tags_and_non_streaming_generate(self):
+        with FakeOllamaServer() as server:
+            client = self._client(server)
+            self.assertTrue(client.is_running())
+            response = client.generate("prompt", temperature=0.0, num_predict=5)
+
+        self.assertEqual(len(response.split()), 5)
+        self.assertEqual(server.stats.snapshot()["tokens"], 5)
+
+    def test_streaming_generate_and_chat(self):
+        with FakeOllamaServer() as server:
+            client = self._client(server)
+            chunks = list(client.generate("prompt", stream=True, num_predict=4))
+            chat = client.chat([{"role": "user", "content": "hi"}], num_predict=3)
+            chat_chunks = list(client.chat([{"role": "user", "content": "hi"}], stream=True, num_predict=3))
+
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(len(chat.split()), 3)
+        self.assertEqual("".join(chat_chunks), chat)
+
+    def test_unknown_model_is_404(self):
+        with FakeOllamaServer() as server:
+            client = OllamaClient(model="missing", base_url=server.base_url)
+            with self.assertRaises(requests.HTTPError) as raised:
+                client.generate("prompt")
+
+        self.assertEqual(raised.exception.response.status_code, 404)
+
+    def test_max_parallel_queues_extra_requests(self):
+        config = FakeOllamaConfig(max_parallel=2, ttft_seconds=0.05)
+        with FakeOllamaServer(config) as server:
+            client = self._client(server)
+            threads = [
+                threading.Thread(target=client.generate, args=("prompt",), kwargs={"num_predict": 1})
+                for _ in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        stats = server.stats.snapshot()
+        self.assertEqual(stats["requests"], 5)
+        self.assertEqual(stats["peak_in_flight"], 2)
+
+    def test_error_injection_is_reproducible(self):
+        def failures():
+            with FakeOllamaServer(FakeOllamaConfig(error_rate=0.5, error_status=503, seed=7)) as server:
+                client = self._client(server)
+                outcomes = []
+                for _ in range(10):
+                    try:
+                        client.generate("prompt", num_predict=1)
+                        outcomes.append(True)
+                    except requests.HTTPError as exc:
+                        self.assertEqual(exc.response.status_code, 503)
+                        outcomes.append(False)
+                return outcomes
+
+        first = failures()
+        self.assertEqual(first, failures())
+        self.assertIn(False, first)
+        self.assertIn(True, first)
+
+    def test_load_replies_like_ollama_and_unload_evicts(self):
+        with FakeOllamaServer(FakeOllamaConfig(load_seconds=0.01)) as server:
+            client = self._client(server)
+            started = time.perf_counter()
+            reply = client.load(keep_alive="5m")
+            self.assertGreaterEqual(time.perf_counter() - started, 0.01)
+            self.assertEqual(reply["done_reason"], "load")
+            self.assertNotIn("load_duration", reply)
+            client.unload()
+            self.assertEqual(server.loaded_models, set())
+
+    def test_decode_speed_is_simulated(self):
+        with FakeOllamaServer(FakeOllamaConfig(tokens_per_second=200)) as server:
+            started = time.perf_counter()
+            self._client(server).generate("prompt", num_predict=10)
+            self.assertGreaterEqual(time.perf_counter() - started, 0.05)
+
+    def test_runs_experiment_end_to_end_with_early_stop(self):
+        with FakeOllamaServer(FakeOllamaConfig(tokens_per_second=500)) as server:
+            result = run_experiments(
+                title="songs::artist::title",
+                content="one two three four five six seven eight",
+                percentage=50,
+                model_client=self._client(server),
+                prompt_version="v4",
+                temperature=0.0,
+                seed=42,
+                token_multiplier=1.5,
+                early_stop=True,
+            )
+
+        self.assertEqual(result["generated_words"], 4)
+        self.assertTrue(result["early_stopped"])
+        self.assertGreater(result["tokens_saved"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from nudging.generations import GenerationRecord, GenerationStore, text_sha256
+
+
+def _record(run_id="run", generation="five six"):
+    return GenerationRecord(
+        run_id=run_id, text_title="songs::artist::title", text_sha256=text_sha256("one two three four"),
+        model="model", temperature=0.0, seed=42, prompt_version="v4",
+        context_words=2, target_words=2, raw_generation=f"{generation} seven", generation=generation,
+    )
+
+
+class TestGenerationStore(unittest.TestCase):
+    def test_round_trip_and_replace(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "generations.sqlite"
+            with GenerationStore(path) as store:
+                store.put(_record())
+                store.put(_record(generation="eight nine"))
+                store.put(_record(run_id="other"))
+            with GenerationStore(path) as store:
+                self.assertEqual(len(store), 2)
+                self.assertEqual(store.get("run"), _record(generation="eight nine"))
+                self.assertIsNone(store.get("missing"))
+                self.assertEqual([record.run_id for record in store.records()], ["run", "other"])
+
+    def test_identical_texts_are_stored_once_and_compressed(self):
+        long_text = " ".join(["we drove all night and the radio played"] * 50)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with GenerationStore(Path(temp_dir) / "generations.sqlite", codec="zlib") as store:
+                for index in range(10):
+                    store.put(_record(run_id=f"run{index}", generation=long_text))
+                stats = store.stats()
+                records = list(store.records())
+
+        self.assertEqual((stats["runs"], stats["blobs"]), (10, 2))
+        self.assertLess(stats["stored_bytes"], stats["text_bytes"] / 10)
+        self.assertGreater(stats["referenced_bytes"], stats["text_bytes"] * 9)
+        self.assertTrue(all(record.generation == long_text for record in records))
+
+    def test_prune_drops_unreferenced_blobs(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with GenerationStore(Path(temp_dir) / "generations.sqlite") as store:
+                store.put(_record(generation="five six"))
+                store.put(_record(generation="eight nine"))
+                self.assertEqual(store.prune(), 2)
+                self.assertEqual(store.get("run").generation, "eight nine")
+
+    def test_unknown_codec_is_rejected(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with self.assertRaisesRegex(ValueError, "Unknown codec"):
+                GenerationStore(Path(temp_dir) / "generations.sqlite", codec="lz4")
+
+    def test_target_is_rebuilt_from_offsets(self):
+        self.assertEqual(_record().target_from("one two  three\nfour five"), "three four")
+
+
+if __name__ == "__main__":
+    unittest.main()
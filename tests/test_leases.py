@@ -0,0 +1,54 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from nudging.leases import RunLeaseQueue
+
+
+class TestRunLeaseQueue(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self._temp_dir.name) / "leases.sqlite"
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def test_claim_is_exclusive_until_released(self):
+        with RunLeaseQueue(self.path, owner="a") as first, RunLeaseQueue(self.path, owner="b") as second:
+            self.assertTrue(first.claim("run"))
+            self.assertTrue(first.claim("run"))
+            self.assertFalse(second.claim("run"))
+            first.release("run")
+            self.assertTrue(second.claim("run"))
+
+    def test_completed_runs_are_never_claimed_again(self):
+        with RunLeaseQueue(self.path, owner="a", lease_seconds=0.01) as first, \
+                RunLeaseQueue(self.path, owner="b") as second:
+            first.claim("run")
+            first.complete("run")
+            time.sleep(0.02)
+            self.assertFalse(second.claim("run"))
+            self.assertEqual(second.counts(), {"done": 1, "live": 0, "expired": 0})
+
+    def test_expired_lease_is_taken_over_and_heartbeat_prevents_it(self):
+        with RunLeaseQueue(self.path, owner="dead", lease_seconds=0.05) as dead, \
+                RunLeaseQueue(self.path, owner="live", lease_seconds=0.05, heartbeat_seconds=0.01) as live, \
+                RunLeaseQueue(self.path, owner="other") as other:
+            dead.claim("stale")
+            live.claim("busy")
+            live.start_heartbeat()
+            time.sleep(0.1)
+            self.assertTrue(other.claim("stale"))
+            self.assertFalse(other.claim("busy"))
+
+    def test_close_releases_unfinished_leases(self):
+        first = RunLeaseQueue(self.path, owner="a")
+        first.claim("run")
+        first.close()
+        with RunLeaseQueue(self.path, owner="b") as second:
+            self.assertTrue(second.claim("run"))
+
+
+if __name__ == "__main__":
+    unittest.main()
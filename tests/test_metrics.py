@@ -0,0 +1,153 @@
+import random
+import unittest
+
+from nudging.metrics import (
+    DEFAULT_METRICS,
+    METRICS,
+    Metric,
+    MetricRegistry,
+    exact_match_score,
+    fuzzy_match_score,
+    longest_common_span_score,
+    ngram_precision_score,
+    ngram_recall_score,
+    rouge_l_score,
+    score_batch,
+    token_overlap_score,
+)
+
+
+PAIRS = [
+    ("the night we left", "The night we left the city"),
+    ("  Lights were burning ", "lights were burning slow"),
+    ("", "a target"),
+    ("a generation", ""),
+    ("", ""),
+    ("word word word", "word"),
+    ("Ünïcode çafé", "ünïcode cafe"),
+]
+
+
+class TestScoreBatch(unittest.TestCase):
+    def test_batch_matches_pairwise_scores(self):
+        generated, targets = zip(*PAIRS)
+        scores = score_batch(generated, targets)
+
+        for metric, score in (
+                ("exact_match", exact_match_score),
+                ("fuzzy_match", fuzzy_match_score),
+                ("token_overlap", token_overlap_score),
+        ):
+            self.assertEqual(scores[metric].tolist(), [score(g, t) for g, t in PAIRS], metric)
+
+    def test_selected_metrics_and_empty_batch(self):
+        self.assertEqual(list(score_batch(["a"], ["a"], ["fuzzy_match"])), ["fuzzy_match"])
+        self.assertEqual(score_batch([], [])["token_overlap"].shape, (0,))
+
+    def test_rejects_mismatched_lengths_and_unknown_metrics(self):
+        with self.assertRaises(ValueError):
+            score_batch(["a"], [])
+        with self.assertRaises(ValueError):
+            score_batch(["a"], ["a"], ["bleu"])
+
+
+def _lcs_by_table(a, b):
+    previous = [0] * (len(b) + 1)
+    for x in a:
+        current = [0]
+        for j, y in enumerate(b):
+            current.append(previous[j] + 1 if x == y else max(previous[j + 1], current[j]))
+        previous = current
+    return previous[-1]
+
+
+class TestVerbatimMetrics(unittest.TestCase):
+    def test_inserted_word_keeps_the_longest_span(self):
+        target = "we were both young when I first saw you"
+        generated = "we were both so young when I first saw you"
+
+        self.assertLess(exact_match_score(generated, target), 0.5)
+        self.assertEqual(longest_common_span_score(generated, target), 6 / 9)
+        self.assertEqual(longest_common_span_score("", target), 0.0)
+        self.assertEqual(longest_common_span_score(target.upper(), target), 1.0)
+
+    def test_longest_span_matches_brute_force(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            a = rng.choices("abc", k=rng.randint(0, 15))
+            b = rng.choices("abc", k=rng.randint(1, 15))
+            brute = max(
+                (k for i in range(len(a)) for j in range(len(b)) for k in range(1, min(len(a) - i, len(b) - j) + 1)
+                 if a[i:i + k] == b[j:j + k]),
+                default=0,
+            )
+            self.assertEqual(longest_common_span_score(" ".join(a), " ".join(b)), brute / len(b))
+
+    def test_ngram_precision_and_recall_clip_repeats(self):
+        target = "a b c d e f"
+        generated = "a b c d a b c d"
+
+        self.assertEqual(ngram_recall_score(generated, target, n=4), 1 / 3)
+        self.assertEqual(ngram_precision_score(generated, target, n=4), 1 / 5)
+        self.assertEqual(ngram_recall_score("a b c", target, n=4), 0.0)
+        self.assertEqual(ngram_precision_score("a b c", target, n=4), 0.0)
+
+    def test_rouge_l_matches_table_lcs(self):
+        rng = random.Random(1)
+        for _ in range(200):
+            a = rng.choices("abcd", k=rng.randint(1, 20))
+            b = rng.choices("abcd", k=rng.randint(1, 20))
+            lcs = _lcs_by_table(a, b)
+            expected = 2 * lcs / (len(a) + len(b))
+            self.assertAlmostEqual(rouge_l_score(" ".join(a), " ".join(b)), expected)
+
+    def test_metrics_scale_to_long_transcripts(self):
+        rng = random.Random(2)
+        words = [f"w{index}" for index in range(3000)]
+        target = " ".join(rng.choices(words, k=6000))
+        names = ["longest_common_span", "ngram_recall_16", "rouge_l"]
+
+        scores = METRICS.score(target, target, names)
+
+        self.assertEqual(scores, dict.fromkeys(names, 1.0))
+
+
+class TestMetricRegistry(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.registry = MetricRegistry()
+        self.registry.register(Metric("length", self._length, cost="moderate"))
+        self.registry.register(Metric("exact_match", exact_match_score))
+
+    def _length(self, generated, target):
+        self.calls.append(generated)
+        return float(len(generated))
+
+    def test_only_selected_metrics_are_computed_and_timed(self):
+        self.assertEqual(self.registry.score("abc", "abd", ["exact_match"]), {"exact_match": 2 / 3})
+        self.assertEqual(self.calls, [])
+        columns = self.registry.score_batch(["a", "bb"], ["a", "b"], ["length"])
+        timings = self.registry.timings()
+
+        self.assertEqual(columns["length"].tolist(), [1.0, 2.0])
+        self.assertEqual({name: timing["pairs"] for name, timing in timings.items()}, {"exact_match": 1, "length": 2})
+        self.assertTrue(all(timing["seconds"] >= 0 for timing in timings.values()))
+        self.registry.reset_timings()
+        self.assertEqual(self.registry.timings(), {})
+
+    def test_registration_and_selection_are_validated(self):
+        with self.assertRaises(ValueError):
+            self.registry.register(Metric("length", self._length))
+        with self.assertRaises(ValueError):
+            self.registry.register(Metric("other", self._length, cost="free"))
+        with self.assertRaises(ValueError):
+            self.registry.select(["missing"])
+        self.assertEqual(self.registry.names(cost="moderate"), ["length"])
+
+    def test_default_registry_declares_builtin_metrics(self):
+        self.assertTrue(all(metric.batchable for metric in METRICS.select(DEFAULT_METRICS)))
+        self.assertEqual(METRICS.names(cost="expensive"), ["semantic_similarity"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,9 @@
+import asyncio
+import threading
+import time
 import unittest
 from unittest.mock import Mock, patch, MagicMock
-from nudging.models import OllamaClient
+from nudging.models import AsyncOllamaClient, OllamaClient
 import json
 import requests
 
@@ -19,7 +22,7 @@ class TestOllamaClient(unittest.TestCase):
         self.assertEqual(self.client.base_url, "http://localhost:11434")
         self.assertEqual(self.client.timeout, 120)
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_generate_with_temperature(self, mock_post):
         """Test generate method applies temperature parameter correctly."""
         mock_response = Mock()
@@ -35,7 +38,40 @@ class TestOllamaClient(unittest.TestCase):
 
 
 
-    @patch('requests.get')
+    @patch('requests.Session.post')
+    def test_generate_returns_server_timings(self, mock_post):
+        """Test Ollama's counters come back with the text, in seconds."""
+        mock_post.return_value.json.return_value = {
+            "response": "Response", "total_duration": 3_000_000_000, "load_duration": 500_000_000,
+            "prompt_eval_count": 40, "prompt_eval_duration": 200_000_000,
+            "eval_count": 20, "eval_duration": 1_000_000_000,
+        }
+
+        response = self.client.generate("Hello")
+
+        self.assertEqual(response, "Response")
+        self.assertEqual(response.timings.load_seconds, 0.5)
+        self.assertEqual(response.timings.eval_tokens_per_second, 20.0)
+        self.assertEqual(response.timings.prompt_eval_tokens_per_second, 200.0)
+        self.assertGreaterEqual(response.timings.wall_seconds, 0.0)
+
+    @patch('requests.Session.post')
+    def test_stream_timings_come_from_final_chunk(self, mock_post):
+        """Test a stream exposes timings once consumed, or wall time only when closed early."""
+        mock_post.return_value.iter_lines.return_value = [
+            b'{"response": "Hello"}',
+            b'{"response": "", "done": true, "eval_count": 1, "eval_duration": 1000}',
+        ]
+        chunks = self.client.generate("Say hello", stream=True)
+        self.assertEqual(list(chunks), ["Hello"])
+        self.assertEqual(chunks.timings.eval_count, 1)
+
+        chunks = self.client.generate("Say hello", stream=True)
+        chunks.close()
+        self.assertIsNone(chunks.timings.eval_count)
+        mock_post.return_value.close.assert_called()
+
+    @patch('requests.Session.get')
     def test_is_running_returns_true_when_ollama_responds(self, mock_get):
         """Test Ollama readiness check."""
         mock_response = Mock()
@@ -48,13 +84,46 @@ class TestOllamaClient(unittest.TestCase):
             timeout=2,
         )
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_is_running_returns_false_when_ollama_unavailable(self, mock_get):
         """Test failed Ollama readiness check."""
         mock_get.side_effect = requests.RequestException("unavailable")
 
         self.assertFalse(self.client.is_running())
 
+    def test_keep_alive_is_sent_only_when_configured(self):
+        """Test keep_alive is a top-level request field."""
+        self.assertNotIn("keep_alive", self.client._build_generate_payload("Hello"))
+        client = OllamaClient(keep_alive="30m")
+        self.assertEqual(client._build_generate_payload("Hello")["keep_alive"], "30m")
+        self.assertEqual(client._build_chat_payload([])["keep_alive"], "30m")
+        payload = client._build_generate_payload("Hello", keep_alive=0)
+        self.assertEqual(payload["keep_alive"], 0)
+        self.assertNotIn("keep_alive", payload["options"])
+
+    def test_session_is_reused_across_calls(self):
+        """Test one pooled session serves every request from the client."""
+        session = self.client.session
+        with patch.object(session, "post") as mock_post, patch.object(session, "get") as mock_get:
+            mock_post.return_value.json.return_value = {"response": "Response"}
+            self.client.generate("one")
+            self.client.generate("two")
+            self.client.is_running()
+
+        self.assertIs(self.client.session, session)
+        self.assertEqual(mock_post.call_count, 2)
+        mock_get.assert_called_once()
+
+    def test_session_pool_size_and_keep_alive_are_configurable(self):
+        """Test adapter pool sizing and the Connection header."""
+        client = OllamaClient(pool_maxsize=3, http_keep_alive=False)
+        adapter = client.session.get_adapter("http://localhost:11434")
+
+        self.assertEqual(adapter._pool_maxsize, 3)
+        self.assertTrue(adapter._pool_block)
+        self.assertEqual(client.session.headers["Connection"], "close")
+        self.assertEqual(self.client.session.headers["Connection"], "keep-alive")
+
     @patch('time.sleep')
     @patch('subprocess.Popen')
     @patch.object(OllamaClient, 'is_running')
@@ -65,12 +134,15 @@ class TestOllamaClient(unittest.TestCase):
             mock_sleep,
     ):
         """Test local Ollama startup path."""
-        mock_is_running.side_effect = [False, True]
+        mock_is_running.side_effect = [False, False, False, True]
 
         self.assertTrue(self.client.ensure_running())
 
         mock_popen.assert_called_once()
-        mock_sleep.assert_called_once_with(3.0)
+        self.assertEqual(
+            [call.args[0] for call in mock_sleep.call_args_list],
+            [0.05, 0.1],
+        )
 
     @patch('subprocess.Popen')
     @patch.object(OllamaClient, 'is_running')
@@ -81,7 +153,7 @@ class TestOllamaClient(unittest.TestCase):
         self.assertFalse(self.client.ensure_running(start_if_needed=False))
         mock_popen.assert_not_called()
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def _test_generate_stream(self, mock_post):
         """Test generate method in streaming mode"""
         mock_response = Mock()
@@ -101,7 +173,7 @@ class TestOllamaClient(unittest.TestCase):
         self.assertEqual(chunks, ["Hello", " world", "!"])
 
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def _test_chat_stream(self, mock_post):
         """Test chat method in streaming mode"""
         mock_response = Mock()
@@ -120,6 +192,99 @@ class TestOllamaClient(unittest.TestCase):
         self.assertEqual(chunks, ["Hi", " there", "!"])
 
 
+class TestAsyncOllamaClient(unittest.TestCase):
+    @patch('requests.Session.post')
+    def test_generate_uses_shared_payload(self, mock_post):
+        """Test async generate sends the same payload as the sync client."""
+        mock_response = Mock()
+        mock_response.json.return_value = {"response": "Response"}
+        mock_post.return_value = mock_response
+        client = OllamaClient(model="qwen3:0.6b")
+        async_client = AsyncOllamaClient(client=client, max_in_flight=2)
+
+        result = asyncio.run(async_client.generate("Hello", temperature=0.0, seed=42))
+
+        self.assertEqual(result, "Response")
+        self.assertEqual(
+            mock_post.call_args.kwargs['json'],
+            client._build_generate_payload("Hello", temperature=0.0, seed=42),
+        )
+
+    def test_generate_many_bounds_in_flight_requests(self):
+        """Test no more than max_in_flight generations run at once."""
+        lock = threading.Lock()
+        in_flight = 0
+        peak = 0
+
+        def fake_generate(prompt, **options):
+            nonlocal in_flight, peak
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.02)
+            with lock:
+                in_flight -= 1
+            return prompt.upper()
+
+        client = OllamaClient()
+        async_client = AsyncOllamaClient(client=client, max_in_flight=3)
+        with patch.object(client, "generate", side_effect=fake_generate):
+            results = asyncio.run(async_client.generate_many(list("abcdefgh")))
+
+        self.assertEqual(results, list("ABCDEFGH"))
+        self.assertEqual(peak, 3)
+
+    @patch('requests.Session.post')
+    def test_generate_stream_yields_chunks(self, mock_post):
+        """Test async streaming drains the blocking chunk iterator."""
+        mock_response = Mock()
+        mock_response.iter_lines.return_value = [
+            b'{"response": "Hello"}',
+            b'{"response": " world"}',
+        ]
+        mock_post.return_value = mock_response
+        async_client = AsyncOllamaClient(max_in_flight=1)
+
+        async def collect():
+            stream = await async_client.generate("Say hello", stream=True)
+            return [chunk async for chunk in stream]
+
+        self.assertEqual(asyncio.run(collect()), ["Hello", " world"])
+
+    @patch('requests.Session.post')
+    def test_stream_closed_early_releases_the_connection(self, mock_post):
+        """Test breaking out of an async stream closes the response."""
+        mock_response = Mock()
+        mock_response.iter_lines.return_value = iter([
+            b'{"response": "Hello"}',
+            b'{"response": " world"}',
+        ])
+        mock_post.return_value = mock_response
+        async_client = AsyncOllamaClient(max_in_flight=1)
+
+        async def first_chunk():
+            stream = await async_client.generate("Say hello", stream=True)
+            async for chunk in stream:
+                await stream.aclose()
+                return chunk
+
+        self.assertEqual(asyncio.run(first_chunk()), "Hello")
+        mock_response.close.assert_called()
+
+    def test_conflicting_max_in_flight_and_limiter_are_rejected(self):
+        from nudging.concurrency import AdaptiveConcurrencyLimiter
+
+        limiter = AdaptiveConcurrencyLimiter(max_limit=8)
+        with self.assertRaisesRegex(ValueError, "max_in_flight"):
+            AsyncOllamaClient(max_in_flight=2, limiter=limiter)
+        self.assertEqual(AsyncOllamaClient(limiter=limiter).max_in_flight, 8)
+        self.assertEqual(AsyncOllamaClient().max_in_flight, 4)
+
+    def test_max_in_flight_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            AsyncOllamaClient(max_in_flight=0)
+
+
 class TestOllamaIntegration(unittest.TestCase):
     """Integration tests that require a running Ollama instance"""
 
@@ -0,0 +1,77 @@
+import unittest
+
+from nudging.fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from nudging.models import OllamaClient
+from nudging.planning import (
+    DEFAULT_THROUGHPUT,
+    ConditionCost,
+    ModelThroughput,
+    format_plan,
+    probe_throughput,
+    summarise_plan,
+    throughput_from_rows,
+)
+from nudging.scheduling import RunCondition
+
+
+def _cost(model="a", percentage=50, prompt_tokens=100, reused=0, output_tokens=20):
+    return ConditionCost(
+        condition=RunCondition(text_title="t", model=model, temperature=0.0, context_percentage=percentage),
+        prompt_tokens=prompt_tokens,
+        reused_prompt_tokens=reused,
+        output_tokens=output_tokens,
+    )
+
+
+class TestPlanning(unittest.TestCase):
+    def test_throughput_uses_median_of_uncached_completed_rows(self):
+        rows = [
+            {"model": "a", "status": "completed", "cache_hit": "False", "prompt_eval_tokens_per_second": rate,
+             "eval_tokens_per_second": rate / 10, "load_seconds": load, "wall_seconds": "2.5", "total_seconds": "2"}
+            for rate, load in ((100.0, "0"), (300.0, "4"), (200.0, ""))
+        ]
+        rows.append({"model": "a", "status": "completed", "cache_hit": "True",
+                     "prompt_eval_tokens_per_second": "1", "eval_tokens_per_second": "1"})
+        rows.append({"model": "b", "status": "error"})
+
+        throughput = throughput_from_rows(rows)
+
+        self.assertEqual(set(throughput), {"a"})
+        self.assertEqual(throughput["a"].prompt_tokens_per_second, 200.0)
+        self.assertEqual(throughput["a"].eval_tokens_per_second, 20.0)
+        self.assertEqual(throughput["a"].load_seconds, 4.0)
+        self.assertEqual(throughput["a"].overhead_seconds, 0.5)
+        self.assertEqual(throughput["a"].samples, 3)
+
+    def test_summary_charges_new_prompt_tokens_and_scales_with_concurrency(self):
+        throughput = ModelThroughput(prompt_tokens_per_second=100.0, eval_tokens_per_second=10.0, load_seconds=5.0)
+        costs = [_cost(percentage=25), _cost(percentage=75, reused=50, output_tokens=40)]
+
+        summary = summarise_plan(costs, {"a": throughput}, concurrency=2)
+
+        # 1s + 2s, then 0.5s + 4s, plus one model load
+        self.assertAlmostEqual(summary["serial_seconds"], 12.5)
+        self.assertAlmostEqual(summary["wall_seconds"], 5.0 + 7.5 / 2)
+        self.assertEqual(summary["output_tokens"], 60)
+        self.assertEqual(summary["top"][0][1].condition.context_percentage, 75)
+        self.assertIn("75%", format_plan(summary))
+
+    def test_models_without_history_use_defaults(self):
+        summary = summarise_plan([_cost(model="unknown")], {})
+        self.assertIs(summary["models"]["unknown"]["throughput"], DEFAULT_THROUGHPUT)
+
+    def test_probe_reads_server_timings(self):
+        config = FakeOllamaConfig(models=["model"], ttft_seconds=0.01, tokens_per_second=500.0, load_seconds=0.01)
+        with FakeOllamaServer(config) as server, \
+                OllamaClient(model="model", base_url=server.base_url, keep_alive="30m") as client:
+            throughput = probe_throughput(client, prompt_words=20, num_predict=8)
+            # the probe does not leave the model pinned
+            self.assertEqual(server.loaded_models, set())
+
+        self.assertEqual(throughput.source, "probe")
+        self.assertGreater(throughput.eval_tokens_per_second, 0)
+        self.assertAlmostEqual(throughput.load_seconds, 0.01, places=3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from unittest.mock import patch
+
+from nudging.fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from nudging.models import OllamaClient
+from nudging.residency import ModelResidencyManager
+
+
+class TestModelResidencyManager(unittest.TestCase):
+    def setUp(self):
+        self.first = OllamaClient(model="first")
+        self.second = OllamaClient(model="second")
+
+    def test_load_sends_empty_prompt_with_keep_alive(self):
+        with patch.object(self.first.session, "post") as mock_post:
+            mock_post.return_value.json.return_value = {"load_duration": 2_500_000_000}
+            seconds = ModelResidencyManager(keep_alive="1h").warm(self.first)
+
+        self.assertEqual(seconds, 2.5)
+        self.assertEqual(
+            mock_post.call_args.kwargs["json"],
+            {"model": "first", "prompt": "", "keep_alive": "1h"},
+        )
+
+    def test_load_without_load_duration_is_timed_by_the_client(self):
+        with FakeOllamaServer(FakeOllamaConfig(models=["first"], load_seconds=0.05)) as server:
+            client = OllamaClient(model="first", base_url=server.base_url)
+            manager = ModelResidencyManager()
+            seconds = manager.warm(client)
+            client.close()
+
+        self.assertGreaterEqual(seconds, 0.05)
+        self.assertEqual(manager.load_durations, {"first": seconds})
+
+    def test_switching_models_unloads_previous_and_records_load_time(self):
+        manager = ModelResidencyManager()
+        with patch.object(OllamaClient, "load", return_value={"load_duration": 1e9}) as mock_load, \
+                patch.object(OllamaClient, "unload") as mock_unload:
+            manager.switch_to(self.first)
+            manager.switch_to(self.first)
+            manager.switch_to(self.second)
+            manager.release()
+
+        self.assertEqual(mock_load.call_count, 2)
+        self.assertEqual(mock_unload.call_count, 2)
+        self.assertEqual(manager.load_durations, {"first": 1.0, "second": 1.0})
+        self.assertIsNone(manager.resident_model)
+
+    def test_unload_sends_zero_keep_alive(self):
+        with patch.object(self.first.session, "post") as mock_post:
+            self.first.unload()
+
+        self.assertEqual(mock_post.call_args.kwargs["json"], {"model": "first", "keep_alive": 0})
+
+    def test_previous_model_is_kept_when_unload_is_disabled(self):
+        manager = ModelResidencyManager(unload_previous=False)
+        with patch.object(OllamaClient, "load", return_value={}), \
+                patch.object(OllamaClient, "unload") as mock_unload:
+            manager.switch_to(self.first)
+            manager.switch_to(self.second)
+
+        mock_unload.assert_not_called()
+        self.assertEqual(manager.resident_model, "second")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import csv
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from nudging.results_store import CsvResultsStore, SQLiteResultsStore, open_results_store
+
+FIELDS = ["run_id", "status", "error", "exact_match", "early_stopped"]
+
+
+class TestResultsStores(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_backend_is_chosen_by_suffix(self):
+        for name, backend in (("r.csv", CsvResultsStore), ("r.sqlite", SQLiteResultsStore), ("r.db", SQLiteResultsStore)):
+            store = open_results_store(self.root / name, FIELDS)
+            self.assertIsInstance(store, backend)
+            store.close()
+
+    def test_csv_store_batches_and_tracks_completed(self):
+        path = self.root / "results.csv"
+        store = CsvResultsStore(path, FIELDS, batch_size=2)
+        store.append({"run_id": "a", "status": "completed", "extra": "dropped"})
+        self.assertFalse(path.exists())
+        store.append({"run_id": "b", "status": "error"})
+        self.assertTrue(store.is_completed("a"))
+        store.close()
+
+        with path.open(newline="", encoding="utf-8") as handle:
+            rows = list(csv.DictReader(handle))
+        self.assertEqual([row["run_id"] for row in rows], ["a", "b"])
+        self.assertEqual(CsvResultsStore(path, FIELDS).completed_run_ids(), {"a"})
+
+    def test_csv_store_adds_new_columns_to_an_older_header(self):
+        path = self.root / "results.csv"
+        path.write_text("run_id,status,legacy\nold,completed,kept\n", encoding="utf-8")
+        store = CsvResultsStore(path, FIELDS)
+        store.append({"run_id": "new", "status": "completed", "exact_match": 0.5})
+        store.close()
+
+        with path.open(newline="", encoding="utf-8") as handle:
+            reader = csv.DictReader(handle)
+            rows = list(reader)
+        self.assertEqual(reader.fieldnames, FIELDS + ["legacy"])
+        self.assertEqual((rows[0]["run_id"], rows[0]["legacy"], rows[0]["exact_match"]), ("old", "kept", ""))
+        self.assertEqual((rows[1]["run_id"], rows[1]["exact_match"]), ("new", "0.5"))
+        self.assertEqual(CsvResultsStore(path, FIELDS).completed_run_ids(), {"old", "new"})
+
+    def test_csv_writer_follows_a_header_upgraded_by_another_store(self):
+        path = self.root / "results.csv"
+        path.write_text("run_id,status\nold,completed\n", encoding="utf-8")
+        narrow = CsvResultsStore(path, FIELDS[:2])
+        CsvResultsStore(path, FIELDS).close()
+        narrow.append({"run_id": "late", "status": "error"})
+        narrow.close()
+
+        with path.open(newline="", encoding="utf-8") as handle:
+            rows = list(csv.DictReader(handle))
+        self.assertEqual((rows[1]["run_id"], rows[1]["status"], rows[1]["error"]), ("late", "error", ""))
+
+    def test_sqlite_store_keeps_one_row_per_run_and_completed_wins(self):
+        store = SQLiteResultsStore(self.root / "results.sqlite", FIELDS, batch_size=10)
+        store.append({"run_id": "a", "status": "error", "error": "boom"})
+        store.append({"run_id": "a", "status": "completed", "exact_match": 0.25, "early_stopped": True})
+        store.append({"run_id": "a", "status": "error", "error": "late"})
+        self.assertTrue(store.is_completed("a"))
+        rows = store.rows()
+        store.close()
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["status"], "completed")
+        self.assertEqual(rows[0]["exact_match"], 0.25)
+        self.assertEqual(rows[0]["early_stopped"], "True")
+
+    def test_sqlite_store_adds_new_columns_and_exports_csv(self):
+        path = self.root / "results.sqlite"
+        old = SQLiteResultsStore(path, FIELDS[:2])
+        old.append({"run_id": "a", "status": "completed"})
+        old.close()
+
+        store = SQLiteResultsStore(path, FIELDS)
+        store.append({"run_id": "b", "status": "completed", "exact_match": 1.0})
+        exported = store.export_csv(self.root / "export.csv")
+        store.close()
+
+        with (self.root / "export.csv").open(newline="", encoding="utf-8") as handle:
+            reader = csv.DictReader(handle)
+            rows = list(reader)
+        self.assertEqual(exported, 2)
+        self.assertEqual(reader.fieldnames, FIELDS)
+        self.assertEqual([row["run_id"] for row in rows], ["a", "b"])
+
+    def test_sqlite_store_is_safe_for_concurrent_writers(self):
+        path = self.root / "results.sqlite"
+        stores = [SQLiteResultsStore(path, FIELDS, batch_size=5) for _ in range(3)]
+
+        def write(store, prefix):
+            for index in range(20):
+                store.append({"run_id": f"{prefix}-{index}", "status": "completed"})
+            store.flush()
+
+        threads = [threading.Thread(target=write, args=(store, n)) for n, store in enumerate(stores)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(stores[0].completed_run_ids()), 60)
+        for store in stores:
+            store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
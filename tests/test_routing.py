@@ -0,0 +1,91 @@
+import unittest
+from unittest.mock import Mock, patch
+
+import requests
+
+from nudging.models import OllamaClient
+from nudging.routing import EndpointPool, NoHealthyEndpointError, RoutedOllamaClient
+
+
+def _http_error(status_code):
+    return requests.HTTPError(response=Mock(status_code=status_code))
+
+
+class TestEndpointPool(unittest.TestCase):
+    def setUp(self):
+        self.clients = [OllamaClient(model="m", base_url=f"http://host:{port}") for port in (1, 2, 3)]
+        self.pool = EndpointPool(self.clients, eject_seconds=60)
+
+    def test_acquire_picks_least_outstanding(self):
+        first = self.pool.acquire()
+        second = self.pool.acquire()
+        third = self.pool.acquire()
+        self.assertEqual([first, second, third], self.clients)
+
+        self.pool.release(second)
+        self.assertIs(self.pool.acquire(), second)
+
+    def test_failed_endpoint_is_ejected_until_cooldown(self):
+        client = self.pool.acquire()
+        self.pool.release(client, failed=True)
+        acquired = {self.pool.acquire().base_url for _ in range(4)}
+        self.assertNotIn(client.base_url, acquired)
+
+        with patch("nudging.routing.time.monotonic", return_value=10**9):
+            self.assertTrue(self.pool.stats()[client.base_url]["healthy"])
+
+    def test_all_ejected_raises(self):
+        for client in self.clients:
+            self.pool.eject(client)
+        with self.assertRaises(NoHealthyEndpointError):
+            self.pool.acquire()
+
+
+class TestRoutedOllamaClient(unittest.TestCase):
+    def setUp(self):
+        self.routed = RoutedOllamaClient.from_endpoints("m", ["http://host:1", "http://host:2"])
+        self.first, self.second = self.routed.pool.clients
+
+    def test_connection_failure_retries_on_next_endpoint(self):
+        with patch.object(self.first, "generate", side_effect=requests.ConnectionError("down")), \
+                patch.object(self.second, "generate", return_value="ok") as second_generate:
+            self.assertEqual(self.routed.generate("prompt", temperature=0.0), "ok")
+
+        second_generate.assert_called_once_with("prompt", temperature=0.0)
+        stats = self.routed.pool.stats()
+        self.assertFalse(stats["http://host:1"]["healthy"])
+        self.assertEqual(stats["http://host:2"]["outstanding"], 0)
+
+    def test_client_errors_are_not_retried_or_ejected(self):
+        with patch.object(self.first, "generate", side_effect=_http_error(404)), \
+                patch.object(self.second, "generate") as second_generate:
+            with self.assertRaises(requests.HTTPError):
+                self.routed.generate("prompt")
+
+        second_generate.assert_not_called()
+        self.assertTrue(self.routed.pool.stats()["http://host:1"]["healthy"])
+
+    def test_every_endpoint_failing_raises_last_error(self):
+        with patch.object(self.first, "generate", side_effect=_http_error(503)), \
+                patch.object(self.second, "generate", side_effect=requests.Timeout("slow")):
+            with self.assertRaises(requests.Timeout):
+                self.routed.generate("prompt")
+
+    def test_stream_holds_endpoint_until_closed(self):
+        with patch.object(self.first, "generate", return_value=iter(["a", "b"])):
+            chunks = self.routed.generate("prompt", stream=True)
+            self.assertEqual(next(chunks), "a")
+            self.assertEqual(self.routed.pool.stats()["http://host:1"]["outstanding"], 1)
+            chunks.close()
+
+        self.assertEqual(self.routed.pool.stats()["http://host:1"]["outstanding"], 0)
+
+    def test_stream_closed_before_first_chunk_releases_endpoint(self):
+        with patch.object(self.first, "generate", return_value=iter(["a"])):
+            self.routed.generate("prompt", stream=True).close()
+
+        self.assertEqual(self.routed.pool.stats()["http://host:1"]["outstanding"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
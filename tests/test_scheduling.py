@@ -0,0 +1,95 @@
+import unittest
+
+from nudging.experiment import prepare_prompt
+from nudging.scheduling import (
+    RunCondition,
+    expand_grid,
+    order_for_prefix_reuse,
+    parse_shard,
+    shard_of,
+    shared_prefix_words,
+)
+
+
+TEXTS = {
+    "songs::a::one": "alpha beta gamma delta epsilon zeta eta theta",
+    "songs::b::two": "one two three four five six seven eight",
+}
+
+
+def prompt_for(condition):
+    return prepare_prompt(TEXTS[condition.text_title], condition.context_percentage, "v4")[0]
+
+
+class TestScheduling(unittest.TestCase):
+    def setUp(self):
+        self.grid = expand_grid(
+            text_titles=TEXTS,
+            models=["m1", "m2"],
+            temperatures=[0.0, 0.7],
+            context_percentages=[25, 50, 75],
+        )
+
+    def test_expand_grid_keeps_config_order(self):
+        self.assertEqual(len(self.grid), 24)
+        self.assertEqual(self.grid[0], RunCondition("songs::a::one", "m1", 0.0, 25))
+        self.assertEqual(self.grid[1], RunCondition("songs::a::one", "m1", 0.0, 50))
+        self.assertEqual(self.grid[12].model, "m2")
+
+    def test_samples_are_adjacent_and_greedy_conditions_run_once(self):
+        grid = expand_grid(["songs::a::one"], ["m1"], [0.0, 0.7], [25, 50], samples_per_condition=3)
+        ordered = order_for_prefix_reuse(grid, prompt_for)
+
+        self.assertEqual(len(grid), 2 + 2 * 3)
+        self.assertEqual([c.sample for c in grid if c.temperature == 0.0], [0, 0])
+        samples = [(c.context_percentage, c.sample) for c in ordered if c.temperature == 0.7]
+        self.assertEqual([sample for _, sample in samples], [0, 1, 2, 0, 1, 2])
+        self.assertEqual(len({percentage for percentage, _ in samples[:3]}), 1)
+        with self.assertRaises(ValueError):
+            expand_grid(["songs::a::one"], ["m1"], [0.7], [25], samples_per_condition=0)
+
+    def test_prefix_order_keeps_model_blocks_and_pairs_identical_prompts(self):
+        ordered = order_for_prefix_reuse(self.grid, prompt_for)
+
+        self.assertCountEqual(ordered, self.grid)
+        self.assertEqual([c.model for c in ordered], ["m1"] * 12 + ["m2"] * 12)
+        for first, second in zip(ordered[::2], ordered[1::2]):
+            self.assertEqual(prompt_for(first), prompt_for(second))
+            self.assertEqual((first.temperature, second.temperature), (0.0, 0.7))
+
+    def test_prefix_order_increases_shared_prompt_words(self):
+        ordered = order_for_prefix_reuse(self.grid, prompt_for)
+        self.assertGreater(
+            shared_prefix_words(ordered, prompt_for),
+            shared_prefix_words(self.grid, prompt_for),
+        )
+
+    def test_shared_prefix_words_ignores_model_changes(self):
+        same_prompt = [
+            RunCondition("songs::a::one", "m1", 0.0, 50),
+            RunCondition("songs::a::one", "m2", 0.0, 50),
+        ]
+        self.assertEqual(shared_prefix_words(same_prompt, prompt_for), 0)
+        same_model = [same_prompt[0], RunCondition("songs::a::one", "m1", 0.7, 50)]
+        self.assertEqual(
+            shared_prefix_words(same_model, prompt_for),
+            len(prompt_for(same_prompt[0]).split()),
+        )
+
+
+class TestSharding(unittest.TestCase):
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for bad in ("0/4", "5/4", "two/4", "1"):
+            with self.assertRaises(ValueError):
+                parse_shard(bad)
+
+    def test_shards_partition_run_ids(self):
+        run_ids = [f"{index:016x}" for index in range(0, 4000, 7)]
+        shards = [shard_of(run_id, 3) for run_id in run_ids]
+        self.assertEqual(set(shards), {1, 2, 3})
+        self.assertEqual(shards, [shard_of(run_id, 3) for run_id in run_ids])
+
+
+if __name__ == "__main__":
+    unittest.main()
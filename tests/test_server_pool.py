@@ -0,0 +1,66 @@
+import socket
+import sys
+import unittest
+from unittest.mock import patch
+
+from nudging.models import OllamaClient
+from nudging.server_pool import OllamaServerPool, ServerPoolError
+
+FAKE_SERVER = [sys.executable, "-m", "nudging.fake_ollama", "--host", "{host}", "--port", "{port}"]
+
+
+def _free_port_pair() -> int:
+    for _ in range(50):
+        with socket.socket() as first:
+            first.bind(("127.0.0.1", 0))
+            port = first.getsockname()[1]
+            with socket.socket() as second:
+                try:
+                    second.bind(("127.0.0.1", port + 1))
+                except OSError:
+                    continue
+                return port
+    raise RuntimeError("no free port pair")
+
+
+class TestOllamaServerPool(unittest.TestCase):
+    def test_environment_sets_host_parallelism_and_memory(self):
+        pool = OllamaServerPool(
+            instances=2, base_port=12000, num_parallel=4, max_loaded_models=2,
+            keep_alive="1h", env={"OLLAMA_KV_CACHE_TYPE": "q8_0"},
+        )
+        env = pool._environment(12001)
+
+        self.assertEqual(pool.endpoints, ["http://127.0.0.1:12000", "http://127.0.0.1:12001"])
+        self.assertEqual(env["OLLAMA_HOST"], "127.0.0.1:12001")
+        self.assertEqual(env["OLLAMA_NUM_PARALLEL"], "4")
+        self.assertEqual(env["OLLAMA_MAX_LOADED_MODELS"], "2")
+        self.assertEqual(env["OLLAMA_KEEP_ALIVE"], "1h")
+        self.assertEqual(env["OLLAMA_KV_CACHE_TYPE"], "q8_0")
+
+    def test_starts_serves_and_shuts_down_instances(self):
+        pool = OllamaServerPool(instances=2, base_port=_free_port_pair(), command=FAKE_SERVER, startup_timeout=20)
+        with pool:
+            processes = list(pool._processes)
+            for endpoint in pool.endpoints:
+                self.assertTrue(OllamaClient(base_url=endpoint).is_running())
+
+        self.assertTrue(all(process.poll() is not None for process in processes))
+
+    def test_process_that_exits_fails_fast(self):
+        pool = OllamaServerPool(command=[sys.executable, "-c", "raise SystemExit(3)"], startup_timeout=20)
+        with self.assertRaisesRegex(ServerPoolError, "exit code 3"):
+            pool.start()
+        self.assertEqual(pool._processes, [])
+
+    @patch("nudging.server_pool.subprocess.Popen")
+    def test_unready_server_times_out(self, mock_popen):
+        mock_popen.return_value.poll.return_value = None
+        pool = OllamaServerPool(base_port=1, startup_timeout=0.1)
+        with self.assertRaisesRegex(ServerPoolError, "did not become ready"):
+            pool.start()
+        mock_popen.return_value.terminate.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import requests
+
+from nudging.telemetry import MetricsHTTPServer, PrometheusTextfileExporter, RunTelemetry
+
+
+class TestRunTelemetry(unittest.TestCase):
+    def test_snapshot_rates_error_ratio_and_eta(self):
+        with patch("nudging.telemetry.time.monotonic", return_value=100.0):
+            telemetry = RunTelemetry("exp", pending_runs=10, window_seconds=60.0)
+        telemetry.run_started()
+        with patch("nudging.telemetry.time.monotonic", return_value=110.0):
+            telemetry.record("a", "completed", tokens=50)
+            telemetry.record("a", "error")
+            snapshot = telemetry.snapshot()
+
+        self.assertEqual(snapshot["runs_per_second"], 0.2)
+        self.assertEqual(snapshot["tokens_per_second"], {"a": 5.0})
+        self.assertEqual(snapshot["error_ratio"], 0.5)
+        self.assertEqual(snapshot["in_flight"], 1)
+        self.assertEqual(snapshot["remaining"], 8)
+        self.assertEqual(snapshot["eta_seconds"], 40.0)
+
+    def test_rolling_window_forgets_old_runs(self):
+        with patch("nudging.telemetry.time.monotonic", return_value=0.0):
+            telemetry = RunTelemetry("exp", pending_runs=2, window_seconds=10.0)
+            telemetry.record("a", "completed", tokens=5)
+        with patch("nudging.telemetry.time.monotonic", return_value=100.0):
+            snapshot = telemetry.snapshot()
+
+        self.assertEqual(snapshot["runs_per_second"], 0.0)
+        self.assertIsNone(snapshot["eta_seconds"])
+        self.assertEqual(snapshot["tokens"], {"a": 5})
+
+    def test_prometheus_text_format(self):
+        telemetry = RunTelemetry('exp "1"', pending_runs=1)
+        telemetry.record("a", "completed", tokens=3)
+        text = telemetry.render_prometheus()
+
+        self.assertIn('nudging_runs_total{experiment="exp \\"1\\"",model="a",status="completed"} 1', text)
+        self.assertIn('nudging_generated_tokens_total{experiment="exp \\"1\\"",model="a"} 3', text)
+        self.assertIn('nudging_eta_seconds{experiment="exp \\"1\\""} ', text)
+        self.assertIn("# TYPE nudging_runs_in_flight gauge", text)
+
+
+    def test_worker_label_is_added_to_every_sample(self):
+        telemetry = RunTelemetry("exp", pending_runs=1, worker="123")
+        telemetry.record("a", "completed", tokens=3)
+        text = telemetry.render_prometheus()
+
+        self.assertIn('nudging_runs_total{experiment="exp",worker="123",model="a",status="completed"} 1', text)
+        self.assertIn('nudging_runs_remaining{experiment="exp",worker="123"} 0', text)
+
+class TestExporters(unittest.TestCase):
+    def test_textfile_is_written_on_start_and_stop(self):
+        telemetry = RunTelemetry("exp", pending_runs=1)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "run.prom"
+            exporter = PrometheusTextfileExporter(telemetry, path, interval_seconds=60.0).start()
+            self.assertIn("nudging_runs_remaining", path.read_text())
+            telemetry.record("a", "completed")
+            exporter.stop()
+            text = path.read_text()
+            leftovers = [entry.name for entry in Path(temp_dir).iterdir() if entry != path]
+
+        self.assertIn('status="completed"} 1', text)
+        self.assertEqual(leftovers, [])
+
+    def test_http_server_serves_metrics(self):
+        telemetry = RunTelemetry("exp")
+        with MetricsHTTPServer(telemetry) as server:
+            response = requests.get(f"{server.base_url}/metrics", timeout=5)
+            missing = requests.get(f"{server.base_url}/other", timeout=5)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("nudging_runs_per_second", response.text)
+        self.assertEqual(missing.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()